@@ -0,0 +1,163 @@
+# ---------------------------------------------------------------------------
+# Build the compact projection store (graphs/projection_store.py) from the JSON
+# calculations in ./data/ensemble_calcs, and report how the decoded store compares
+# with the JSON originals: the largest decoding error of each block, whether the
+# YOI and monthly percentiles round-trip exactly, how many thresholds would get
+# different narrative text, the storage size of each, and the size and decompression
+# time of the store's chunks. The store records the size and hash of the JSON
+# files; once they change, the app reads them instead until the store is rebuilt.
+#
+# Run from the repository root after the ensemble calculations are updated:
+#   python -m data.compact_store [station_id ...]
+# ---------------------------------------------------------------------------
+
+import sys
+import os
+import glob
+import json
+import time
+
+import numpy as np
+
+from graphs.projection_data import BLOCKS, ProjectionData, JsonSource
+from graphs.projection_store import (
+    PROB_MAX_ERROR,
+    ENCODING,
+    StoreRecord,
+    build_store,
+    decode_chunk,
+    write_store,
+    open_store,
+    store_file,
+)
+from graphs.htf_projection import narrative_facts
+from graphs.station_data import station_data
+
+# ---------------------------------------------------------------------------
+
+
+def displayed(facts):
+    # chances as they appear in the text
+    def pct(pc):
+        return f"{100 * pc:0.0f}" if pc <= 0.99 else ">99"
+
+    return {
+        **facts,
+        "single_year": [[y, c, pct(pc)] for y, c, pc in facts["single_year"]],
+        "single_month": [[y, c, pct(pc)] for y, c, pc in facts["single_month"]],
+    }
+
+
+def validate(sid, scn):
+
+    station_data.clear()
+    store = open_store(sid, scn)
+
+    max_error = {name: 0.0 for name in ENCODING}
+    mismatched = {"yoi": 0, "text": 0}
+
+    for n, t in enumerate(store["thresholds"]):
+
+        with open(f"./data/ensemble_calcs/{sid}/{scn}/{t:03}.json", "r") as f:
+            original = JsonSource(json.load(f))
+        record = StoreRecord(sid, scn, n)
+
+        for name in BLOCKS:
+            err = np.abs(original.decode(name).values - record.decode(name).values)
+            max_error[name] = max(max_error[name], err.max())
+
+        clim_o = original.decode("clim")
+        clim_r = record.decode("clim")
+        max_error["clim"] = max(
+            max_error["clim"],
+            max(
+                np.abs(np.array(clim_o[y][p]) - np.array(clim_r[y][p])).max()
+                for y in clim_o
+                for p in clim_o[y]
+            ),
+        )
+
+        mismatched["yoi"] += original.yoi() != record.yoi()
+
+        facts_o = narrative_facts(ProjectionData(scn, f"{t:03}", original))
+        facts_r = narrative_facts(ProjectionData(scn, f"{t:03}", record))
+        mismatched["text"] += displayed(facts_o) != displayed(facts_r)
+
+    # time to look up a threshold that is not cached: one chunk decompressed
+    chunks = store["chunk_offsets"].size - 1
+    t0 = time.perf_counter()
+    for c in range(chunks):
+        decode_chunk(store, c)
+    lookup_ms = 1000 * (time.perf_counter() - t0) / chunks
+
+    chunk_kb = np.diff(store["chunk_offsets"]).mean() / 1e3
+
+    n_thresholds = store["thresholds"].size
+
+    return n_thresholds, max_error, mismatched, (chunks, chunk_kb, lookup_ms)
+
+
+# ---------------------------------------------------------------------------
+
+station_ids = sys.argv[1:]
+if len(station_ids) == 0:
+    station_ids = sorted(
+        os.path.basename(d)
+        for d in glob.glob("./data/ensemble_calcs/*")
+        if os.path.isdir(d)
+    )
+
+total_json = 0
+total_store = 0
+failed = []
+
+for sid in station_ids:
+
+    scenarios = sorted(
+        os.path.basename(d)
+        for d in glob.glob(f"./data/ensemble_calcs/{sid}/*")
+        if os.path.isdir(d)
+    )
+
+    for scn in scenarios:
+
+        write_store(sid, scn, build_store(sid, scn))
+        n_thresholds, max_error, mismatched, chunks = validate(sid, scn)
+
+        json_bytes = sum(
+            os.path.getsize(f)
+            for f in glob.glob(f"./data/ensemble_calcs/{sid}/{scn}/[0-9]*.json")
+        )
+        store_bytes = os.path.getsize(store_file(sid, scn))
+        total_json += json_bytes
+        total_store += store_bytes
+
+        print(
+            f"{sid} {scn:<9}{n_thresholds:>4} thresholds  "
+            + f"{json_bytes / 1e6:6.2f} MB -> {store_bytes / 1e6:5.2f} MB "
+            + f"({json_bytes / store_bytes:4.1f}x)"
+        )
+        print(
+            f"    {chunks[0]} chunks, {chunks[1]:.1f} kB each on average, "
+            + f"{chunks[2]:.2f} ms to decompress one"
+        )
+        for name, err in max_error.items():
+            limit = PROB_MAX_ERROR if ENCODING[name][1] is not None else 0
+            ok = err <= limit
+            print(f"    {name:<17} max error {err:.2e} {'ok' if ok else 'FAILED'}")
+            if not ok:
+                failed.append(f"{sid}/{scn}/{name}")
+        print(
+            f"    yoi mismatches {mismatched['yoi']}, "
+            + f"thresholds with different text {mismatched['text']}"
+        )
+        if mismatched["yoi"] > 0:
+            failed.append(f"{sid}/{scn}/yoi")
+
+print(
+    f"\nTotal {total_json / 1e6:.2f} MB -> {total_store / 1e6:.2f} MB "
+    + f"({total_json / total_store:.1f}x)"
+)
+if len(failed) > 0:
+    print("Failed: " + ", ".join(failed))
+    sys.exit(1)
@@ -0,0 +1,135 @@
+# ---------------------------------------------------------------------------
+# Make flooding projections with the in-repo ensemble engine
+# (graphs/ensemble_projection.py) for every scenario and threshold of a station,
+# and report how they compare with the published files in ./data/ensemble_calcs:
+# the mean and largest absolute difference of the annual 5th, 50th and 95th
+# percentiles, and the share of thresholds whose YOI agrees (both none, or within
+# 3 years). The engine does not reproduce the published projections.
+#
+# With --write, the projections are written to the engine's own directory
+# (ENGINE_DIR, ./data/ensemble_engine; set FAT_ENSEMBLE_DIR to change it). With
+# --publish, they replace the published files, but only for the scenarios whose
+# annual percentiles all agree within TOLERANCE_DAYS; rebuild the narrative facts
+# and the compact store after.
+#
+# Scenarios are projected in parallel, one process per scenario. Run from the
+# repository root:
+#   python -m data.ensemble_calcs [--write] [--publish] [station_id ...]
+# ---------------------------------------------------------------------------
+
+import sys
+import os
+import glob
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from graphs.ensemble_projection import (
+    ENGINE_DIR,
+    PUBLISHED_DIR,
+    TOLERANCE_DAYS,
+    COMPARED_PERCENTILES,
+    ensemble_projection,
+    projection_file,
+    annual_difference,
+)
+from graphs.slr_projection import load_slr_scenarios
+
+THRESHOLDS = list(range(306))
+
+# ---------------------------------------------------------------------------
+
+
+def write_files(directory, sid, scn, analyses):
+    os.makedirs(os.path.join(directory, sid, scn), exist_ok=True)
+    for t, analysis in analyses:
+        with open(projection_file(directory, sid, scn, t), "w") as f:
+            json.dump(analysis, f)
+
+
+def project(task):
+
+    sid, scn, write, publish = task
+    t0 = time.perf_counter()
+
+    diffs = {p: [] for p in COMPARED_PERCENTILES}
+    yoi_agrees = []
+    analyses = []
+    for t, analysis in ensemble_projection(sid, scn, THRESHOLDS):
+
+        fname = projection_file(PUBLISHED_DIR, sid, scn, t)
+        if os.path.exists(fname):
+            with open(fname, "r") as f:
+                stored = json.load(f)
+            for p, d in annual_difference(analysis, stored).items():
+                diffs[p].append(d)
+            y1, y2 = analysis["yoi"], stored["yoi"]
+            yoi_agrees.append(
+                (y1 is None and y2 is None)
+                or (y1 is not None and y2 is not None and abs(y1[1] - y2[1]) <= 3)
+            )
+
+        analyses.append((t, analysis))
+
+    if write:
+        write_files(ENGINE_DIR, sid, scn, analyses)
+
+    compared = {
+        p: (np.concatenate(d).mean(), np.concatenate(d).max()) if len(d) > 0 else None
+        for p, d in diffs.items()
+    }
+    yoi_share = np.mean(yoi_agrees) if len(yoi_agrees) > 0 else None
+
+    # scenarios not published yet have nothing to differ from
+    published = False
+    if publish and all(c is None or c[1] <= TOLERANCE_DAYS for c in compared.values()):
+        write_files(PUBLISHED_DIR, sid, scn, analyses)
+        published = True
+
+    return compared, yoi_share, published, time.perf_counter() - t0
+
+
+# ---------------------------------------------------------------------------
+
+if __name__ == "__main__":
+
+    flags = ["--write", "--publish"]
+    write = "--write" in sys.argv
+    publish = "--publish" in sys.argv
+    station_ids = [a for a in sys.argv[1:] if a not in flags]
+    if len(station_ids) == 0:
+        station_ids = sorted(
+            os.path.basename(f)[:-5] for f in glob.glob("./data/slr_scenarios/*.json")
+        )
+
+    tasks = [
+        (sid, scn, write, publish)
+        for sid in station_ids
+        for scn in load_slr_scenarios(sid)["names"]
+    ]
+
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor() as pool:
+        for (sid, scn, _, _), (compared, yoi_share, published, dt) in zip(
+            tasks, pool.map(project, tasks)
+        ):
+            print(f"{sid} {scn:<9}{len(THRESHOLDS):>4} thresholds {dt:6.1f} s")
+            if yoi_share is not None:
+                print(
+                    "    annual percentiles, mean/max abs difference (days): "
+                    + ", ".join(
+                        f"{p}th {c[0]:.1f}/{c[1]:.0f}" for p, c in compared.items()
+                    )
+                )
+                print(f"    YOI agrees at {100 * yoi_share:.0f}% of thresholds")
+            if publish:
+                print(
+                    f"    published to {PUBLISHED_DIR}"
+                    if published
+                    else f"    not published: differs by more than {TOLERANCE_DAYS} "
+                    + "days"
+                )
+
+    print(f"\nTotal {time.perf_counter() - t0:.1f} s")
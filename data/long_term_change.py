@@ -0,0 +1,78 @@
+# ---------------------------------------------------------------------------
+# Compute the long-term change block of the observed flooding counts
+# (graphs/long_term_change.py) for every threshold of a station at once, and
+# report how it compares with the block in ./data/htf_observed: the fields that
+# differ, and the thresholds whose text would describe the chance differently.
+# With --write, the block in each htf_observed file is replaced.
+#
+# Run from the repository root after the daily min/max data are updated:
+#   python -m data.long_term_change [--write] [station_id ...]
+# ---------------------------------------------------------------------------
+
+import sys
+import os
+import glob
+import json
+import time
+from collections import Counter
+
+from graphs.long_term_change import long_term_change
+
+# ---------------------------------------------------------------------------
+
+
+def likelihood(prob):
+    # as worded in observed_flooding_text
+    return min(p for p in [1, 10, 33, 67, 90, 99, 100, 101] if prob < p)
+
+
+# ---------------------------------------------------------------------------
+
+write = "--write" in sys.argv
+station_ids = [a for a in sys.argv[1:] if a != "--write"]
+if len(station_ids) == 0:
+    station_ids = sorted(
+        os.path.basename(d)
+        for d in glob.glob("./data/htf_observed/*")
+        if os.path.isdir(d)
+    )
+
+for sid in station_ids:
+
+    files = sorted(glob.glob(f"./data/htf_observed/{sid}/[0-9]*.json"))
+    thresholds = [int(os.path.basename(f)[:3]) for f in files]
+
+    t0 = time.perf_counter()
+    blocks = long_term_change(sid, thresholds)
+    dt = time.perf_counter() - t0
+
+    differing = Counter()
+    wording = []
+    for fname, t, block in zip(files, thresholds, blocks):
+
+        with open(fname, "r") as f:
+            htfo = json.load(f)
+
+        stored = htfo["long_term"]
+        if stored is None or block is None:
+            differing["long_term"] += (stored is None) != (block is None)
+        else:
+            differing.update(k for k in stored if stored[k] != block.get(k))
+            # the chance is only described when flooding days changed
+            if block["htf_pyr_change"] != 0 and likelihood(
+                block["htf_pyr_diff_prob"]
+            ) != likelihood(stored["htf_pyr_diff_prob"]):
+                wording.append(f"{t:03}")
+
+        if write:
+            htfo["long_term"] = block
+            with open(fname, "w") as f:
+                json.dump(htfo, f)
+
+    print(f"{sid} {len(thresholds)} thresholds in {dt:.2f} s")
+    for k, n in differing.items():
+        print(f"    {k:<18} differs at {n} thresholds")
+    print(
+        "    text describes the chance differently at "
+        + (", ".join(wording) if len(wording) > 0 else "no thresholds")
+    )
@@ -0,0 +1,68 @@
+# ---------------------------------------------------------------------------
+# Precompute the facts quoted in the projected-flooding text (onset years,
+# single-year/month chances, extreme-month pentads) for every station, scenario,
+# and threshold in ./data/ensemble_calcs. Writes one narrative_facts.json per
+# station/scenario, keyed by threshold, with the size and hash of each threshold's
+# projection file (the app ignores the facts of a threshold once it differs).
+#
+# Run from the repository root after the ensemble calculations are updated:
+#   python -m data.narrative_facts [station_id ...]
+# ---------------------------------------------------------------------------
+
+import sys
+import os
+import glob
+import json
+
+from graphs.projection_data import ProjectionData, JsonSource
+from graphs.station_data import file_digest
+from graphs.htf_projection import narrative_facts, narrative_facts_file
+
+# ---------------------------------------------------------------------------
+
+
+def write_narrative_facts(sid, scn):
+    """Write the narrative facts of every threshold of a station/scenario."""
+
+    facts = {}
+    sources = {}
+    fnames = sorted(glob.glob(f"./data/ensemble_calcs/{sid}/{scn}/[0-9]*.json"))
+    for fname in fnames:
+
+        with open(fname, "r") as f:
+            analysis = json.load(f)
+
+        threshold = os.path.basename(fname)[:-5]
+        data = ProjectionData(scn, threshold, JsonSource(analysis))
+        facts[threshold] = narrative_facts(data)
+        sources[threshold] = file_digest(fname)
+
+    with open(narrative_facts_file(sid, scn), "w") as f:
+        json.dump({"sources": sources, "facts": facts}, f, separators=(",", ":"))
+
+
+# ---------------------------------------------------------------------------
+
+if __name__ == "__main__":
+
+    station_ids = sys.argv[1:]
+    if len(station_ids) == 0:
+        station_ids = sorted(
+            os.path.basename(d)
+            for d in glob.glob("./data/ensemble_calcs/*")
+            if os.path.isdir(d)
+        )
+
+    for n, sid in enumerate(station_ids):
+
+        print(
+            "Station " + sid + " (" + str(n + 1) + " of " + str(len(station_ids)) + ")"
+        )
+
+        scenarios = sorted(
+            os.path.basename(d)
+            for d in glob.glob(f"./data/ensemble_calcs/{sid}/*")
+            if os.path.isdir(d)
+        )
+        for scn in scenarios:
+            write_narrative_facts(sid, scn)
@@ -0,0 +1,122 @@
+# ---------------------------------------------------------------------------
+# Pre-render the projected and observed flooding figures of every station, SLR
+# scenario and NOAA flooding threshold (graphs/prerendered.py), so the app can
+# serve them without building them on request.
+#
+# Stations and scenarios are rendered in parallel, one process per task. Run from
+# the repository root after the data are updated (bundles whose data have changed
+# are ignored by the app until they are rendered again):
+#   python -m data.prerender [station_id ...]
+# Set FAT_PRERENDER_WORKERS to the number of processes (default: all CPUs).
+# ---------------------------------------------------------------------------
+
+import sys
+import os
+import glob
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from graphs.htf_projection import htf_figures
+from graphs.observed_flooding import station_levels, observed_flooding
+from graphs.prerendered import (
+    write_bundle,
+    projection_bundle,
+    projection_sources,
+    observed_bundle,
+    observed_sources,
+    observed_outputs,
+)
+
+NOAA_LEVELS = ["minor", "moderate", "major"]
+MAX_THRESHOLD = 305
+
+# ---------------------------------------------------------------------------
+
+
+def noaa_thresholds(sid):
+    levels, _, _ = station_levels(sid)
+    return [
+        h["height_key"]
+        for h in levels
+        if h["value"] in NOAA_LEVELS and int(h["height_key"]) <= MAX_THRESHOLD
+    ]
+
+
+def render(task):
+    """Write the bundles of one station and scenario (or its observations); returns
+    the number of bundles, their total size and the time taken."""
+
+    sid, part = task
+    t0 = time.perf_counter()
+    n, size = 0, 0
+
+    if part == "observed":
+        for units_toggle in [True, False]:
+            levels, _, _ = station_levels(sid, units_toggle)
+            units = "ft" if units_toggle else "m"
+            for key in noaa_thresholds(sid):
+                outputs = observed_outputs(*observed_flooding(sid, key, levels, units))
+                size += write_bundle(
+                    sid,
+                    observed_bundle(key, units),
+                    outputs,
+                    observed_sources(sid, key),
+                )
+                n += 1
+    else:
+        station = stations.loc[sid]
+        for key in noaa_thresholds(sid):
+            outputs = {
+                "htf": htf_figures(station, part, key, False),
+                "htf_yoi": htf_figures(station, part, key, True),
+            }
+            size += write_bundle(
+                sid,
+                projection_bundle(part, key),
+                outputs,
+                projection_sources(sid, part, key),
+            )
+            n += 1
+
+    return n, size, time.perf_counter() - t0
+
+
+# ---------------------------------------------------------------------------
+
+with open("./data/stations.json", "r") as f:
+    stations = pd.DataFrame(json.load(f)).T
+
+if __name__ == "__main__":
+
+    station_ids = sys.argv[1:]
+    if len(station_ids) == 0:
+        station_ids = sorted(
+            os.path.basename(f)[:-5] for f in glob.glob("./data/levels/*.json")
+        )
+
+    tasks = []
+    for sid in station_ids:
+        tasks.append((sid, "observed"))
+        tasks.extend(
+            (sid, os.path.basename(d))
+            for d in sorted(glob.glob(f"./data/ensemble_calcs/{sid}/*"))
+            if os.path.isdir(d)
+        )
+
+    workers = int(os.environ.get("FAT_PRERENDER_WORKERS", os.cpu_count()))
+
+    t0 = time.perf_counter()
+    total_n, total_size = 0, 0
+    with ProcessPoolExecutor(workers) as pool:
+        for (sid, part), (n, size, dt) in zip(tasks, pool.map(render, tasks)):
+            print(f"{sid} {part:<9}{n:>3} bundles {size / 1e3:8.1f} kB {dt:6.2f} s")
+            total_n += n
+            total_size += size
+
+    print(
+        f"\nTotal {total_n} bundles, {total_size / 1e6:.2f} MB "
+        + f"in {time.perf_counter() - t0:.1f} s"
+    )
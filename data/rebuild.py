@@ -0,0 +1,401 @@
+# ---------------------------------------------------------------------------
+# Rebuild the ensemble calculations of many stations with the in-repo engine
+# (graphs/ensemble_projection.py) and any number of workers, on this host or others,
+# through a work queue kept as files in a shared directory. Each unit of work is one
+# station, scenario and block of thresholds, and is a file that moves between the
+# queue's subdirectories:
+#
+#   pending/  units waiting for a worker
+#   claimed/  units being projected, named <unit>@<host>.<pid> by their worker
+#   done/     units finished, with the worker and time taken
+#   failed/   units that raised, with the traceback
+#
+# A worker claims a unit by renaming it from pending/ to claimed/, which is atomic
+# within a filesystem: of several workers trying the same unit, exactly one
+# succeeds and the others move on to the next. While it projects the unit the
+# worker touches its claim every HEARTBEAT seconds (more often for a short --stale);
+# claims left untouched for longer than --stale (their worker crashed or its host
+# went down) are put back in pending/ by the next worker to start or run out of
+# units. Each threshold's file is written whole (to a temporary file of the
+# writer's own, then renamed) and the units are reproducible, so a unit projected
+# twice, or halfway and again, leaves the same files.
+#
+# The queue needs nothing but the shared directory: run init once, then work on as
+# many hosts as wanted (from a checkout of the repository, with the shared directory
+# and the engine's directory on shared storage). Running init or work again resumes
+# where the queue stopped.
+#
+# The units are written to the engine's directory (ENGINE_DIR, ./data/ensemble_engine;
+# set FAT_ENSEMBLE_DIR to change it), not over the published ./data/ensemble_calcs:
+# the engine does not reproduce the published projections. Once the queue is drained,
+# publish copies the scenarios whose annual percentiles all agree with the published
+# ones within TOLERANCE_DAYS, and rebuilds their narrative facts and compact stores
+# (data/narrative_facts.py, graphs/projection_store.py). A scenario with thresholds
+# that have no published counterpart cannot be checked, and is only published with
+# --unvalidated.
+#
+# Run from the repository root:
+#   python -m data.rebuild init [--scenario int ...] [--block N] [station_id ...]
+#   python -m data.rebuild work [--workers N] [--stale SECONDS]
+#   python -m data.rebuild status
+#   python -m data.rebuild requeue [--failed]
+#   python -m data.rebuild publish [--unvalidated]
+# Set FAT_REBUILD_QUEUE to the queue directory (default ./data/rebuild_queue).
+# ---------------------------------------------------------------------------
+
+import os
+import sys
+import glob
+import json
+import time
+import random
+import socket
+import tempfile
+import argparse
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+from graphs.ensemble_projection import (
+    ENGINE_DIR,
+    PUBLISHED_DIR,
+    TOLERANCE_DAYS,
+    THRESHOLD_BLOCK,
+    ensemble_projection,
+    projection_file,
+    annual_difference,
+)
+from graphs.slr_projection import load_slr_scenarios
+from graphs.projection_store import build_store, write_store
+from data.narrative_facts import write_narrative_facts
+
+QUEUE_DIR = os.environ.get("FAT_REBUILD_QUEUE", "./data/rebuild_queue")
+STATES = ["pending", "claimed", "done", "failed"]
+
+THRESHOLDS = list(range(306))
+
+# seconds between touches of a claim, and without one before it is put back
+HEARTBEAT = 30
+STALE = 600
+
+# ---------------------------------------------------------------------------
+
+
+def queue_path(state, name=""):
+    return os.path.join(QUEUE_DIR, state, name)
+
+
+def unit_name(name):
+    """Unit of a queue file name (claims carry their worker after @)."""
+    return name.split("@")[0]
+
+
+def listing(state):
+    return sorted(os.listdir(queue_path(state)))
+
+
+def write_file(fname, content):
+    # a temporary name of the writer's own: workers on several hosts may write the
+    # same file at once (a unit projected twice), and the pid is not unique across
+    # hosts
+    fd, tmp = tempfile.mkstemp(
+        dir=os.path.dirname(fname), prefix=os.path.basename(fname) + ".", suffix=".tmp"
+    )
+    try:
+        # mkstemp makes the file private; these are read by the app and other users
+        os.fchmod(fd, 0o644)
+        with os.fdopen(fd, "w") as f:
+            json.dump(content, f)
+        os.replace(tmp, fname)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def init_queue(station_ids, scenarios, block):
+    """Add the units of stations to pending/, except those queued or done already;
+    returns the number added."""
+
+    for state in STATES:
+        os.makedirs(queue_path(state), exist_ok=True)
+    queued = {
+        unit_name(n) for state in STATES for n in listing(state) if ".tmp" not in n
+    }
+
+    added = 0
+    for sid in station_ids:
+        for scn in load_slr_scenarios(sid)["names"]:
+            if scenarios and scn not in scenarios:
+                continue
+            for b in range(0, len(THRESHOLDS), block):
+                thresholds = THRESHOLDS[b : b + block]
+                name = f"{sid}_{scn}_{thresholds[0]:03}-{thresholds[-1]:03}"
+                if name in queued:
+                    continue
+                unit = {"station": sid, "scenario": scn, "thresholds": thresholds}
+                write_file(queue_path("pending", name), unit)
+                added += 1
+
+    return added
+
+
+def recover(stale):
+    """Put claims untouched for stale seconds back in pending/ (or drop them if their
+    unit is done); returns the units put back."""
+
+    done = set(listing("done"))
+    recovered = []
+    for name in listing("claimed"):
+        claim = queue_path("claimed", name)
+        try:
+            if time.time() - os.stat(claim).st_mtime < stale:
+                continue
+            if unit_name(name) in done:
+                os.remove(claim)
+            else:
+                os.rename(claim, queue_path("pending", unit_name(name)))
+                recovered.append(unit_name(name))
+        except FileNotFoundError:
+            # its worker finished it, or another worker recovered it
+            continue
+
+    return recovered
+
+
+def claim(worker):
+    """Claim a pending unit; returns its claim file, or None if none is left."""
+
+    names = [n for n in listing("pending") if not n.endswith(".tmp")]
+    # start at random, so workers starting together try different units
+    random.shuffle(names)
+    for name in names:
+        claimed = queue_path("claimed", f"{name}@{worker}")
+        try:
+            os.rename(queue_path("pending", name), claimed)
+        except FileNotFoundError:
+            continue
+        # the rename keeps the time the unit was queued; the claim starts now
+        os.utime(claimed)
+        return claimed
+
+    return None
+
+
+def heartbeat(claimed, stop, interval):
+    while not stop.wait(interval):
+        try:
+            os.utime(claimed)
+        except FileNotFoundError:
+            return
+
+
+def project_unit(unit):
+    """Write the ensemble calculations of a unit; returns the time taken."""
+
+    t0 = time.perf_counter()
+    sid, scn = unit["station"], unit["scenario"]
+    os.makedirs(os.path.join(ENGINE_DIR, sid, scn), exist_ok=True)
+    for t, analysis in ensemble_projection(sid, scn, unit["thresholds"]):
+        write_file(projection_file(ENGINE_DIR, sid, scn, t), analysis)
+
+    return time.perf_counter() - t0
+
+
+def work(n, stale):
+    """Project units until none is left; returns the numbers done and failed."""
+
+    worker = f"{socket.gethostname()}.{os.getpid()}"
+    counts = {"done": 0, "failed": 0}
+    recover(stale)
+
+    while True:
+
+        claimed = claim(worker)
+        if claimed is None:
+            # units may come back from workers that stopped
+            if len(recover(stale)) > 0:
+                continue
+            return counts
+
+        name = unit_name(os.path.basename(claimed))
+        with open(claimed, "r") as f:
+            unit = json.load(f)
+
+        stop = threading.Event()
+        # touched often enough that a live claim never looks stale
+        interval = min(HEARTBEAT, stale / 4)
+        beat = threading.Thread(
+            target=heartbeat, args=(claimed, stop, interval), daemon=True
+        )
+        beat.start()
+        try:
+            dt = project_unit(unit)
+            state, record = "done", {"worker": worker, "seconds": round(dt, 1)}
+        except Exception:
+            error = traceback.format_exc()
+            state, record = "failed", {"worker": worker, "error": error}
+        finally:
+            stop.set()
+            beat.join()
+
+        write_file(queue_path(state, name), {**unit, **record})
+        try:
+            os.remove(claimed)
+        except FileNotFoundError:
+            # the claim went stale and the unit was queued again
+            pass
+        counts[state] += 1
+        took = f" {dt:6.1f} s" if state == "done" else ""
+        print(f"[{n}] {name:<24} {state}{took}")
+
+
+def requeue(failed):
+    """Put done (or only failed) units back in pending/; returns how many."""
+
+    n = 0
+    for state in ["failed"] if failed else ["done", "failed"]:
+        for name in listing(state):
+            if name.endswith(".tmp"):
+                continue
+            with open(queue_path(state, name), "r") as f:
+                unit = json.load(f)
+            unit = {k: unit[k] for k in ["station", "scenario", "thresholds"]}
+            write_file(queue_path("pending", name), unit)
+            os.remove(queue_path(state, name))
+            n += 1
+
+    return n
+
+
+def publish(unvalidated=False):
+    """Copy the engine's scenarios that have every threshold, and annual percentiles
+    within TOLERANCE_DAYS of the published ones, over them; then rebuild their
+    narrative facts and compact stores. A scenario with thresholds that have no
+    published counterpart cannot be checked and is only published with unvalidated.
+    Returns the largest difference of each scenario (None if nothing was compared)
+    and its outcome."""
+
+    results = dict()
+    for d in sorted(glob.glob(os.path.join(ENGINE_DIR, "*", "*"))):
+        sid, scn = d.split(os.sep)[-2:]
+        analyses = []
+        worst = None
+        complete, comparable = True, True
+        for t in THRESHOLDS:
+            fname = projection_file(ENGINE_DIR, sid, scn, t)
+            if not os.path.exists(fname):
+                complete = False
+                break
+            with open(fname, "r") as f:
+                analysis = json.load(f)
+            published = projection_file(PUBLISHED_DIR, sid, scn, t)
+            if os.path.exists(published):
+                with open(published, "r") as f:
+                    diff = annual_difference(analysis, json.load(f))
+                worst = max(
+                    0.0 if worst is None else worst,
+                    *(float(d.max(initial=0)) for d in diff.values()),
+                )
+            else:
+                comparable = False
+            analyses.append((t, analysis))
+
+        if not complete:
+            outcome = "incomplete"
+        elif worst is not None and worst > TOLERANCE_DAYS:
+            outcome = "differs"
+        elif not comparable and not unvalidated:
+            outcome = "not comparable"
+        else:
+            outcome = "published"
+            os.makedirs(os.path.join(PUBLISHED_DIR, sid, scn), exist_ok=True)
+            for t, analysis in analyses:
+                write_file(projection_file(PUBLISHED_DIR, sid, scn, t), analysis)
+            # the facts and the store are built from the files just replaced
+            write_narrative_facts(sid, scn)
+            write_store(sid, scn, build_store(sid, scn))
+        results[f"{sid}/{scn}"] = (worst, outcome)
+
+    return results
+
+
+# ---------------------------------------------------------------------------
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Rebuild the ensemble calculations.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    p = commands.add_parser("init")
+    p.add_argument("station_ids", nargs="*")
+    p.add_argument("--scenario", action="append")
+    p.add_argument("--block", type=int, default=THRESHOLD_BLOCK)
+    p = commands.add_parser("work")
+    p.add_argument("--workers", type=int, default=os.cpu_count())
+    p.add_argument("--stale", type=float, default=STALE)
+    commands.add_parser("status")
+    p = commands.add_parser("requeue")
+    p.add_argument("--failed", action="store_true")
+    p = commands.add_parser("publish")
+    p.add_argument("--unvalidated", action="store_true")
+    args = parser.parse_args()
+
+    queue_needed = args.command not in ["init", "publish"]
+    if queue_needed and not os.path.isdir(queue_path("pending")):
+        sys.exit(f"No queue in {QUEUE_DIR}: run init first")
+
+    if args.command == "init":
+        station_ids = args.station_ids
+        if len(station_ids) == 0:
+            station_ids = sorted(
+                os.path.basename(f)[:-5]
+                for f in glob.glob("./data/slr_scenarios/*.json")
+            )
+        n = init_queue(station_ids, args.scenario, args.block)
+        print(f"{n} units added to {QUEUE_DIR}")
+
+    elif args.command == "work":
+        t0 = time.perf_counter()
+        with ProcessPoolExecutor(args.workers) as pool:
+            results = list(
+                pool.map(work, range(args.workers), [args.stale] * args.workers)
+            )
+        print(
+            f"\n{sum(r['done'] for r in results)} units done, "
+            + f"{sum(r['failed'] for r in results)} failed "
+            + f"in {time.perf_counter() - t0:.1f} s"
+        )
+
+    elif args.command == "status":
+        for state in STATES:
+            names = [n for n in listing(state) if not n.endswith(".tmp")]
+            print(f"{state:<8} {len(names):>6}")
+            if state == "claimed":
+                for name in names:
+                    try:
+                        touched = os.stat(queue_path(state, name)).st_mtime
+                    except FileNotFoundError:
+                        continue
+                    print(f"    {name} (touched {time.time() - touched:.0f} s ago)")
+
+    elif args.command == "requeue":
+        print(f"{requeue(args.failed)} units put back in pending")
+
+    elif args.command == "publish":
+        for name, (worst, outcome) in publish(args.unvalidated).items():
+            compared = (
+                f"differs by up to {worst:.0f} days"
+                if worst is not None
+                else "has no published thresholds"
+            )
+            if outcome == "incomplete":
+                print(f"{name:<20} incomplete, not published")
+            elif outcome == "differs":
+                print(f"{name:<20} {compared}, not published (> {TOLERANCE_DAYS})")
+            elif outcome == "not comparable":
+                print(
+                    f"{name:<20} {compared}, not published: some thresholds have no "
+                    + "published counterpart (--unvalidated to publish anyway)"
+                )
+            else:
+                print(f"{name:<20} {compared}, published")
@@ -0,0 +1,49 @@
+# ---------------------------------------------------------------------------
+# Precompute the SLR summary of every station (./data/slr_summary/<station>.json):
+# the rows of the scenario table, the median SLR of each scenario in its last
+# year and the likelihood statements of the SLR page, in ft and m, with the size
+# and hash of the scenarios file. The app computes them from the SLR scenarios
+# instead while a station's summary is missing or its scenarios file differs.
+#
+# Run from the repository root after the SLR scenarios are updated:
+#   python -m data.slr_summary [station_id ...]
+# ---------------------------------------------------------------------------
+
+import os
+import sys
+import glob
+import time
+
+import graphs.figures as figs
+from graphs.station_data import file_digest
+from graphs.slr_projection import (
+    load_slr_scenarios,
+    slr_scenarios_file,
+    slr_summary,
+    slr_summary_file,
+)
+
+# ---------------------------------------------------------------------------
+
+station_ids = sys.argv[1:]
+if len(station_ids) == 0:
+    station_ids = sorted(
+        os.path.basename(f)[:-5] for f in glob.glob("./data/slr_scenarios/*.json")
+    )
+
+os.makedirs("./data/slr_summary", exist_ok=True)
+for sid in station_ids:
+
+    t0 = time.perf_counter()
+    summary = slr_summary(load_slr_scenarios(sid))
+    data = figs.to_json(
+        {"source": file_digest(slr_scenarios_file(sid)), "summary": summary}
+    )
+    dt = time.perf_counter() - t0
+
+    fname = slr_summary_file(sid)
+    with open(fname + ".tmp", "wb") as f:
+        f.write(data)
+    os.replace(fname + ".tmp", fname)
+
+    print(f"{sid} in {dt * 1e3:.1f} ms, {fname} {len(data) / 1e3:.1f} kB")
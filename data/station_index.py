@@ -0,0 +1,43 @@
+# ---------------------------------------------------------------------------
+# Compile the levels of every station (./data/levels) into one index,
+# ./data/station_index.json, loaded once by the app: the levels and the table of
+# top-ten events and return periods in ft and m, and the threshold options, for each
+# station, with the size and hash of the levels files it was compiled from. The app
+# reads the levels files instead while the index is missing or any of them differs.
+#
+# Run from the repository root after the levels are updated:
+#   python -m data.station_index
+# ---------------------------------------------------------------------------
+
+import os
+import json
+import time
+
+import graphs.figures as figs
+from graphs.station_data import file_digests
+from graphs.observed_flooding import (
+    STATION_INDEX,
+    compile_station_levels,
+    station_levels_files,
+)
+
+# ---------------------------------------------------------------------------
+
+files = station_levels_files()
+
+t0 = time.perf_counter()
+index = dict()
+for fname in files:
+    with open(fname, "r") as f:
+        index[os.path.basename(fname)[:-5]] = compile_station_levels(json.load(f))
+dt = time.perf_counter() - t0
+
+data = figs.to_json({"sources": file_digests(files), "stations": index})
+with open(STATION_INDEX + ".tmp", "wb") as f:
+    f.write(data)
+os.replace(STATION_INDEX + ".tmp", STATION_INDEX)
+
+print(
+    f"{len(index)} stations compiled in {dt:.2f} s, "
+    + f"{STATION_INDEX} {len(data) / 1e3:.1f} kB"
+)
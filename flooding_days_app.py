@@ -3,26 +3,55 @@ from dash import dcc, html
 from dash.dependencies import State, Input, Output
 from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
-import plotly.graph_objects as go
 
 import pandas as pd
+import os
 import json
+import flask
 from urllib.parse import parse_qs
 
-from graphs.stations_map import create_stations_map
+import graphs.figures as figs
+from graphs.stations_map import create_stations_map, stations_map_update
 from graphs.observed_flooding import (
     station_levels,
+    station_threshold_options,
+    load_station_index,
     observed_flooding,
     observed_flooding_text,
 )
-from graphs.htf_projection import (
-    load_projection_data,
-    htf_projection,
-    htf_analysis_text,
+from graphs.htf_projection import htf_figures
+from graphs.clim_projection import clim_projection, clim_store, clim_from_store
+from graphs.slr_projection import (
+    slr_projection,
+    slr_budget,
+    slr_budget_over_time,
+    load_slr_scenarios,
+    load_slr_budget,
+    budget_store,
+    budget_from_store,
+    load_slr_summary,
+    slr_likelihood_text,
 )
-from graphs.clim_projection import clim_projection
-from graphs.slr_projection import slr_projection, slr_budget
-from graphs.pentad_projection import pentad_projection
+from graphs.threshold_sweep import threshold_sweep_data, threshold_sweep
+from graphs.threshold_query import threshold_query, projection_years
+from graphs.scenario_comparison import (
+    load_scenario_comparison,
+    scenario_comparison,
+    scenario_summary_table,
+)
+from graphs.station_data import station_data
+from graphs.prefetch import prefetcher
+from graphs.prerendered import (
+    PRERENDERED_DIR,
+    load_bundle,
+    projection_bundle,
+    projection_sources,
+    observed_bundle,
+    observed_sources,
+    observed_from_bundle,
+)
+from graphs.request_sequence import init_sessions, sequenced, sequencer
+from graphs.single_flight import single_flight
 
 from layouts.options_layout import (
     generate_app_header,
@@ -55,6 +84,9 @@ app = dash.Dash(
 )
 app.title = "Flooding Days v2"
 
+# session cookie for sequencing the requests of each browser
+init_sessions(app.server)
+
 # -------------------------------------------------------------------------------------
 # -------------------------------------------------------------------------------------
 # INITIALIZE
@@ -67,11 +99,10 @@ fname = "./data/stations.json"
 with open(fname, "r") as f:
     stations = pd.DataFrame(json.load(f)).T
 
-graph_init = go.Figure()
-graph_init.update_xaxes(visible=False)
-graph_init.update_yaxes(visible=False)
-graph_init.update_layout(template="none")
-init["graph"] = graph_init
+# levels of every station, so switching stations reads no levels files
+load_station_index()
+
+init["graph"] = figs.blank_figure()
 
 options = dict(
     station=[dict(label=stations.name.loc[sid], value=sid) for sid in stations.index],
@@ -98,6 +129,9 @@ mapbox_access_token = "pk.eyJ1IjoicHQwY2VhbmljIiwiYSI6ImNreGZiZjFjdzE4ZGEyb280N2
 # -------------------------------------------------------------------------------------
 # -------------------------------------------------------------------------------------
 
+# the stations map, built once; redraws update its selection and viewport
+init["map"] = create_stations_map(stations, mapbox_access_token)
+
 # generate dom for layout components
 app_header = generate_app_header()
 stations_map = generate_stations_map(init)
@@ -161,6 +195,8 @@ app.layout = html.Div(
         dcc.Store(id="slr-budget-year-store", data=init["year"],),
         dcc.Store(id="clim-prjn-data-store", data="",),
         dcc.Store(id="clim-year-store", data=init["year"],),
+        dcc.Store(id="threshold-finder-store", data=None,),
+        dcc.Store(id="prefetch-store", data=None,),
     ],
 )
 
@@ -247,12 +283,15 @@ visible_if_no_station = [
     Input("scenario-select", "value"),
     Input("threshold-select", "value"),
     Input("threshold-float", "value"),
+    Input("threshold-finder-apply", "n_clicks"),
     # ---------------------------------------------------------------------------------
     State("thresholds-store", "data"),
     State("current-threshold-store", "data"),
     State("station-id-store", "data"),
     State("last-map-redraw-was-hidden-store", "data"),
+    State("threshold-finder-store", "data"),
 )
+@sequenced("page", per_trigger=True)
 def update_page(
     url_path,
     url_query,
@@ -266,10 +305,12 @@ def update_page(
     scenario_select,
     threshold_select,
     threshold_float,
+    threshold_finder_apply,
     thresholds_store,
     current_threshold_store,
     station_id_store,
     last_map_redraw_was_hidden,
+    threshold_finder_store,
 ):
 
     # ---------------------------------------------------------------------------------
@@ -330,16 +371,16 @@ def update_page(
             else scenario_select
         )
 
-        threshold_query = (
+        threshold_url_query = (
             parsed_queries["threshold"][0] if "threshold" in parsed_queries else None
         )
-        if threshold_query is not None:
+        if threshold_url_query is not None:
             threshold_query_valid = (
-                threshold_query.isnumeric()
-                & (len(threshold_query) == 3)
-                & (int(threshold_query) <= 300)
+                threshold_url_query.isnumeric()
+                & (len(threshold_url_query) == 3)
+                & (int(threshold_url_query) <= 300)
             )
-            threshold_key = threshold_query if threshold_query_valid else None
+            threshold_key = threshold_url_query if threshold_query_valid else None
         else:
             threshold_key = None
 
@@ -376,7 +417,7 @@ def update_page(
         show_map_query = None
         units_query = None
         scenario_query = None
-        threshold_query = None
+        threshold_url_query = None
         yoi_query = None
 
     # --------------------------------------------------------------------
@@ -486,12 +527,7 @@ def update_page(
         thresholds_store, topten_table, thresholds_updated = station_levels(
             station_id, units_toggle
         )
-        threshold_options = [
-            {k: d[k] for k in d if k not in ["height", "height_key"]}
-            for d in thresholds_store
-            if d["value"] not in ["mhhw", "msl", "mllw"]
-        ]
-        threshold_options += [{"value": "custom", "label": "Custom"}]
+        threshold_options = station_threshold_options(station_id)
 
         # change threshold to default threshold if current threshold not an option
         if threshold_select not in [t["value"] for t in threshold_options]:
@@ -501,9 +537,7 @@ def update_page(
                     break
 
         # load SLR scenarios
-        filename = f"./data/slr_scenarios/{station_id_store}.json"
-        with open(filename, "r") as fo:
-            slr_scn = json.load(fo)
+        slr_scn = load_slr_scenarios(station_id_store)
 
         # check if station has selected scenario; if not return to default
         scenario_select = (
@@ -517,9 +551,7 @@ def update_page(
         slr_scenarios_data_store = json.dumps(
             {s: slr_scn[s] for s in slr_scn if s != "contributions"}
         )
-        slr_budget_data_store = json.dumps(
-            {s: slr_scn[s] for s in ["contributions", "names"]}
-        )
+        slr_budget_data_store = budget_store(load_slr_budget(station_id_store))
 
     else:
 
@@ -547,6 +579,13 @@ def update_page(
 
     if station_id is not None:
 
+        if (
+            trigger == "threshold-finder-apply.n_clicks"
+            and threshold_finder_store is not None
+        ):
+            # highest whole-cm threshold at or below the one found
+            threshold_key = "{:03}".format(min(int(threshold_finder_store), 300))
+
         if trigger == "threshold-select.value" or threshold_key is None:
             for h in thresholds_store:
                 if h["value"] == threshold_select:
@@ -607,7 +646,7 @@ def update_page(
         if scenario_query is not None or (scenario_select != "int")
         else None,
         "threshold": threshold_key
-        if threshold_query is not None or (threshold_select != "minor")
+        if threshold_url_query is not None or (threshold_select != "minor")
         else None,
         "yoi": ("hide" if not yoi_toggle else "show")
         if yoi_query is not None or yoi_toggle
@@ -697,7 +736,7 @@ def redraw_stations_map(
     )
 
     if redraw_map_store:
-        stations_map = create_stations_map(
+        stations_map = stations_map_update(
             stations, mapbox_access_token, station_select=station_id_store
         )
         return stations_map, last_map_redraw_was_hidden
@@ -706,6 +745,24 @@ def redraw_stations_map(
         raise PreventUpdate()
 
 
+# prefetch what a hovered station opens with, before it is clicked
+@app.callback(
+    Output("prefetch-store", "data"),
+    Input("stations-map-graph", "hoverData"),
+    State("scenario-select", "value"),
+    prevent_initial_call=True,
+)
+def prefetch_hovered_station(map_hover, scenario_select):
+
+    if map_hover is not None:
+        station_id = map_hover["points"][0]["customdata"]["id"]
+        prefetcher.station(
+            stations.loc[station_id], scenario_select, init["threshold"]
+        )
+
+    raise PreventUpdate()
+
+
 # -------------------------------------------------------------------------------------
 # EXTREME SL OBSERVATIONS CALLBACK
 
@@ -720,6 +777,7 @@ def redraw_stations_map(
     Input("current-threshold-store", "data"),
     Input("units-toggle", "value"),
 )
+@sequenced("obs")
 def update_obs_flood_graph(
     station_id_store, thresholds_store, current_threshold_store, units_toggle,
 ):
@@ -739,12 +797,30 @@ def update_obs_flood_graph(
         station_name = stations.loc[station_id_store, "name"]
         threshold_name = current_threshold_store["name"]
 
-        obs_flood_graph, obs_flood_analysis = observed_flooding(
+        # pre-rendered by data/prerender.py if available, otherwise built here, with
+        # identical requests from other sessions sharing one build
+        bundle = load_bundle(
             station_id_store,
-            current_threshold_store["key"],
-            thresholds_store,
-            units_toggle,
+            observed_bundle(current_threshold_store["key"], units_toggle),
+            observed_sources(station_id_store, current_threshold_store["key"]),
         )
+        if bundle is not None:
+            obs_flood_graph, obs_flood_analysis = observed_from_bundle(bundle)
+        else:
+            obs_flood_graph, obs_flood_analysis = single_flight.do(
+                (
+                    "obs_figures",
+                    station_id_store,
+                    current_threshold_store["key"],
+                    units_toggle,
+                ),
+                lambda: observed_flooding(
+                    station_id_store,
+                    current_threshold_store["key"],
+                    thresholds_store,
+                    units_toggle,
+                ),
+            )
 
         obs_flood_text = observed_flooding_text(
             station_name, threshold_name, obs_flood_analysis,
@@ -754,7 +830,7 @@ def update_obs_flood_graph(
         raise PreventUpdate()
 
     return (
-        obs_flood_graph,
+        figs.typed_arrays(obs_flood_graph),
         station_name,
         threshold_name,
         obs_flood_text,
@@ -785,6 +861,7 @@ def update_obs_flood_graph(
     State("thresholds-store", "data"),
     prevent_initial_call=True,
 )
+@sequenced("htf")
 def update_htf_graph(
     station_id_store,
     scenario_select,
@@ -807,23 +884,41 @@ def update_htf_graph(
 
     if trigger in relevant_triggers and station_id_store is not None:
 
-        meta, prjn, clim, pent, prob = load_projection_data(
-            stations.loc[station_id_store],
-            scenario_select,
-            current_threshold_store["key"],
-        )
+        station = stations.loc[station_id_store]
+        threshold_key = current_threshold_store["key"]
 
-        meta["steps_xd"] = (
-            [prjn[50].loc[s] for s in meta["steps"]]
-            if meta["steps"] is not None
-            else None
+        # pre-rendered by data/prerender.py if available, otherwise built here, with
+        # identical requests from other sessions sharing one build
+        bundle = load_bundle(
+            station_id_store,
+            projection_bundle(scenario_select, threshold_key),
+            projection_sources(station_id_store, scenario_select, threshold_key),
         )
+        if bundle is not None:
+            htf_outputs = bundle["htf_yoi" if yoi_toggle else "htf"]
+        else:
+            htf_outputs = single_flight.do(
+                (
+                    "htf_figures",
+                    station_id_store,
+                    scenario_select,
+                    threshold_key,
+                    bool(yoi_toggle),
+                ),
+                lambda: htf_figures(station, scenario_select, threshold_key, yoi_toggle),
+            )
 
-        display_yoi = {"display": "block" if meta["steps"] is not None else "none"}
+        (
+            htf_graph,
+            clim,
+            pent_graph,
+            htf_content,
+            xtrm_content,
+            display_yoi,
+        ) = htf_outputs
 
-        htf_graph, yr_lims = htf_projection(meta, prjn, yoi_toggle)
-        pent_graph = pentad_projection(meta, pent, yr_lims)
-        htf_content, xtrm_content = htf_analysis_text(meta, prob, prjn, pent)
+        # likely next: nearby thresholds and the other scenarios
+        prefetcher.projection(station, scenario_select, threshold_key)
 
         scenario_name = [
             scn["label"]
@@ -835,11 +930,11 @@ def update_htf_graph(
         raise PreventUpdate()
 
     return (
-        htf_graph,
+        figs.typed_arrays(htf_graph),
         scenario_name,
         current_threshold_store["name"],
-        clim,
-        pent_graph,
+        clim_store(clim),
+        figs.typed_arrays(pent_graph),
         scenario_name,
         current_threshold_store["name"],
         htf_content["chronic"],
@@ -881,7 +976,123 @@ def update_clim_graph(prjn_hover, prjn_click, clim_json, clim_year_store):
     else:
         clim_year = clim_year_store
 
-    return clim_projection(clim_json, clim_year), clim_year, clim_year_store
+    return (
+        figs.typed_arrays(clim_projection(clim_from_store(clim_json), clim_year)),
+        clim_year,
+        clim_year_store,
+    )
+
+
+# -------------------------------------------------------------------------------------
+# THRESHOLD SWEEP CALLBACK
+
+
+@app.callback(
+    Output("sweep-graph", "figure"),
+    Output("sweep-graph-title-scenario", "children"),
+    Output("sweep-graph-title-year", "children"),
+    Input("station-id-store", "data"),
+    Input("scenario-select", "value"),
+    Input("current-threshold-store", "data"),
+    Input("units-toggle", "value"),
+    Input("clim-year-store", "data"),
+    prevent_initial_call=True,
+)
+@sequenced("sweep")
+def update_sweep_graph(
+    station_id_store,
+    scenario_select,
+    current_threshold_store,
+    units_toggle,
+    clim_year_store,
+):
+
+    if station_id_store is None or current_threshold_store is None:
+        raise PreventUpdate()
+
+    units_toggle = "ft" if units_toggle else "m"
+
+    sweep = threshold_sweep_data(station_id_store, scenario_select, clim_year_store)
+    sweep_graph = threshold_sweep(
+        sweep, current_threshold_store[units_toggle], units_toggle
+    )
+
+    scenario_name = [
+        scn["label"] for scn in options["scenario"] if scn["value"] == scenario_select
+    ][0]
+
+    return figs.typed_arrays(sweep_graph), scenario_name, clim_year_store
+
+
+# -------------------------------------------------------------------------------------
+# SCENARIO COMPARISON CALLBACK
+
+
+@app.callback(
+    Output("comparison-graph", "figure"),
+    Output("comparison-graph-title-threshold", "children"),
+    Output("comparison-table", "data"),
+    Input("station-id-store", "data"),
+    Input("scenario-select", "value"),
+    Input("current-threshold-store", "data"),
+    prevent_initial_call=True,
+)
+@sequenced("comparison")
+def update_comparison_graph(station_id_store, scenario_select, current_threshold_store):
+
+    if station_id_store is None or current_threshold_store is None:
+        raise PreventUpdate()
+
+    comparison = load_scenario_comparison(
+        stations.loc[station_id_store], current_threshold_store["key"]
+    )
+    names = {scn["value"]: scn["label"] for scn in options["scenario"]}
+
+    return (
+        figs.typed_arrays(
+            scenario_comparison(comparison, names, scn_focus=scenario_select)
+        ),
+        current_threshold_store["name"],
+        scenario_summary_table(comparison, names),
+    )
+
+
+# -------------------------------------------------------------------------------------
+# THRESHOLD FINDER CALLBACK
+
+
+@app.callback(
+    Output("threshold-finder-result", "children"),
+    Output("threshold-finder-store", "data"),
+    Output("threshold-finder-apply", "disabled"),
+    Input("station-id-store", "data"),
+    Input("scenario-select", "value"),
+    Input("units-toggle", "value"),
+    Input("threshold-finder-days", "value"),
+    Input("threshold-finder-year", "value"),
+    Input("threshold-finder-percentile", "value"),
+)
+@sequenced("finder")
+def update_threshold_finder(
+    station_id_store, scenario_select, units_toggle, days, year, percentile
+):
+
+    if station_id_store is None or days is None or year is None:
+        return "", None, True
+
+    result = threshold_query(station_id_store, scenario_select, days, year, percentile)
+    if result is None:
+        return "No projections for this scenario", None, True
+
+    cm = result["threshold_cm"][0]
+    if cm is None:
+        return "No threshold with that many days", None, True
+
+    units = "ft" if units_toggle else "m"
+    height = round(cm / 100 * (3.281 if units_toggle else 1.0), 2)
+    text = f"{'Above ' if result['above_range'][0] else ''}{height} {units}"
+
+    return text, cm, False
 
 
 # -------------------------------------------------------------------------------------
@@ -921,127 +1132,12 @@ def update_slr_graph(
 
         slr_graph = slr_projection(slr, scn_focus=scenario_select, units=units_toggle)
 
-        scn_fullname = slr["names"][scenario_select]
-
-        slr_year = 2100 if scenario_select != "traj" else 2050
-
-        years_key = "traj" if scenario_select == "traj" else "scenarios"
-        slr_by_year = [
-            v
-            for y, v in zip(
-                slr["scenarios"]["years"][years_key],
-                slr["scenarios"]["values"][scenario_select]["50"],
-            )
-            if y == slr_year
-        ][0]
-        slr_by_year = slr_by_year * 3.28084 if units_toggle == "ft" else slr_by_year
-        slr_by_year = str(int(100 * slr_by_year) / 100) + " " + units_toggle
-
-        slr_table_data = pd.DataFrame(
-            {
-                s: slr["scenarios"]["values"][s]["50"]
-                for s in slr["names"]
-                if s != "traj"
-            },
-            index=slr["scenarios"]["years"]["scenarios"],
-        )
-        if "traj" in slr["names"]:
-            slr_table_data["traj"] = pd.Series(
-                slr["scenarios"]["values"]["traj"]["50"],
-                index=slr["scenarios"]["years"]["traj"],
-            )
-
-        slr_table_data = (slr_table_data.loc[[2050, 2075, 2100], :].T).round(2)
-        slr_table_data = (
-            slr_table_data.astype(str).replace("nan", "–") + " " + units_toggle
-        )
-        slr_table_data["Scenario"] = [slr["names"][s] for s in slr_table_data.index]
-        slr_table_data["id"] = [s for s in slr_table_data.index]
-        slr_table_data = slr_table_data.loc[:, ["id", "Scenario", 2050, 2100]]
-
-        scn_index = ["low", "int_low", "int", "int_high", "high", "traj"]
-        prb_table = pd.DataFrame(
-            {
-                "3ºC GSW": [">99%", "82%", "5%", "<1%", "<1%", "-%"],
-                "5ºC GSW": [">99%", "97%", "10%", "1%", "<1%", "-%"],
-                "VHE/LCP": [">99%", "96%", "49%", "20%", "8%", "-%"],
-            },
-            index=scn_index,
-        )
-
-        for c in prb_table.columns:
-            slr_table_data[c] = prb_table.loc[slr_table_data.index, c]
-
-        slr_table_data = slr_table_data.to_dict("records")
-
-        # options_slr_table_data = slr_table_data.loc[
-        #     slr_table_data.index == scenario_select, [2050, 2100]
-        # ]
-
-        # options_slr_table_data = options_slr_table_data.to_dict("records")
-
-        lkhd_table = pd.DataFrame(
-            {
-                "3ºC GSW": [
-                    "virtually certain",
-                    "likely",
-                    "very unlikely",
-                    "exceptionally unlikely",
-                    "exceptionally unlikely",
-                    "N/A",
-                ],
-                "5ºC GSW": [
-                    "virtually certain",
-                    "very likely",
-                    "very unlikely",
-                    "exceptionally unlikely",
-                    "exceptionally unlikely",
-                    "N/A",
-                ],
-                "VHE/LCP": [
-                    "virtually certain",
-                    "very likely",
-                    "about as likely as not",
-                    "unlikely",
-                    "very unlikely",
-                    "N/A",
-                ],
-            },
-            index=scn_index,
-        )
-
-        lkhd_prb = {
-            "virtually certain": "99–100% chance",
-            "very likely": "90–100% chance",
-            "likely": "66–100% chance",
-            "about as likely as not": "33–66% chance",
-            "unlikely": "0–33% chance",
-            "very unlikely": "0–10% chance",
-            "exceptionally unlikely": "0–1% chance",
-        }
-
-        if scenario_select == "traj":
-            slr_likelihood = "Likelihoods are not evaluated for Observed Trajectories."
-        else:
-            l3deg = lkhd_table.loc[scenario_select, "3ºC GSW"]
-            l5deg = lkhd_table.loc[scenario_select, "5ºC GSW"]
-            lmici = lkhd_table.loc[scenario_select, "VHE/LCP"]
-            slr_likelihood = [
-                dcc.Markdown(
-                    [
-                        f"The [2022 U.S. Interagency Task Force (ITF) report](https://oceanservice.noaa.gov/hazards/sealevelrise/sealevelrise-tech-report-sections.html) provides the likelihood that *global* mean sea level will meet or exceed the ITF scenarios given various levels of global warming/emissions from [IPCC AR6 ](https://www.ipcc.ch/assessment-report/ar6/) climate models. Note that the likelihood of *local* mean sea level meeting or exceeding a given *local* scenario may differ slightly from the global likelihoods, but the global likelihoods provide a general sense of how likely the scenarios are under various future conditions. The likelihood that *global* sea-level rise will meet or exceed the selected **{scn_fullname} Scenario** by 2100 is ... ",
-                    ],
-                    link_target="_blank",
-                ),
-                dcc.Markdown(
-                    id="slr-likelihood-bullets",
-                    children=[
-                        f"- ***{l3deg.capitalize()}*** for 3ºC of global average surface warming ({lkhd_prb[l3deg]})\*",
-                        f"- ***{l5deg.capitalize()}*** for 5ºC of global average surface warming ({lkhd_prb[l3deg]})\*",
-                        f"- ***{lmici.capitalize()}*** for very high greenhouse gas emissions** when including the potential for marine ice cliff instability ({lkhd_prb[lmici]})\*",
-                    ],
-                ),
-            ]
+        # precomputed per station and units by data/slr_summary.py
+        summary = load_slr_summary(station_id_store)
+        slr_year = summary["year"][scenario_select]
+        slr_by_year = summary[units_toggle]["by_year"][scenario_select]
+        slr_table_data = summary[units_toggle]["table"]
+        slr_likelihood = slr_likelihood_text(summary["likelihood"][scenario_select])
 
         return (
             slr_graph,
@@ -1078,14 +1174,14 @@ def update_slr_graph(
 def update_slr_budget_graph(
     slr_hover,
     slr_click,
-    budget_json,
+    budget_data,
     # budget_year_input,
     scenario_select,
     units_toggle,
     budget_year_store,
 ):
 
-    if budget_json is not None:
+    if budget_data is not None:
 
         units_toggle = "ft" if units_toggle else "m"
         trigger = dash.callback_context.triggered[0]["prop_id"]
@@ -1109,10 +1205,8 @@ def update_slr_budget_graph(
             else (2100 if budget_year > 2100 else budget_year)
         )
 
-        budget_dict = json.loads(budget_json)
-
         slr_budget_graph = slr_budget(
-            budget_dict,
+            budget_from_store(budget_data),
             year_focus=budget_year,
             scn_focus=scenario_select,
             units=units_toggle,
@@ -1206,6 +1300,122 @@ def toggle_modal(close_clicks, instructions_clicks, station_id_store):
         raise PreventUpdate()
 
 
+# -------------------------------------------------------------------------------------
+# API
+# JSON endpoints served by the Flask server alongside the Dash callbacks.
+
+scenario_values = [scn["value"] for scn in options["scenario"]]
+
+
+@app.server.route("/prerendered/<station_id>/<path:name>.json")
+def prerendered_api(station_id, name):
+    """Pre-rendered callback outputs (data/prerender.py), gzip-encoded as stored."""
+
+    response = flask.send_from_directory(
+        os.path.abspath(PRERENDERED_DIR),
+        f"{station_id}/{name}.json.gz",
+        mimetype="application/json",
+        max_age=86400,
+    )
+    response.headers["Content-Encoding"] = "gzip"
+    response.headers["Vary"] = "Accept-Encoding"
+
+    return response
+
+
+@app.server.route("/api/threshold-sweep/<station_id>/<scenario>/<int:year>")
+def threshold_sweep_api(station_id, scenario, year):
+    """Percentiles of flooding days in a year at every threshold (cm above MHHW)."""
+
+    scenario = scenario.replace("-", "_")
+    if station_id not in stations.index or scenario not in scenario_values:
+        flask.abort(404)
+
+    sweep = threshold_sweep_data(station_id, scenario, year)
+    if sweep is None:
+        flask.abort(404)
+
+    return app.server.response_class(figs.to_json(sweep), mimetype="application/json")
+
+
+@app.server.route("/api/threshold-query/<station_id>/<scenario>")
+def threshold_query_api(station_id, scenario):
+    """Highest threshold (cm above MHHW) with at least ?days= flooding days per year,
+    for each year from ?start= to ?end= (default 2020-2100, within the years of the
+    projection), at ?percentile= (default 50)."""
+
+    scenario = scenario.replace("-", "_")
+    if station_id not in stations.index or scenario not in scenario_values:
+        flask.abort(404)
+
+    span = projection_years(station_id, scenario)
+    if span is None:
+        flask.abort(404)
+
+    args = flask.request.args
+    if "days" not in args:
+        flask.abort(400, description="days is required")
+
+    try:
+        days = int(args["days"])
+        start = int(args.get("start", max(2020, span[0])))
+        end = int(args.get("end", min(2100, span[1])))
+        if not span[0] <= start <= end <= span[1]:
+            raise ValueError(
+                f"start and end must be years from {span[0]} to {span[1]}, "
+                + "start no later than end"
+            )
+        result = threshold_query(
+            station_id,
+            scenario,
+            days,
+            range(start, end + 1),
+            int(args.get("percentile", 50)),
+        )
+    except ValueError as err:
+        flask.abort(400, description=str(err))
+
+    return flask.jsonify(result)
+
+
+@app.server.route("/api/slr-budget/<station_id>/<scenario>")
+def slr_budget_api(station_id, scenario):
+    """Figure of the contributions to SLR of a scenario in every year, in ?units= ft
+    (default) or m."""
+
+    scenario = scenario.replace("-", "_")
+    if station_id not in stations.index or scenario not in scenario_values:
+        flask.abort(404)
+
+    units = flask.request.args.get("units", "ft")
+    if units not in ["ft", "m"]:
+        flask.abort(400, description="units must be ft or m")
+
+    fig = slr_budget_over_time(load_slr_budget(station_id), scenario, units)
+
+    return app.server.response_class(
+        figs.to_json(figs.typed_arrays(fig)), mimetype="application/json"
+    )
+
+
+@app.server.route("/api/station-data-stats")
+def station_data_stats():
+    """Occupancy and hit ratio of each tier of the station data manager."""
+    return flask.jsonify(station_data.stats())
+
+
+@app.server.route("/api/single-flight-stats")
+def single_flight_stats():
+    """Loads and figure builds shared by concurrent requests, with waiters per key."""
+    return flask.jsonify(single_flight.stats())
+
+
+@app.server.route("/api/request-sequence-stats")
+def request_sequence_stats():
+    """Counts of sequenced callback requests completed and dropped as superseded."""
+    return flask.jsonify(sequencer.stats())
+
+
 # -------------------------------------------------------------------------------------
 
 if __name__ == "__main__":
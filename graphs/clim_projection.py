@@ -1,23 +1,51 @@
-import plotly.graph_objects as go
+import numpy as np
+
 import graphs.analysis as anlyz
+import graphs.figures as figs
+
+
+def clim_store(clim):
+    """Monthly percentiles of every year for the clim-prjn-data-store, as one
+    (year, percentile, month) array."""
+
+    if not isinstance(clim, dict):
+        return clim
+
+    years = list(clim)
+    pcts = list(clim[years[0]])
+    values = np.array([[clim[y][p] for p in pcts] for y in years])
+
+    typed = figs.typed_array(values) if figs.TYPED_ARRAYS else None
+    return {
+        "years": years,
+        "percentiles": pcts,
+        "values": values.tolist() if typed is None else typed,
+    }
+
+
+def clim_from_store(store):
+    """The monthly percentiles of the clim-prjn-data-store, by year and percentile."""
+
+    if not isinstance(store, dict) or "values" not in store:
+        return store
+
+    values = np.asarray(figs.from_typed(store["values"]))
+    return {
+        y: {p: values[n, k] for k, p in enumerate(store["percentiles"])}
+        for n, y in enumerate(store["years"])
+    }
 
 
 def clim_projection(clim, year):
 
     if clim is None or clim == "no projection" or str(year) not in clim:
-        fig = go.Figure()
-        fig.update_xaxes(visible=False)
-        fig.update_yaxes(visible=False)
-        fig.update_layout(template="none")
-        return fig
+        return figs.blank_figure()
 
     clim = clim[str(year)]
 
     col = anlyz.color_palette()
     col = [col[n] for n in [1, 5]]
 
-    fig = go.Figure()
-
     # mo_labels = ["J", "F", "M", "A", "M", "J", "J", "A", "S", "O", "N", "D"]
     mo_labels = [
         "Jan",
@@ -39,32 +67,28 @@ def clim_projection(clim, year):
     # annotations, shapes = projection_annotations(
     #     prjn, stn_meta[n], r, vspace, sph, col
     # )
-    for trc in traces:
-        fig.add_trace(trc)
     # for ann in annotations:
     #     fig.add_annotation(ann)
     # for shp in shapes:
     #     fig.add_shape(shp)
 
-    fig.update_xaxes(
-        title_text="Flooding days per month",
-        range=[-2, 32],  # max(clim["90"]) + 2],
-        titlefont=dict(size=15),
-    )
-    fig.update_yaxes(
-        range=[-0.25, 13.0],
-        tickmode="array",
-        tickvals=[m for m in range(1, 13)],
-        ticktext=mo_labels,
-        side="right",
-    )
-
-    fig.update_layout(
-        template="none",
+    fig_layout = figs.layout(
         margin=dict(l=10, r=30, b=41, t=30, pad=0),
         font=dict(size=14),
-        yaxis=dict(layer="below traces",),
-        xaxis=dict(layer="below traces", zeroline=False,),
+        yaxis=dict(
+            layer="below traces",
+            range=[-0.25, 13.0],
+            tickmode="array",
+            tickvals=[m for m in range(1, 13)],
+            ticktext=mo_labels,
+            side="right",
+        ),
+        xaxis=dict(
+            layer="below traces",
+            zeroline=False,
+            title=dict(text="Flooding days per month", font=dict(size=15)),
+            range=[-2, 32],  # max(clim["90"]) + 2],
+        ),
         hovermode="y",
         # legend=False,
         # legend=dict(
@@ -82,6 +106,8 @@ def clim_projection(clim, year):
         # ),
     )
 
+    fig = figs.figure(traces, fig_layout)
+
     return fig
 
 
@@ -0,0 +1,92 @@
+import numpy as np
+
+# -------------------------------------------------------------------------------------
+# Exact percentiles and exceedance probabilities of integer counts over an ensemble,
+# from a histogram of the counts in each cell (year, month, threshold, ...) instead of
+# the counts of every member. Flooding days are bounded (0-366 in a year, 0-31 in a
+# month), so a cell's histogram has at most a few hundred bins however many members
+# are added, and any percentile or probability of at least n is read from it in one
+# pass over the bins.
+#
+# Members are added a chunk at a time, and histograms of the same cells built
+# separately (by other chunks or other processes) are merged by adding them. The
+# percentiles are those of np.percentile (linear interpolation) over all the members
+# added, to the last bit, so they can replace it without changing any result.
+# -------------------------------------------------------------------------------------
+
+
+class CountHistogram:
+    def __init__(self, shape, max_count):
+        """Histograms of counts 0..max_count in each cell of an array of shape."""
+
+        self.shape = tuple(shape)
+        self.bins = max_count + 1
+        self.hist = np.zeros(self.shape + (self.bins,), dtype=np.int64)
+        self.members = 0
+
+    def add(self, counts):
+        """Add the members (axis 0) of (member, *shape) integer counts."""
+
+        counts = np.asarray(counts)
+        if counts.dtype.kind not in "iu":
+            raise ValueError(f"counts of type {counts.dtype}, not integer")
+        if counts.shape[1:] != self.shape:
+            raise ValueError(f"counts of shape {counts.shape} for cells {self.shape}")
+        if counts.size == 0:
+            return self
+        if counts.min() < 0 or counts.max() >= self.bins:
+            raise ValueError(f"counts outside 0..{self.bins - 1}")
+
+        cells = np.arange(self.hist.size, step=self.bins).reshape(self.shape)
+        self.hist += np.bincount(
+            (cells + counts).reshape(-1), minlength=self.hist.size
+        ).reshape(self.hist.shape)
+        self.members += counts.shape[0]
+
+        return self
+
+    def merge(self, other):
+        """Add the members of another histogram of the same cells."""
+
+        if (other.shape, other.bins) != (self.shape, self.bins):
+            raise ValueError("histograms of different cells or counts")
+        self.hist += other.hist
+        self.members += other.members
+
+        return self
+
+    def order_statistic(self, k):
+        """Count of each cell's member k (0-based) in increasing order of counts."""
+        return (self.hist.cumsum(axis=-1) <= k).sum(axis=-1)
+
+    def percentiles(self, q, scale=1):
+        """Percentiles q of each cell as (percentile, *shape), as np.percentile of the
+        counts divided by scale would give them."""
+
+        if self.members == 0:
+            raise ValueError("no members added")
+
+        cum = self.hist.cumsum(axis=-1)
+        out = []
+        for p in np.true_divide(q, 100):
+            # np.percentile's linear method: the members below and above index h
+            h = (self.members - 1) * p
+            lo = min(int(np.floor(h)), self.members - 1)
+            hi = min(lo + 1, self.members - 1)
+            a = (cum <= lo).sum(axis=-1) / scale
+            b = (cum <= hi).sum(axis=-1) / scale
+            t = h - np.floor(h)
+            out.append(b - (b - a) * (1 - t) if t >= 0.5 else a + (b - a) * t)
+
+        return np.array(out)
+
+    def prob_at_least(self, n):
+        """Share of members with at least n in each cell, for each n: (n, *shape)."""
+
+        above = self.hist[..., ::-1].cumsum(axis=-1)[..., ::-1]
+        return np.array(
+            [
+                above[..., k] / self.members if k < self.bins else np.zeros(self.shape)
+                for k in n
+            ]
+        )
@@ -0,0 +1,303 @@
+import os
+
+import numpy as np
+
+from graphs.observed_flooding import load_day_min_max
+from graphs.slr_projection import load_slr_scenarios
+from graphs.count_histogram import CountHistogram
+
+# -------------------------------------------------------------------------------------
+# Monte Carlo projections of flooding days, in the form of the published files in
+# ./data/ensemble_calcs: annual and monthly percentiles, probabilities of at least N
+# flooding days, pentad statistics and the year of inflection (YOI).
+#
+# Each ensemble member follows one trajectory of the SLR scenario, drawn from the
+# scenario's 17th/50th/83rd percentiles as a split normal distribution, and lives each
+# future year through the daily maxima of a randomly drawn year of the recent record
+# (the last BASELINE_YEARS complete years, a full nodal cycle), taken relative to the
+# linear trend of their average sea level. A day floods if that daily maximum, raised
+# by the member's sea level above SLR_BASE_YEAR, exceeds the threshold. Missing days of
+# the baseline years count as not flooding, and leap days are left out.
+#
+# This stands in for the method of Thompson et al. (2021) used for the published
+# projections (ensembles of tidal and monthly sea level variability with a fitted
+# beta-binomial distribution of flooding days), whose inputs are not part of this
+# repository: it needs only the daily maxima and the SLR scenarios, so projections can
+# be made for new thresholds, stations and scenarios. It does NOT reproduce the
+# published projections, only their form. At Honolulu the annual 5th and 95th
+# percentiles differ from the published ones by 37 and 21 days on average in the
+# worst scenario, and by over 100 days in single years. So the engine writes to
+# ENGINE_DIR, and its output replaces the published files in PUBLISHED_DIR only where
+# the annual percentiles agree within TOLERANCE_DAYS (data/ensemble_calcs.py --publish,
+# data/rebuild.py publish).
+#
+# The daily maxima of each baseline year and month are tabulated once as the number of
+# days above every level on the millimetre grid of the data, so the monthly flooding
+# days of every member, year and threshold are a single lookup. Members are evaluated
+# CHUNK at a time and thresholds THRESHOLD_BLOCK at a time, and each chunk's counts are
+# added to histograms of the counts (graphs/count_histogram.py) from which the
+# percentiles and probabilities are read exactly, so memory does not grow with the
+# number of members. The members' draws are made once per scenario from a seeded
+# generator and shared by all thresholds, so projections are reproducible and
+# consistent from one threshold to the next.
+# -------------------------------------------------------------------------------------
+
+# the engine's output, and the published projections read by the app
+ENGINE_DIR = os.environ.get("FAT_ENSEMBLE_DIR", "./data/ensemble_engine")
+PUBLISHED_DIR = "./data/ensemble_calcs"
+
+# largest difference (days) from the published annual 5th, 50th and 95th percentiles
+# at which the engine's output may replace them
+TOLERANCE_DAYS = 1
+COMPARED_PERCENTILES = ["5", "50", "95"]
+
+MEMBERS = 2000
+CHUNK = 100
+THRESHOLD_BLOCK = 32
+SEED = 0
+
+BASELINE_YEARS = 19
+MIN_COVERAGE = 0.9
+SLR_BASE_YEAR = 2000
+
+# standard normal quantile of the 83rd percentile
+Z83 = 0.9542
+
+PERCENTILES = [5, 10, 17, 50, 83, 90, 95]
+ANNUAL_AT_LEAST = [10, 20, 26, 30, 50, 100]
+MONTHLY_AT_LEAST = [5, 10, 15, 20]
+PENTAD = 5
+
+# a YOI needs at least YOI_MIN_RISE more median flooding days in the decade after it,
+# YOI_FACTOR times the rise in the decade before, while under half of the year floods
+YOI_STEP = 10
+YOI_MIN_RISE = 50
+YOI_FACTOR = 8
+
+
+def baseline_variability(station_id):
+    """Days above every mm level in each month of the baseline years, as (year, month,
+    level) with levels from lo - 1 (mm, relative to the trend of average sea level),
+    and the average sea level at SLR_BASE_YEAR (m above MHHW)."""
+
+    dy = load_day_min_max(station_id).dropna()
+    years = dy.index.year.values
+
+    days = np.bincount(years - years.min())
+    complete = np.flatnonzero(days >= MIN_COVERAGE * 365) + years.min()
+    baseline = complete[-BASELINE_YEARS:]
+
+    # 365-day years, as projected
+    leap_day = (dy.index.month == 2) & (dy.index.day == 29)
+    dy = dy.loc[np.isin(years, baseline) & ~leap_day]
+    t = dy.index.year.values + (dy.index.dayofyear.values - 0.5) / 365.25
+    trend = np.polyfit(t, (dy["max"].values + dy["min"].values) / 2, 1)
+
+    r = np.round(1000 * (dy["max"].values - np.polyval(trend, t))).astype(int)
+    lo, hi = r.min(), r.max()
+
+    k = np.searchsorted(baseline, dy.index.year.values)
+    m = dy.index.month.values - 1
+    hist = np.zeros((baseline.size, 12, hi - lo + 2), dtype=int)
+    np.add.at(hist, (k, m, r - lo), 1)
+    above = hist[:, :, ::-1].cumsum(axis=2)[:, :, ::-1].astype(np.uint8)
+
+    return above, lo, np.polyval(trend, SLR_BASE_YEAR + 0.5)
+
+
+def slr_members(slr, scenario, z):
+    """Sea level above SLR_BASE_YEAR (m) of each member by year, for members at
+    standard normal quantiles z; returns the years and (member, year) values."""
+
+    years = np.array(
+        slr["scenarios"]["years"]["traj" if scenario == "traj" else "scenarios"]
+    )
+    p = {q: np.array(v) for q, v in slr["scenarios"]["values"][scenario].items()}
+    keep = years >= 2020
+
+    spread = np.where(z[:, None] > 0, p["83"] - p["50"], p["50"] - p["17"]) / Z83
+    levels = p["50"][None, :] + z[:, None] * spread
+
+    return years[keep], levels[:, keep]
+
+
+def yoi(years, median):
+    """Year of inflection and the years a decade either side, or None."""
+
+    best, best_acc = None, -np.inf
+    for n in range(YOI_STEP, years.size - YOI_STEP):
+        before = median[n] - median[n - YOI_STEP]
+        after = median[n + YOI_STEP] - median[n]
+        if median[n] >= 365 / 2 or after < YOI_MIN_RISE:
+            continue
+        if after >= YOI_FACTOR * max(before, 1) and after - before > best_acc:
+            best, best_acc = n, after - before
+
+    if best is None:
+        return None
+    return [int(years[best + d]) for d in [-YOI_STEP, 0, YOI_STEP]]
+
+
+def projection_file(directory, station_id, scenario, threshold):
+    return os.path.join(directory, station_id, scenario, f"{threshold:03}.json")
+
+
+def annual_difference(analysis, published):
+    """Absolute differences (days) of the annual COMPARED_PERCENTILES of an analysis
+    from the published one, in the years of both."""
+
+    diff = dict()
+    for p in COMPARED_PERCENTILES:
+        new = np.array(analysis["annual_percentiles"]["percentiles"][p])
+        old = np.array(published["annual_percentiles"]["percentiles"][p])
+        n = min(new.size, old.size)
+        diff[p] = np.abs(new[:n] - old[:n])
+
+    return diff
+
+
+def percentiles(hist, scale=1):
+    """Rounded percentiles over members of a CountHistogram, as (percentile, ...)."""
+    return np.round(hist.percentiles(PERCENTILES, scale)).astype(int)
+
+
+def probabilities(hist, first, at_least):
+    """Chance of at least n in a year, and of a year being the first with at least
+    n, from a CountHistogram and first_years summed over members: (n, year, ...)."""
+
+    prob = hist.prob_at_least(at_least)
+    return np.round(prob, 3), np.round(first / hist.members, 3)
+
+
+def first_years(counts, at_least):
+    """Members whose first year with at least n is each year, over the members of
+    (member, year, ...) counts: (n, year, ...)."""
+
+    first = []
+    for n in at_least:
+        ever = np.logical_or.accumulate(counts >= n, axis=1)
+        ever[:, 1:] &= ~ever[:, :-1]
+        first.append(ever.sum(axis=0))
+
+    return np.array(first)
+
+
+def ensemble_projection(
+    station_id, scenario, thresholds, members=MEMBERS, seed=SEED,
+):
+    """Projections of a station and scenario for a list of thresholds (cm above
+    MHHW), yielded as (threshold, analysis) in the form of the published files."""
+
+    above, lo, msl_base = baseline_variability(station_id)
+    n_base, _, n_levels = above.shape
+    above = above.reshape(-1)
+
+    rng = np.random.default_rng(seed)
+    z = rng.standard_normal(members)
+    years, slr = slr_members(load_slr_scenarios(station_id), scenario, z)
+    base_year = rng.integers(0, n_base, (members, years.size))
+
+    # a day floods if its baseline maximum exceeds threshold - offset (mm)
+    offset = 1000 * (msl_base + slr)
+    months = np.arange(12)
+    rows = (base_year[:, :, None] * 12 + months) * n_levels
+
+    # pentads start every PENTAD years up to 2095; the observed trajectory's last one
+    # is 2050 alone
+    pentads = [n for n in range(0, years.size, PENTAD) if years[n] < 2100]
+    months_per_pentad = np.array([12 * years[n : n + PENTAD].size for n in pentads])
+
+    for b in range(0, len(thresholds), THRESHOLD_BLOCK):
+
+        block = np.asarray(thresholds[b : b + THRESHOLD_BLOCK])
+        t_mm = 10 * block
+
+        cells = (years.size, block.size)
+        pent_cells = (len(pentads), block.size)
+        monthly_h = CountHistogram((years.size, 12, block.size), 31)
+        annual_h = CountHistogram(cells, 366)
+        max_month_h = CountHistogram(cells, 31)
+        pent_sum_h = CountHistogram(pent_cells, 31 * 12 * PENTAD)
+        pent_mxmo_h = CountHistogram(pent_cells, 31)
+        pent_mxssn_h = CountHistogram(pent_cells, 3 * 31)
+        annual_first = np.zeros((len(ANNUAL_AT_LEAST),) + cells, dtype=int)
+        monthly_first = np.zeros((len(MONTHLY_AT_LEAST),) + cells, dtype=int)
+
+        for c in range(0, members, CHUNK):
+
+            # monthly flooding days: (member, year, month, threshold)
+            level = t_mm[None, None, :] - offset[c : c + CHUNK, :, None]
+            n = (np.floor(level).astype(int) - lo + 1).clip(0, n_levels - 1)
+            monthly = above[rows[c : c + CHUNK, :, :, None] + n[:, :, None, :]]
+
+            annual = monthly.sum(axis=2, dtype=np.int16)
+            max_month = monthly.max(axis=2)
+            monthly_h.add(monthly)
+            annual_h.add(annual)
+            max_month_h.add(max_month)
+            annual_first += first_years(annual, ANNUAL_AT_LEAST)
+            monthly_first += first_years(max_month, MONTHLY_AT_LEAST)
+
+            # pentads: mean month, most extreme month and most extreme 3-month season
+            pent_sum, pent_mxmo, pent_mxssn = [], [], []
+            for n in pentads:
+                pent = monthly[:, n : n + PENTAD].astype(np.int16)
+                pent = pent.reshape(pent.shape[0], -1, block.size)
+                season = pent[:, :-2] + pent[:, 1:-1] + pent[:, 2:]
+                pent_sum.append(pent.sum(axis=1))
+                pent_mxmo.append(pent.max(axis=1))
+                pent_mxssn.append(season.max(axis=1))
+            pent_sum_h.add(np.stack(pent_sum, axis=1))
+            pent_mxmo_h.add(np.stack(pent_mxmo, axis=1))
+            pent_mxssn_h.add(np.stack(pent_mxssn, axis=1))
+
+        annual_pct = percentiles(annual_h)
+        monthly_pct = percentiles(monthly_h)
+        annual_prob = probabilities(annual_h, annual_first, ANNUAL_AT_LEAST)
+        monthly_prob = probabilities(max_month_h, monthly_first, MONTHLY_AT_LEAST)
+        pent_avg = percentiles(pent_sum_h, months_per_pentad[:, None])
+        pent_mxmo = percentiles(pent_mxmo_h)
+        pent_mxssn = percentiles(pent_mxssn_h, 3)
+
+        yrs = years.tolist()
+        pent_yrs = years[pentads].tolist()
+        for i, t in enumerate(block):
+
+            def pct(values):
+                return {f"{p}": v.tolist() for p, v in zip(PERCENTILES, values)}
+
+            def prob(values, at_least):
+                return {f"{n}": v.tolist() for n, v in zip(at_least, values)}
+
+            yield int(t), {
+                "monthly_percentiles": {
+                    f"{y}": pct(monthly_pct[:, n, :, i]) for n, y in enumerate(yrs)
+                },
+                "monthly_probabilities": {
+                    "years": yrs,
+                    "prob_at_least_n": prob(monthly_prob[0][:, :, i], MONTHLY_AT_LEAST),
+                    "prob_first_year": prob(monthly_prob[1][:, :, i], MONTHLY_AT_LEAST),
+                },
+                "annual_percentiles": {
+                    "years": yrs,
+                    "percentiles": pct(annual_pct[:, :, i]),
+                },
+                "yoi": yoi(years, annual_pct[PERCENTILES.index(50), :, i]),
+                "annual_probabilities": {
+                    "years": yrs,
+                    "prob_at_least_n": prob(annual_prob[0][:, :, i], ANNUAL_AT_LEAST),
+                    "prob_first_year": prob(annual_prob[1][:, :, i], ANNUAL_AT_LEAST),
+                },
+                "pentad_mean_month_percentiles": {
+                    "pentads": pent_yrs,
+                    "percentiles": pct(pent_avg[:, :, i]),
+                },
+                "pentad_max_month_percentiles": {
+                    "pentads": pent_yrs,
+                    "percentiles": pct(pent_mxmo[:, :, i]),
+                },
+                "pentad_max_season_percentiles": {
+                    "pentads": pent_yrs,
+                    "percentiles": pct(pent_mxssn[:, :, i]),
+                },
+            }
@@ -0,0 +1,322 @@
+import os
+import base64
+
+import numpy as np
+import pandas as pd
+import orjson
+import plotly.io as pio
+
+# -------------------------------------------------------------------------------------
+# Plain-dict figure construction. The graph modules build figures as dicts instead of
+# go.Figure objects, so that adding traces and updating the layout does not go through
+# Plotly's property validators. Anything a go.Figure would have resolved for us (the
+# named template, subplot axes, hlines) is resolved here once and reused.
+# -------------------------------------------------------------------------------------
+
+# the "none" template expanded to the object plotly.js expects; go.Figure performs
+# this lookup on every update_layout(template="none") call
+TEMPLATE = pio.templates["none"].to_plotly_json()
+
+MODEBAR = dict(
+    remove=["toImage", "lasso", "select", "zoomIn", "zoomOut"],
+    orientation="h",
+    color="#333333",
+)
+
+
+def compact(obj):
+    """Drop None-valued keys from (nested) dicts, as go.Figure does on validation.
+    Lists are left alone so that missing values in data arrays are preserved."""
+
+    if isinstance(obj, dict):
+        return {k: compact(v) for k, v in obj.items() if v is not None}
+    if isinstance(obj, list) and len(obj) > 0 and isinstance(obj[0], dict):
+        return [compact(v) for v in obj]
+    return obj
+
+
+def trace(trc, trace_type="scatter"):
+    trc = compact(trc)
+    if "type" not in trc:
+        trc["type"] = trace_type
+    return trc
+
+
+def layout(**kwargs):
+    return {"template": TEMPLATE, **compact(kwargs)}
+
+
+def figure(data, fig_layout):
+    return {"data": [trace(trc) for trc in data], "layout": fig_layout}
+
+
+def blank_figure(text=None):
+
+    fig_layout = layout(xaxis=dict(visible=False), yaxis=dict(visible=False))
+
+    if text is not None:
+        fig_layout["annotations"] = [
+            {
+                "x": 0.5,
+                "y": 0.5,
+                "text": text,
+                "xref": "paper",
+                "yref": "paper",
+                "xanchor": "center",
+                "yanchor": "middle",
+                "showarrow": False,
+            }
+        ]
+
+    return {"data": [], "layout": fig_layout}
+
+
+def stacked_rows(row_heights, vertical_spacing):
+    """Axes for a single-column, shared-x subplot grid; equivalent to the layout
+    produced by make_subplots(rows=len(row_heights), cols=1, shared_xaxes=True)."""
+
+    nrows = len(row_heights)
+    avail = 1 - vertical_spacing * (nrows - 1)
+    heights = [avail * h / sum(row_heights) for h in row_heights]
+
+    axes = dict()
+    top = 1.0
+    for r, h in enumerate(heights):
+        sfx = "" if r == 0 else str(r + 1)
+        bottom = 0.0 if r == nrows - 1 else top - h
+        axes["xaxis" + sfx] = dict(anchor="y" + sfx, domain=[0.0, 1.0])
+        axes["yaxis" + sfx] = dict(anchor="x" + sfx, domain=[bottom, top])
+        if r < nrows - 1:
+            axes["xaxis" + sfx]["matches"] = "x" + str(nrows)
+            axes["xaxis" + sfx]["showticklabels"] = False
+        top = bottom - vertical_spacing
+
+    return axes
+
+
+def hline(y, line, layer="above", row=1):
+    sfx = "" if row == 1 else str(row)
+    return dict(
+        type="line",
+        layer=layer,
+        line=compact(line),
+        x0=0,
+        x1=1,
+        xref="x" + sfx + " domain",
+        y0=y,
+        y1=y,
+        yref="y" + sfx,
+    )
+
+
+# -------------------------------------------------------------------------------------
+# serialization
+
+
+def rounded(values, decimals, factor=1.0):
+    """Scale and round an array-like of floats to a fixed number of decimals,
+    returning a numpy array so that serialization does not go through Python
+    floats one at a time. Results match Python's round()."""
+
+    x = np.asarray(values, dtype=float) * factor
+    r = np.round(x, decimals)
+
+    # np.round rounds the scaled binary value, so values that sit (nearly) halfway
+    # between two decimals can come out differently than round(); redo just those
+    scaled = x * 10.0 ** decimals
+    halfway = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if halfway.any():
+        r[halfway] = [round(v, decimals) for v in x[halfway].tolist()]
+
+    return r
+
+
+def _default(obj):
+    if isinstance(obj, (pd.Timestamp, np.datetime64)):
+        return pd.Timestamp(obj).isoformat()
+    if isinstance(obj, (pd.Index, pd.Series)):
+        return obj.to_numpy().tolist()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if hasattr(obj, "to_plotly_json"):
+        return obj.to_plotly_json()
+    raise TypeError
+
+
+def to_json(fig):
+    """Serialize a figure (or any JSON-like structure containing numpy arrays) to
+    bytes with orjson, which encodes numpy arrays natively."""
+    return orjson.dumps(
+        fig,
+        default=_default,
+        option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+    )
+
+
+# -------------------------------------------------------------------------------------
+# typed arrays
+#
+# Numeric arrays are sent to the browser as plotly.js typed arrays ({"dtype", "bdata",
+# "shape"}, the bytes in base64) instead of JSON number lists: a fraction of the size,
+# and decoded without parsing one number at a time. plotly.js reads them in figures
+# from version 2.28, served by Dash from 2.13 on (requirements.txt pins versions that
+# do; older versions of Dash bundle an older plotly.js, and get JSON lists); the
+# callbacks that read a Store holding typed arrays decode them with from_typed. Set
+# FAT_TYPED_ARRAYS=off to send JSON lists.
+#
+# Integer arrays, and float arrays of whole numbers, go in the smallest integer type
+# that holds them. Other floats go as float32 in traces that are drawn but not
+# hovered, and as JSON where their digits may be shown. Dates on date axes go as
+# milliseconds since the epoch. Arrays that are shorter as JSON stay JSON.
+# -------------------------------------------------------------------------------------
+
+# arrays shorter than this are left as JSON
+TYPED_MIN_SIZE = 16
+
+INT_TYPES = [np.uint8, np.int8, np.uint16, np.int16, np.uint32, np.int32]
+
+
+def _version(v):
+    return tuple(int(n) for n in v.split(".")[:2])
+
+
+def _plotlyjs_reads_typed_arrays():
+    import dash
+    from plotly.offline import get_plotlyjs_version
+
+    return _version(dash.__version__) >= (2, 13) and _version(
+        get_plotlyjs_version()
+    ) >= (2, 28)
+
+
+TYPED_ARRAYS = (
+    os.environ.get("FAT_TYPED_ARRAYS", "on") != "off" and _plotlyjs_reads_typed_arrays()
+)
+
+
+def typed_array(values, floats="f8"):
+    """An array as a typed array: integers in the smallest type that holds them,
+    other floats as floats (f8 or f4). None if floats is None, the values are not
+    numeric, or the typed array would be longer than the JSON list."""
+
+    a = np.asarray(values)
+    if a.size < TYPED_MIN_SIZE or a.dtype.kind not in "biuf":
+        return None
+
+    lo, hi = (a.min(), a.max()) if np.isfinite(a).all() else (None, None)
+    whole = lo is not None and (a.dtype.kind != "f" or (a == np.round(a)).all())
+    int_type = next(
+        (
+            t
+            for t in INT_TYPES
+            if whole and np.iinfo(t).min <= lo and hi <= np.iinfo(t).max
+        ),
+        None,
+    )
+    if int_type is not None:
+        a = a.astype(int_type)
+    elif floats is not None:
+        a = a.astype(floats)
+    else:
+        return None
+
+    a = a.astype(a.dtype.newbyteorder("<"), copy=False)
+    bdata = base64.b64encode(np.ascontiguousarray(a).tobytes()).decode()
+    # short numbers (small integers, floats of few decimals) are shorter as JSON
+    if len(bdata) >= len(to_json(np.asarray(values))):
+        return None
+
+    typed = {"dtype": a.dtype.str[1:], "bdata": bdata}
+    if a.ndim > 1:
+        typed["shape"] = ",".join(str(n) for n in a.shape)
+
+    return typed
+
+
+def from_typed(obj):
+    """A JSON-like structure with its typed arrays decoded to numpy arrays."""
+
+    if isinstance(obj, dict):
+        if "bdata" in obj and "dtype" in obj:
+            a = np.frombuffer(base64.b64decode(obj["bdata"]), dtype="<" + obj["dtype"])
+            if "shape" in obj:
+                a = a.reshape([int(n) for n in str(obj["shape"]).split(",")])
+            return a
+        return {k: from_typed(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [from_typed(v) for v in obj]
+    return obj
+
+
+def _date_axes(fig):
+    return {
+        name.replace("axis", "")
+        for name, axis in fig.get("layout", dict()).items()
+        if name[1:5] == "axis" and isinstance(axis, dict) and axis.get("type") == "date"
+    }
+
+
+def typed_arrays(fig):
+    """A figure with the numeric arrays of its traces as typed arrays (where
+    TYPED_ARRAYS); the figure itself is left as it is."""
+
+    if not TYPED_ARRAYS or not isinstance(fig, dict) or "data" not in fig:
+        return fig
+
+    date_axes = _date_axes(fig)
+
+    def typed(trc, key, v, floats):
+        if isinstance(v, dict):
+            return {k: typed(trc, k, w, floats) for k, w in v.items()}
+        if not isinstance(v, (np.ndarray, pd.Index, pd.Series)):
+            return v
+        a = np.asarray(v)
+        if a.dtype.kind == "M":
+            if key not in ["x", "y"] or trc.get(key + "axis", key) not in date_axes:
+                return v
+            if np.isnat(a).any():
+                return v
+            a = a.astype("datetime64[ms]").astype(np.int64).astype(float)
+            floats = "f8"
+        t = typed_array(a, floats)
+        return v if t is None else t
+
+    data = [
+        {
+            k: typed(trc, k, v, "f4" if trc.get("hoverinfo") == "none" else None)
+            for k, v in trc.items()
+        }
+        for trc in fig["data"]
+    ]
+
+    return {**fig, "data": data}
+
+
+def figure_arrays(fig):
+    """A figure parsed from JSON with the numeric lists of its traces, and the dates
+    on its date axes, as numpy arrays, as typed_arrays finds them in figures built
+    live."""
+
+    if not isinstance(fig, dict) or "data" not in fig:
+        return fig
+
+    date_axes = _date_axes(fig)
+
+    def arrays(trc, key, v):
+        if isinstance(v, dict):
+            return {k: arrays(trc, k, w) for k, w in v.items()}
+        if not isinstance(v, list) or len(v) < TYPED_MIN_SIZE:
+            return v
+        date = key in ["x", "y"] and trc.get(key + "axis", key) in date_axes
+        try:
+            a = np.array(v, dtype="datetime64[ms]" if date else None)
+        except (TypeError, ValueError):
+            return v
+        # dates with gaps are left as they are, as typed_arrays leaves them
+        if a.dtype.kind == "M" and np.isnat(a).any():
+            return v
+        return a if a.dtype.kind in "biufM" else v
+
+    data = [{k: arrays(trc, k, v) for k, v in trc.items()} for trc in fig["data"]]
+
+    return {**fig, "data": data}
@@ -1,9 +1,14 @@
 import numpy as np
-import pandas as pd
-import plotly.graph_objects as go
 import graphs.analysis as anlyz
+import graphs.figures as figs
+from graphs.projection_data import ProjectionData, JsonSource
+from graphs.projection_store import load_stored_projection
+from graphs.station_data import station_data, file_digest
+from graphs.pentad_projection import pentad_projection
+from graphs.request_sequence import checkpoint
 import os
 import json
+from concurrent.futures import ThreadPoolExecutor
 
 from dash import dcc, html
 import dash_bootstrap_components as dbc
@@ -11,125 +16,171 @@ import dash_bootstrap_components as dbc
 
 def load_projection_data(station, scenario, threshold):
 
-    filename = f"./data/ensemble_calcs/{station['id']}/{scenario}/{threshold}.json"
+    # compact store if it has been built, otherwise the JSON calculations
+    data = load_stored_projection(station["id"], scenario, threshold)
 
-    if not os.path.exists(filename):
-        return None, None, None, None
+    if data is None:
 
-    with open(filename, "r") as f:
-        analysis = json.load(f)
+        source = station_data.get(
+            ("projection_json", station["id"], scenario, threshold),
+            lambda: read_projection_json(station["id"], scenario, threshold),
+        )
+
+        if source is None:
+            return None, None, None
+
+        data = ProjectionData(scenario, threshold, source)
 
     meta = {
         **station,
-        **{"threshold": threshold, "scenario": scenario, "steps": analysis["yoi"]},
+        **{"threshold": threshold, "scenario": scenario, "steps": data.yoi},
     }
 
-    p = analysis["annual_percentiles"]
-    prjn = pd.DataFrame(p["percentiles"], index=p["years"])
-    prjn.columns = [int(c) for c in prjn.columns]
+    facts = load_narrative_facts(station["id"], scenario, threshold)
+    if facts is None:
+        facts = narrative_facts(data)
 
-    clim = analysis["monthly_percentiles"]
+    return meta, data, facts
 
-    pent_quantities = {
-        "pent_avg": "pentad_mean_month_percentiles",
-        "pent_mxssn": "pentad_max_season_percentiles",
-        "pent_mxmo": "pentad_max_month_percentiles",
-    }
-    pent = dict()
-    for q in pent_quantities:
-        p = analysis[pent_quantities[q]]
-        pent[q] = pd.DataFrame(p["percentiles"], index=p["pentads"])
-        pent[q].columns = [int(c) for c in pent[q].columns]
-
-    prob = dict(
-        annual=dict(
-            at_least=pd.DataFrame(
-                analysis["annual_probabilities"]["prob_at_least_n"],
-                index=analysis["annual_probabilities"]["years"],
-            ),
-            first_yr=pd.DataFrame(
-                analysis["annual_probabilities"]["prob_first_year"],
-                index=analysis["annual_probabilities"]["years"],
-            ),
-        ),
-        amonthly=dict(
-            at_least=pd.DataFrame(
-                analysis["monthly_probabilities"]["prob_at_least_n"],
-                index=analysis["monthly_probabilities"]["years"],
-            ),
-            first_yr=pd.DataFrame(
-                analysis["monthly_probabilities"]["prob_first_year"],
-                index=analysis["monthly_probabilities"]["years"],
-            ),
-        ),
+
+def load_projection_blocks(station, scenario, threshold, blocks=("annual",)):
+    """load_projection_data() with the given blocks decoded up front."""
+
+    meta, data, facts = load_projection_data(station, scenario, threshold)
+    if data is not None:
+        for block in blocks:
+            getattr(data, block)
+
+    return meta, data, facts
+
+
+def load_projection_batch(station, requests, blocks=("annual",)):
+    """load_projection_blocks() for several (scenario, threshold) pairs at once, loaded
+    concurrently; returns a dict keyed by pair."""
+
+    requests = list(requests)
+    with ThreadPoolExecutor(max_workers=max(len(requests), 1)) as pool:
+        loaded = pool.map(
+            lambda r: load_projection_blocks(station, *r, blocks=blocks), requests
+        )
+        return dict(zip(requests, loaded))
+
+
+def htf_figures(station, scenario, threshold, yoi_toggle):
+    """Graphs and analysis text of the projected flooding page: the htf graph, the
+    monthly percentiles for the climatology graph, the pentad graph, the two text
+    blocks and the style of the YOI section."""
+
+    meta, data, facts = load_projection_data(station, scenario, threshold)
+
+    # stop here if a newer request for this graph has come in
+    checkpoint()
+
+    meta["steps_xd"] = (
+        [data.annual.at(s, 50) for s in meta["steps"]]
+        if meta["steps"] is not None
+        else None
     )
 
-    return meta, prjn, clim, pent, prob
+    display_yoi = {"display": "block" if meta["steps"] is not None else "none"}
+
+    htf_graph, yr_lims = htf_projection(meta, data.annual, yoi_toggle)
+    pent_graph = pentad_projection(meta, data, yr_lims)
+    htf_content, xtrm_content = htf_analysis_text(meta, facts)
+
+    return htf_graph, data.clim, pent_graph, htf_content, xtrm_content, display_yoi
+
+
+def projection_json_file(station_id, scenario, threshold):
+    return f"./data/ensemble_calcs/{station_id}/{scenario}/{threshold}.json"
+
+
+def read_projection_json(station_id, scenario, threshold):
+
+    filename = projection_json_file(station_id, scenario, threshold)
+
+    if not os.path.exists(filename):
+        return None
+
+    with open(filename, "r") as f:
+        return JsonSource(json.load(f))
+
+
+def narrative_facts_file(station_id, scenario):
+    return f"./data/ensemble_calcs/{station_id}/{scenario}/narrative_facts.json"
+
+
+def load_narrative_facts(station_id, scenario, threshold):
+    """Facts precomputed by data/narrative_facts.py, or None if they have not been
+    built for this station/scenario/threshold or its projection has changed since."""
+
+    def read():
+        filename = narrative_facts_file(station_id, scenario)
+        if not os.path.exists(filename):
+            return {"sources": {}, "facts": {}}
+        with open(filename, "r") as f:
+            stored = json.load(f)
+        # files without the digests of their projections cannot be checked
+        return stored if "sources" in stored else {"sources": {}, "facts": {}}
+
+    stored = station_data.get(("narrative_facts", station_id, scenario), read)
+
+    source = stored["sources"].get(threshold, None)
+    if source is None or source != file_digest(
+        projection_json_file(station_id, scenario, threshold)
+    ):
+        return None
+
+    return stored["facts"][threshold]
 
 
 def htf_projection(meta, prjn, yoi_toggle):
 
     if prjn is None:
-        fig = go.Figure()
-        fig.update_xaxes(visible=False)
-        fig.update_yaxes(visible=False)
-        fig.update_layout(template="none")
-        fig.add_annotation(
-            {
-                "x": 0.5,
-                "y": 0.5,
-                "text": "No projection for this flooding threshold",
-                "xref": "paper",
-                "yref": "paper",
-                "xanchor": "center",
-                "yanchor": "middle",
-                # "bgcolor": "white",
-                # "borderpad": 2,
-                "showarrow": False,
-            }
-        )
-        return fig, None
+        return figs.blank_figure("No projection for this flooding threshold"), None
 
     yr_max = (
         int(np.round((meta["steps"][-1] + 3) / 5) * 5)
         if meta["steps"] is not None
-        else prjn.loc[prjn[50] <= 330].index.values[-1]
+        else prjn.index[prjn[50] <= 330][-1]
     )
     yr_max = yr_max if yr_max <= prjn.index[-1] else prjn.index[-1]
     yr_lims = [2020, yr_max]
 
     # vertical axis limits
-    xd_max = min([prjn.loc[yr_max, 90] * 1.1, 370])
+    xd_max = min([prjn.at(yr_max, 90) * 1.1, 370])
     xd_min = -xd_max * 0.25 / 13  # match height of zero line in climatology figure
     xd_lims = [xd_min, xd_max]
 
     col = anlyz.color_palette()
-    fig = go.Figure()
 
     leg = True
     traces = projection_traces(prjn, meta, col, leg, yoi_toggle)
-    for trc in traces:
-        fig.add_trace(trc)
 
     # annotations = projection_annotations(prjn, meta)
 
-    fig.update_yaxes(title_text="Flooding days per year", side="right", range=xd_lims)
-    fig.update_xaxes(range=yr_lims)
-
-    fig.update_layout(
+    fig_layout = figs.layout(
         # width=800,
         # height=525,
-        template="none",
         margin=dict(l=60, r=10, b=42, t=30, pad=0),
         font=dict(size=14),
-        xaxis=dict(layer="below traces",),
-        yaxis=dict(layer="below traces", side="left",),
+        xaxis=dict(layer="below traces", range=yr_lims),
+        yaxis=dict(
+            layer="below traces",
+            side="left",
+            range=xd_lims,
+            title=dict(text="Flooding days per year"),
+        ),
         hovermode="x",
         #     hoverlabel_align="left",
         legend=dict(
-            x=0.02, y=1, traceorder="reversed", itemclick=False, itemdoubleclick=False,
+            x=0.02,
+            y=1,
+            traceorder="reversed",
+            itemclick=False,
+            itemdoubleclick=False,
+            tracegroupgap=100,
         ),
-        legend_tracegroupgap=100,
         # title=dict(
         #     text="Projected High-Tide-Flooding Days",
         #     x=0.035,
@@ -137,14 +188,11 @@ def htf_projection(meta, prjn, yoi_toggle):
         #     font=dict(size=24),
         # ),
         # annotations=annotations,
-        modebar=dict(
-            remove=["toImage", "lasso", "select", "zoomIn", "zoomOut"],
-            orientation="h",
-            color="#333333",
-            bgcolor=None,
-        ),
+        modebar=figs.MODEBAR,
     )
 
+    fig = figs.figure(traces, fig_layout)
+
     return fig, yr_lims
 
 
@@ -156,8 +204,8 @@ def projection_traces(prjn, meta, col, leg, yoi_toggle):
 
     prjn_traces = [
         {
-            "x": prjn.index.values,
-            "y": prjn[83].values,
+            "x": prjn.index,
+            "y": prjn[83],
             "type": "scatter",
             "fill": "none",
             "showlegend": False,
@@ -165,8 +213,8 @@ def projection_traces(prjn, meta, col, leg, yoi_toggle):
             "hoverinfo": "none",
         },
         {
-            "x": prjn.index.values,
-            "y": prjn[95].values,
+            "x": prjn.index,
+            "y": prjn[95],
             "type": "scatter",
             "fill": "tonexty",
             "fillcolor": fcol2[0],
@@ -177,8 +225,8 @@ def projection_traces(prjn, meta, col, leg, yoi_toggle):
             "hoverinfo": "y",
         },
         {
-            "x": prjn.index.values,
-            "y": prjn[5].values,
+            "x": prjn.index,
+            "y": prjn[5],
             "type": "scatter",
             "fill": "none",
             "showlegend": False,
@@ -186,8 +234,8 @@ def projection_traces(prjn, meta, col, leg, yoi_toggle):
             "hoverinfo": "y",
         },
         {
-            "x": prjn.index.values,
-            "y": prjn[17].values,
+            "x": prjn.index,
+            "y": prjn[17],
             "type": "scatter",
             "fill": "tonexty",
             "fillcolor": fcol2[0],
@@ -196,8 +244,8 @@ def projection_traces(prjn, meta, col, leg, yoi_toggle):
             "hoverinfo": "none",
         },
         {
-            "x": prjn.index.values,
-            "y": prjn[17].values,
+            "x": prjn.index,
+            "y": prjn[17],
             "type": "scatter",
             "fill": "none",
             "showlegend": False,
@@ -205,8 +253,8 @@ def projection_traces(prjn, meta, col, leg, yoi_toggle):
             "hoverinfo": "y",
         },
         {
-            "x": prjn.index.values,
-            "y": prjn[83].values,
+            "x": prjn.index,
+            "y": prjn[83],
             "type": "scatter",
             "fill": "tonexty",
             "fillcolor": fcol[0],
@@ -217,8 +265,8 @@ def projection_traces(prjn, meta, col, leg, yoi_toggle):
             "hoverinfo": "y",
         },
         {
-            "x": prjn.index.values,
-            "y": prjn[50].values,
+            "x": prjn.index,
+            "y": prjn[50],
             "type": "scatter",
             "name": "50th percentile" if leg else None,
             "showlegend": True if leg else False,
@@ -260,7 +308,7 @@ def projection_traces(prjn, meta, col, leg, yoi_toggle):
                 {
                     **{
                         "x": [stp[0], p12[0]],
-                        "y": prjn[50].loc[[stp[0], p12[1]]],
+                        "y": prjn.at([stp[0], p12[1]], 50),
                         "line": dict(color=lcol, width=1.5, dash=dash),
                     },
                     **cmmn,
@@ -270,7 +318,7 @@ def projection_traces(prjn, meta, col, leg, yoi_toggle):
                 {
                     **{
                         "x": [p12[0], stp[1]],
-                        "y": prjn[50].loc[[p12[1], stp[1]]],
+                        "y": prjn.at([p12[1], stp[1]], 50),
                         "line": dict(color=lcol, width=1.5, dash=dash),
                     },
                     **cmmn,
@@ -282,7 +330,7 @@ def projection_traces(prjn, meta, col, leg, yoi_toggle):
                 **cmmn,
                 **{
                     "x": [yrs[0]],
-                    "y": [prjn[50].loc[yrs[0]]],
+                    "y": [prjn.at(yrs[0], 50)],
                     "type": "scatter",
                     "mode": "markers",
                     "showlegend": False,
@@ -298,7 +346,7 @@ def projection_traces(prjn, meta, col, leg, yoi_toggle):
                 **cmmn,
                 **{
                     "x": [yrs[2]],
-                    "y": [prjn[50].loc[yrs[2]]],
+                    "y": [prjn.at(yrs[2], 50)],
                     "type": "scatter",
                     "mode": "markers",
                     "showlegend": False,
@@ -314,7 +362,7 @@ def projection_traces(prjn, meta, col, leg, yoi_toggle):
                 **cmmn,
                 **{
                     "x": [yrs[1]],
-                    "y": [prjn[50].loc[yrs[1]]],
+                    "y": [prjn.at(yrs[1], 50)],
                     "type": "scatter",
                     "mode": "markers",
                     "name": f"Year of inflection ({yrs[1]})" if leg else None,
@@ -373,11 +421,11 @@ def projection_annotations(prjn, meta):
 
         for n, stp in enumerate(zip(meta["steps"][:-1], meta["steps"][1:])):
 
-            dlt = prjn[50].loc[stp[1]] - prjn[50].loc[stp[0]]
+            dlt = prjn.at(stp[1], 50) - prjn.at(stp[0], 50)
             day_or_days = " day/year" if dlt == 1 else " days/year"
             inc_str = "Δ = " + str(int(dlt)) + day_or_days
 
-            if prjn[50].loc[stp[1]] <= 1:
+            if prjn.at(stp[1], 50) <= 1:
                 step_str = str(stp[0]) + " → " + str(stp[1]) + ": " + "Few events"
             else:
                 step_str = str(stp[0]) + " → " + str(stp[1]) + ": " + inc_str
@@ -406,7 +454,104 @@ def projection_annotations(prjn, meta):
     return annotations
 
 
-def htf_analysis_text(meta, prob, prjn, pent):
+# -------------------------------------------------------------------------------------
+# NARRATIVE FACTS
+# The numbers quoted in the projected-flooding text. These only depend on the
+# projection data, so data/narrative_facts.py computes them for every
+# station/scenario/threshold and stores them next to the projections, with the size
+# and hash of each threshold's projection file; facts whose projection file has
+# changed since are computed again from the projection data.
+
+LIKELIHOODS = {
+    "likely": 66,
+    "very likely": 90,
+}
+
+LIKELIHOOD_RANGES = {
+    "likely": (17, 83),
+    "very likely": (5, 95),
+}
+
+
+def onset_year(at_least, count, lkhd="likely"):
+    """Year an annual count becomes likely: "current" if it already is, None if it
+    does not become likely by the end of the projections."""
+
+    p = LIKELIHOODS[lkhd] / 100
+    p_at_least = at_least[count]
+
+    if p_at_least[0] >= p:
+        return "current"
+    elif p_at_least[-1] < p:
+        return None
+    else:
+        return int(at_least.index[np.argmax(p_at_least >= p)])
+
+
+def single_period_chances(at_least, counts=None):
+    """Chance of at least one year (or month) reaching a count of flooding days by
+    each decade; returns [year, count, chance] for the first two decades with a chance
+    of at least 25%, using the highest such count."""
+
+    counts = at_least.columns if counts is None else counts
+    p = np.column_stack([at_least[c] for c in counts])
+
+    prb_atleast1 = 1 - np.cumprod(1 - p, axis=0)
+    decades = np.arange(2030, at_least.index[-1] + 1, 10)
+    cprb = prb_atleast1[at_least.rows(decades)]
+
+    likely = cprb >= 0.25
+    first_two = np.nonzero(likely.any(axis=1))[0][:2]
+
+    chances = []
+    for n in first_two:
+        k = np.nonzero(likely[n])[0][-1]
+        if counts[k] not in [c for _, c, _ in chances]:
+            chances.append([int(decades[n]), counts[k], float(cprb[n, k])])
+
+    return chances
+
+
+def narrative_facts(data, lrng="likely"):
+
+    l1, l2 = LIKELIHOOD_RANGES[lrng]
+
+    pal = data.annual_at_least
+    pavg = data.pent_avg
+    pmxmo = data.pent_mxmo
+
+    # extreme months: pentad in which the most extreme month is likely to have 10+
+    # flooding days, if months with 5+ days become likely at all
+    def pentad_facts(p):
+        return {
+            "pentad": int(p),
+            "avg": [pavg.at(p, l).item() for l in [l1, l2]],
+            "max_month": [pmxmo.at(p, l).item() for l in [l1, l2]],
+        }
+
+    p_end = 2095 if data.scenario != "traj" else 2050
+    if pmxmo.at(p_end, l2) < 5:
+        xtrm_pentad = None
+    else:
+        y = pmxmo.index[pmxmo[l2] >= 10]
+        xtrm_pentad = pentad_facts(y[0] if len(y) > 0 else p_end)
+
+    facts = {
+        "routine_onset": onset_year(pal, "20"),
+        "chronic_onset": onset_year(pal, "50"),
+        "single_year": single_period_chances(pal, ["10", "20", "50", "100"]),
+        "single_month": single_period_chances(data.monthly_at_least),
+        "extreme_pentad": xtrm_pentad,
+    }
+
+    return facts
+
+
+# -------------------------------------------------------------------------------------
+# ANALYSIS TEXT
+
+
+def htf_analysis_text(meta, facts):
 
     htf_text = dict()
 
@@ -417,49 +562,18 @@ def htf_analysis_text(meta, prob, prjn, pent):
         "Sea-level rise will cause routine and chronic flooding at increasing numbers of locations and increasingly higher thresholds."
     ]
 
-    likelihoods = {
-        "likely": 66,
-        "very likely": 90,
-    }
-
     lkhd = "likely"
 
-    # prob["annual"]["first_yr"] = prob["annual"]["first_yr"].loc[2021:]
-    # cprb = prob["annual"]["first_yr"].cumsum()
-
-    pal20 = prob["annual"]["at_least"]["20"]
-    if pal20.iloc[0] >= likelihoods[lkhd] / 100:
-        rtn_text_end = f"is currently ***{lkhd}***\* on an annual basis"
-    elif pal20.iloc[-1] < likelihoods[lkhd] / 100:
-        rtn_text_end = f"does not become ***{lkhd}***\* on an annual basis by 2100"
-    else:
-        rtn_ab = (pal20 >= likelihoods[lkhd] / 100).idxmax()
-        # rtn_sy = (cprb["20"] >= 0.25).idxmax()
-        # rtn_sy_prb = 100 * cprb["20"].loc[rtn_sy]
-        rtn_text_end = (
-            f"becomes ***{lkhd}***\* on an annual basis beginning in **{rtn_ab}**"
-        )
-
-    pal50 = prob["annual"]["at_least"]["50"]
-    if pal50.iloc[0] >= likelihoods[lkhd] / 100:
-        cnc_text_end = f"is currently ***{lkhd}***\* on an annual basis"
-    elif pal50.iloc[-1] < likelihoods[lkhd] / 100:
-        cnc_text_end = f"does not become ***{lkhd}***\* on an annual basis by 2100"
-    else:
-        cnc_ab = (pal50 >= likelihoods[lkhd] / 100).idxmax()
-        cnc_text_end = (
-            f"becomes ***{lkhd}***\* on an annual basis beginning in **{cnc_ab}**"
-        )
+    def onset_text(onset):
+        if onset == "current":
+            return f"is currently ***{lkhd}***\* on an annual basis"
+        elif onset is None:
+            return f"does not become ***{lkhd}***\* on an annual basis by 2100"
+        else:
+            return f"becomes ***{lkhd}***\* on an annual basis beginning in **{onset}**"
 
-    # prob["annual"]["first_yr"] = prob["annual"]["first_yr"].loc[2021:]
-
-    prb_none = (1 - prob["annual"]["at_least"]).cumprod()
-    prb_atleast1 = 1 - prb_none
-    cprb = prb_atleast1.loc[
-        range(2030, prb_atleast1.index[-1] + 1, 10), ["10", "20", "50", "100"]
-    ]
-    cprb = cprb.where(cprb >= 0.25).dropna(axis=0, how="all").iloc[:2, :]
-    yr_and_cnt = (cprb >= 0.25).iloc[:, ::-1].idxmax(axis=1).drop_duplicates()
+    rtn_text_end = onset_text(facts["routine_onset"])
+    cnc_text_end = onset_text(facts["chronic_onset"])
 
     rtn_text = [
         "For the selected threshold and scenario:",
@@ -468,10 +582,10 @@ def htf_analysis_text(meta, prob, prjn, pent):
     ]
     rtn_text.extend(
         [
-            f"- There is a **{f'{100 * cprb.loc[y, c]:0.0f}' if cprb.loc[y, c] <= 0.99 else '>99'}% chance** of at least **{c} flooding days** during a single year **by {y}**."
-            for y, c in yr_and_cnt.iteritems()
+            f"- There is a **{f'{100 * pc:0.0f}' if pc <= 0.99 else '>99'}% chance** of at least **{c} flooding days** during a single year **by {y}**."
+            for y, c, pc in facts["single_year"]
         ]
-        if len(yr_and_cnt) > 0
+        if len(facts["single_year"]) > 0
         else [
             "- < 25% chance that a single year will experience at least 10 flooding days by 2100."
         ]
@@ -608,28 +722,22 @@ def htf_analysis_text(meta, prob, prjn, pent):
     # --------------------------------------------------------------------
     # extreme months text
 
-    likelihood_ranges = {
-        "likely": (17, 83),
-        "very likely": (5, 95),
-    }
-
     lrng = "likely"
-    l1, l2 = likelihood_ranges[lrng]
-
     xtrm_months_intro = [
         "As the frequency of flooding increases, **extreme months will become more severe**. For the selected scenario and threshold, the *Extreme Months* graph above shows:",
     ]
     xtrm_months_blurb = []
 
-    def get_pent_strings(p):
+    def get_pent_strings(xp):
 
+        p = xp["pentad"]
         p_str = f"{p}–{p+4}"
 
-        p_avg_hi = pent["pent_avg"].loc[p, l2]
-        p_avg = f"{pent['pent_avg'].loc[p, l1]}–{p_avg_hi}"
+        p_avg_hi = xp["avg"][1]
+        p_avg = f"{xp['avg'][0]}–{p_avg_hi}"
 
-        p_mxmo_hi = pent["pent_mxmo"].loc[p, l2]
-        p_mxmo = f"{pent['pent_mxmo'].loc[p, l1]}–{p_mxmo_hi}"
+        p_mxmo_hi = xp["max_month"][1]
+        p_mxmo = f"{xp['max_month'][0]}–{p_mxmo_hi}"
 
         p_blurb = [
             "\n",
@@ -637,53 +745,26 @@ def htf_analysis_text(meta, prob, prjn, pent):
             f"  - {p_avg if p_avg_hi > 1 else ('1 or fewer' if p_avg_hi == 1 else 0)} flooding days per month on average.\n"
             f"  - **{p_mxmo if p_mxmo_hi > 1 else ('1 or fewer' if p_mxmo_hi == 1 else 0)} flooding days** during the **most extreme** month.",
         ]
-        return p_blurb, p_mxmo_hi
-
-    # p1_blurb, _ = get_pent_strings(2030)
-    p1_blurb = None
-    # p2_blurb, p2_hi = get_pent_strings(2050)
-    p2_hi = 0
-    p3_blurb, p3_hi = get_pent_strings(2095 if meta["scenario"] != "traj" else 2050)
-
-    # if p2_mxmo_hi <= 2:
-    #     p2_mxmo
+        return p_blurb
 
-    if p3_hi < 5:
-        p1_blurb = [
+    if facts["extreme_pentad"] is None:
+        xtrm_months_blurb.append(
             f"- Months experiencing 5 or more flooding days do not become ***{lrng}***\* prior to 2100."
-        ]
-        p2_blurb = []
-    elif (p2_hi < 5) and (p3_hi >= 5):
-        # p1_blurb = [
-        #     f"- Months experiencing 5 or more flooding days become *{lrng}*\* after 2050."
-        # ]
-        y = pent["pent_mxmo"].loc[pent["pent_mxmo"][l2] >= 10].index
-        if len(y) > 0:
-            p2_blurb, p2_hi = get_pent_strings(y[0])
-        else:
-            p2_blurb = p3_blurb
-
-    if p1_blurb is not None:
-        xtrm_months_blurb.extend(p1_blurb)
-    xtrm_months_blurb.extend(p2_blurb)
+        )
+    else:
+        xtrm_months_blurb.extend(get_pent_strings(facts["extreme_pentad"]))
 
     first_mo_intro = [
         # "\nExtreme months correspond to frequent flooding during brief periods **before** frequent flooding is expected on average. For the selected scenario and threshold, there is a ..."
         "\nFor the selected scenario and threshold, there is a ..."
     ]
 
-    prb_none = (1 - prob["amonthly"]["at_least"]).cumprod()
-    prb_atleast1 = 1 - prb_none
-    cprb = prb_atleast1.loc[range(2030, prb_atleast1.index[-1] + 1, 10)]
-    cprb = cprb.where(cprb >= 0.25).dropna(axis=0, how="all").iloc[:2, :]
-    yr_and_cnt = (cprb >= 0.25).iloc[:, ::-1].idxmax(axis=1).drop_duplicates()
-
     first_mo_blurb = (
         [
-            f"- **{f'{100 * cprb.loc[y, c]:0.0f}' if cprb.loc[y, c] <= 0.99 else '>99'}% chance** of at least **{c} flooding days** during a single month **by {y}**."
-            for y, c in yr_and_cnt.iteritems()
+            f"- **{f'{100 * pc:0.0f}' if pc <= 0.99 else '>99'}% chance** of at least **{c} flooding days** during a single month **by {y}**."
+            for y, c, pc in facts["single_month"]
         ]
-        if len(yr_and_cnt) > 0
+        if len(facts["single_month"]) > 0
         else [
             "- < 25% chance that a single month will experience at least 10 flooding days by 2100."
         ]
@@ -707,7 +788,7 @@ def htf_analysis_text(meta, prob, prjn, pent):
                         children=[
                             # "*",
                             # html.I(lrng.capitalize()),
-                            f"*Indicates >{np.diff(likelihood_ranges[lrng])[0]}",
+                            f"*Indicates >{np.diff(LIKELIHOOD_RANGES[lrng])[0]}",
                             "% chance that the number is in the given range for the selected scenario and threshold. See ",
                             html.A(
                                 "Box 1.1",
@@ -0,0 +1,123 @@
+import numpy as np
+
+from graphs.observed_flooding import load_day_min_max
+
+# -------------------------------------------------------------------------------------
+# The long-term change block of the observed flooding counts (htf_observed), computed
+# from the daily maxima for every threshold at once: flooding days in the first and
+# last decades of the record, the change in average sea level between them, and the
+# chance that a change in flooding days at least as large as the one observed comes
+# from variability alone.
+#
+# That chance is estimated from random pairs of decades of the record, with the
+# difference in average sea level between the two removed by shifting the second
+# decade onto the first. The pairs are drawn once, from a seeded generator, and shared
+# by all thresholds. Each decade's flooding days at every level are tabulated once on
+# the millimetre grid of the data, so the days above every threshold in every pair,
+# after the shift, are a single lookup.
+#
+# Years are meteorological years (May–April), named by the year of their January.
+# -------------------------------------------------------------------------------------
+
+# decades compared by the long-term change
+FIRST_DECADE = 1970
+DECADE = 10
+
+# random decade pairs drawn, shared by all thresholds
+N_PAIRS = 10000
+SEED = 0
+
+# share of days with data for a year to count as observed
+MIN_COVERAGE = 0.8
+
+
+def meteorological_years(times):
+    return times.year.values + (times.month.values >= 5)
+
+
+def long_term_change(station_id, thresholds, n_pairs=N_PAIRS, seed=SEED):
+    """Long-term change blocks for a list of thresholds (cm above MHHW), in the form
+    of htf_observed; None for every threshold if the record is too short."""
+
+    dy = load_day_min_max(station_id).dropna()
+
+    years = meteorological_years(dy.index)
+    mx = np.round(1000 * dy["max"].values).astype(int)  # mm
+    mid = (dy["max"].values + dy["min"].values) / 2
+
+    # years observed for most of their days; the last decade ends with the last one
+    y0 = years.min()
+    ny = years.max() - y0 + 1
+    days = np.bincount(years - y0, minlength=ny)
+    observed = np.flatnonzero(days >= MIN_COVERAGE * 365) + y0
+    if observed.size == 0:
+        return [None for _ in thresholds]
+
+    first = max(FIRST_DECADE, observed[0])
+    last = observed[-1] - DECADE + 1
+    if last < first + DECADE:
+        return [None for _ in thresholds]
+
+    # every decade of the record: flooding days above each mm level, years of data
+    # and average sea level
+    starts = np.arange(years.min(), years.max() - DECADE + 2)
+    lo, hi = mx.min(), mx.max()
+    levels = np.arange(lo - 1, hi + 1)
+    above = np.zeros((starts.size, levels.size), dtype=int)
+    n_years = np.zeros(starts.size)
+    msl = np.zeros(starts.size)
+    for i, s in enumerate(starts):
+        d = (years >= s) & (years < s + DECADE)
+        hist = np.bincount(mx[d] - lo, minlength=levels.size - 1)
+        above[i, :-1] = hist[::-1].cumsum()[::-1]
+        n_years[i] = d.sum() / 365.25
+        msl[i] = mid[d].mean()
+
+    def days_above(i, level_mm):
+        """Flooding days of decade(s) i above levels in mm, as floor(level)."""
+        n = np.floor(level_mm).astype(int) - lo + 1
+        return above[i, n.clip(0, hi - lo + 1)]
+
+    t_mm = 10 * np.asarray(thresholds, dtype=float)
+
+    i1 = np.searchsorted(starts, first)
+    i2 = np.searchsorted(starts, last)
+    f10_htf = days_above(i1, t_mm)
+    l10_htf = days_above(i2, t_mm)
+    f10_htf_pyr = np.round(f10_htf / n_years[i1], 2)
+    l10_htf_pyr = np.round(l10_htf / n_years[i2], 2)
+    change = l10_htf_pyr - f10_htf_pyr
+
+    # random pairs of decades from the observed years, the second shifted to the
+    # average sea level of the first: (pair, threshold)
+    pool = np.flatnonzero((starts >= observed[0]) & (starts <= last))
+    rng = np.random.default_rng(seed)
+    a = rng.choice(pool, n_pairs)
+    b = rng.choice(pool, n_pairs)
+    shift = 1000 * (msl[b] - msl[a])
+    pyr_a = days_above(a[:, None], t_mm[None, :]) / n_years[a, None]
+    pyr_b = days_above(b[:, None], t_mm[None, :] + shift[:, None]) / n_years[b, None]
+    random_change = pyr_b - pyr_a
+
+    # chance of a change as large as observed, in the same direction
+    sign = np.sign(change)
+    prob = 100 * np.mean(sign * random_change >= np.abs(change), axis=0)
+    prob[sign == 0] = 0
+
+    msl_change = np.round(msl[i2] - msl[i1], 1)
+
+    return [
+        {
+            "first_10_span": [int(first), int(first + DECADE - 1)],
+            "last_10_span": [int(last), int(last + DECADE - 1)],
+            "msl_change": float(msl_change),
+            "f10_htf": int(f10_htf[n]),
+            "f10_htf_pyr": float(f10_htf_pyr[n]),
+            "l10_htf": int(l10_htf[n]),
+            "l10_htf_pyr": float(l10_htf_pyr[n]),
+            "htf_change": int(l10_htf[n] - f10_htf[n]),
+            "htf_pyr_change": int(np.round(change[n])),
+            "htf_pyr_diff_prob": int(np.round(prob[n])),
+        }
+        for n in range(len(thresholds))
+    ]
@@ -1,23 +1,111 @@
+import os
+import glob
+import json
+
 import pandas as pd
 import numpy as np
-import json
+import orjson
 
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 from dash import dcc, html
 
 import graphs.analysis as anlyz
+import graphs.figures as figs
+from graphs.shared_cache import shared_arrays
+from graphs.station_data import station_data, file_digests
+from graphs.request_sequence import checkpoint
+
+
+def load_levels(station_id):
+    """Levels file of a station as parsed from JSON; shared between requests, so it
+    must not be modified."""
+
+    def read():
+        with open("./data/levels/" + station_id + ".json", "r") as f:
+            return json.load(f)
+
+    return station_data.get(("levels", station_id), read)
+
+
+# compiled levels of every station (data/station_index.py), with the digests of the
+# levels files they were compiled from
+STATION_INDEX = "./data/station_index.json"
+
+
+def station_levels_files():
+    return sorted(glob.glob("./data/levels/*.json"))
+
+
+def load_station_index():
+    """Levels of every station as compiled by data/station_index.py, keyed by station;
+    None if it has not been built or the levels files have changed since. Read once."""
+
+    def read():
+        if not os.path.exists(STATION_INDEX):
+            return None
+        with open(STATION_INDEX, "rb") as f:
+            index = orjson.loads(f.read())
+        if index.get("sources") != file_digests(station_levels_files()):
+            return None
+        return index["stations"]
+
+    return station_data.get(("station_index",), read)
+
+
+def compile_station_levels(levels):
+    """Everything a station switch needs from a levels file: the levels and the
+    top-ten/return-period table in both units, the threshold options and the date of
+    the levels, as kept in the station index."""
+
+    compiled = {"updated": levels["updated"]}
+    for units in ["ft", "m"]:
+        unit_levels, table = levels_in_units(levels, units)
+        compiled[units] = {"levels": unit_levels, "table": table}
+
+    compiled["options"] = [
+        {k: d[k] for k in d if k not in ["height", "height_key"]}
+        for d in compiled["ft"]["levels"]
+        if d["value"] not in ["mhhw", "msl", "mllw"]
+    ] + [{"value": "custom", "label": "Custom"}]
+
+    return compiled
+
+
+def compiled_levels(station_id):
+    """Compiled levels of a station, from the station index if it is up to date and
+    from its levels file otherwise; shared, so it must not be modified."""
+
+    index = load_station_index()
+    if index is not None and station_id in index:
+        return index[station_id]
+
+    return station_data.get(
+        ("compiled_levels", station_id),
+        lambda: compile_station_levels(load_levels(station_id)),
+    )
 
 
 def station_levels(station_id, units_toggle=True):
+    """Levels of a station (thresholds, datums and extremes) and its table of top-ten
+    events and return periods, in ft or m, and the date of the levels."""
+
+    compiled = compiled_levels(station_id)
+    units = compiled["ft" if units_toggle else "m"]
+
+    return (
+        [dict(h) for h in units["levels"]],
+        [dict(r) for r in units["table"]],
+        compiled["updated"],
+    )
+
 
-    units = "ft" if units_toggle else "m"
+def station_threshold_options(station_id):
+    """Options of the threshold menu for a station."""
+    return [dict(o) for o in compiled_levels(station_id)["options"]]
 
-    fname = "./data/levels/" + station_id + ".json"
-    with open(fname, "r") as f:
-        levels = json.load(f)
 
-    updated = levels["updated"]
+def levels_in_units(levels, units):
+    """Levels and table of top-ten events and return periods of a levels file, in ft
+    or m."""
 
     levels = {k: levels[k] for k in levels if levels[k] is not None}
 
@@ -26,17 +114,16 @@ def station_levels(station_id, units_toggle=True):
     }
 
     # extract top ten events before replacing levels variable
-    for n in range(len(levels["topten"])):
-        levels["topten"][n]["height"] = (
-            np.round(levels["topten"][n]["height"] * 3.28084, 2)
-            if units == "ft"
-            else np.round(levels["topten"][n]["height"], 2)
-        )
-
     topten = [
         {
             "date": ev["date"],
-            "height": str(ev["height"]) + " " + units,
+            "height": str(
+                np.round(ev["height"] * 3.28084, 2)
+                if units == "ft"
+                else np.round(ev["height"], 2)
+            )
+            + " "
+            + units,
             "type": "topten",
         }
         for ev in levels["topten"]
@@ -107,7 +194,47 @@ def station_levels(station_id, units_toggle=True):
     # ]
     # htf_table_data = htf_table_data.to_dict("records")
 
-    return levels, topten_with_return_periods, updated
+    return levels, topten_with_return_periods
+
+
+def load_day_min_max(station_id):
+    """Daily min/max series of a station, with days missing either value blanked.
+    Its arrays are shared between worker processes and read-only."""
+
+    fname = f"./data/day_min_max/{station_id}.csv"
+
+    def read_csv():
+        dy = pd.read_csv(fname, index_col=0, parse_dates=True)
+        blank = dy["max"].isna() | dy["min"].isna()
+        dy.loc[blank, :] = None
+        return {
+            "time": dy.index.values,
+            "max": dy["max"].values,
+            "min": dy["min"].values,
+        }
+
+    # parsed and blanked once, and shared between worker processes; the frame wraps
+    # the mapped arrays, so it is not kept in the hot tier as a copy of its own
+    dy = station_data.mapped(
+        ("day_min_max_arrays", station_id),
+        lambda: shared_arrays(f"day_min_max_blanked/{station_id}", [fname], read_csv),
+    )
+    return pd.DataFrame(
+        {"max": dy["max"], "min": dy["min"]},
+        index=pd.DatetimeIndex(dy["time"], name="time", copy=False),
+        copy=False,
+    )
+
+
+def load_observed_counts(station_id, threshold_key):
+    """Observed flooding counts for a threshold; must not be modified."""
+
+    def read():
+        fname = f"./data/htf_observed/{station_id}/{threshold_key}.json"
+        with open(fname, "r") as f:
+            return json.load(f)
+
+    return station_data.get(("htf_observed", station_id, threshold_key), read)
 
 
 def observed_flooding(station_id, threshold_key, levels, units):
@@ -116,11 +243,7 @@ def observed_flooding(station_id, threshold_key, levels, units):
     # fcol = [anlyz.fill_color(c, 0.25) for c in col if c[0] == "#"]
 
     # load station daily min/max data
-    fname = f"./data/day_min_max/{station_id}.csv"
-    dy = pd.read_csv(fname, index_col=0, parse_dates=True)
-
-    blank = dy["max"].isna() | dy["min"].isna()
-    dy.loc[blank, :] = None
+    dy = load_day_min_max(station_id)
 
     dy = (dy * 3.28084).round(3) if units == "ft" else dy
     obs_max = dy["max"].max()
@@ -137,6 +260,9 @@ def observed_flooding(station_id, threshold_key, levels, units):
     splits = np.hstack([[0], np.where(tdiff.days.values > 1)[0] + 1, -1])
     dy_splits = [dy.iloc[i1:i2] for i1, i2 in zip(splits[:-1], splits[1:])]
 
+    # stop here if a newer request for this graph has come in
+    checkpoint()
+
     # reorganize levels info
     thresholds = {h["value"]: h["height"] for h in levels}
     threshold_names = {h["value"]: h["label"] for h in levels}
@@ -156,23 +282,15 @@ def observed_flooding(station_id, threshold_key, levels, units):
         this_threshold = this_threshold[0]
 
     # load the observed flooding counts
-    fname = f"./data/htf_observed/{station_id}/{threshold_key}.json"
-    with open(fname, "r") as f:
-        htfo = json.load(f)
+    htfo = load_observed_counts(station_id, threshold_key)
 
     # create figure
     black = "#222"
     gray = "#aaa"
 
-    fig = go.Figure()
-    fig = make_subplots(
-        rows=2,
-        cols=1,
-        start_cell="top-left",
-        row_heights=[5, 2],
-        shared_xaxes=True,
-        vertical_spacing=0.125,
-    )
+    data = []
+    shapes = []
+    annotations = []
 
     traces = []
     for n, dys in enumerate(dy_splits):
@@ -229,8 +347,7 @@ def observed_flooding(station_id, threshold_key, levels, units):
         ]
     )
 
-    for trc in traces:
-        fig.add_trace(trc, row=1, col=1)
+    data.extend([{**trc, "xaxis": "x", "yaxis": "y"} for trc in traces])
 
     thrsh_labels = []
     thrsh_levels = []
@@ -250,15 +367,16 @@ def observed_flooding(station_id, threshold_key, levels, units):
         color = black if thrsh in [this_threshold, "msl", "mhhw"] else gray
         lw = 2 if thrsh == this_threshold else (1 if thrsh in ["msl", "mhhw"] else 0)
         dash = "dash" if thrsh == "mhhw" else ("dot" if thrsh == "msl" else None)
-        fig.add_hline(
-            y=thresholds[thrsh],
-            line={"color": color, "width": lw, "dash": dash},
-            layer="below" if thrsh == this_threshold else "above",
-            row=1,
-            col=1,
+        shapes.append(
+            figs.hline(
+                y=thresholds[thrsh],
+                line={"color": color, "width": lw, "dash": dash},
+                layer="below" if thrsh == this_threshold else "above",
+                row=1,
+            )
         )
         if thrsh == this_threshold:
-            fig.add_trace(
+            data.append(
                 dict(
                     x=dy.index.values[[0, -1]],
                     y=[thresholds[thrsh], thresholds[thrsh]],
@@ -328,47 +446,43 @@ def observed_flooding(station_id, threshold_key, levels, units):
                     + "</extra>"
                 }
             )
-            fig.add_trace({**trace_base, **trace_hover})
+            data.append({**trace_base, **trace_hover})
         else:
-            fig.add_annotation(
-                x=1.02,
-                y=thresholds[thrsh],
-                xref="paper",
-                yref="y",
-                text=thrsh.upper(),
-                font=dict(size=12, color="#000"),
-                showarrow=False,
-                align="right",
-                bordercolor="#000",
-                borderwidth=1,
-                borderpad=4,
-                bgcolor="#fff",
-                opacity=1.0,
+            annotations.append(
+                dict(
+                    x=1.02,
+                    y=thresholds[thrsh],
+                    xref="paper",
+                    yref="y",
+                    text=thrsh.upper(),
+                    font=dict(size=12, color="#000"),
+                    showarrow=False,
+                    align="right",
+                    bordercolor="#000",
+                    borderwidth=1,
+                    borderpad=4,
+                    bgcolor="#fff",
+                    opacity=1.0,
+                )
             )
 
-    fig.update_layout(annotations=thrsh_labels)
+    annotations.extend(thrsh_labels)
 
     units_full = "feet" if units == "ft" else "meters"
-    fig.update_yaxes(
-        title_text=units_full + " above MHHW",
-        side="right",
-        range=[
-            # 1.25 * thresholds["mllw"],
-            1.1 * thresholds["msl"],
-            max(
-                [
-                    1.05 * thresholds[this_threshold],
-                    1.05 * obs_max,
-                    1.05 * thresholds["moderate"] if "moderate" in thresholds else 0,
-                    1.05 * thresholds["nws_moderate"]
-                    if "nws_moderate" in thresholds
-                    else 0,
-                ]
-            ),
-        ],
-        row=1,
-        col=1,
-    )
+    yaxis_range = [
+        # 1.25 * thresholds["mllw"],
+        1.1 * thresholds["msl"],
+        max(
+            [
+                1.05 * thresholds[this_threshold],
+                1.05 * obs_max,
+                1.05 * thresholds["moderate"] if "moderate" in thresholds else 0,
+                1.05 * thresholds["nws_moderate"]
+                if "nws_moderate" in thresholds
+                else 0,
+            ]
+        ),
+    ]
 
     htfo_time = [pd.Timestamp(str(y - 1) + "-11-01") for y in htfo["annual"]["years"]]
     traces = [
@@ -386,33 +500,29 @@ def observed_flooding(station_id, threshold_key, levels, units):
         },
     ]
 
-    for trc in traces:
-        fig.add_trace(
-            trc, row=2, col=1,
-        )
+    data.extend([{**trc, "xaxis": "x2", "yaxis": "y2"} for trc in traces])
 
     max_count = max([c for c in htfo["annual"]["counts"] if c is not None])
-    fig.update_yaxes(
-        title_text="days",
-        side="right",
-        range=[-0.05 - 0.05 * max_count, max_count + 1],
-        row=2,
-        col=1,
-    )
 
     time_lims = [
         str(max([1900, dy_splits[0]["max"].index.year[0]])),
         dy.index[-1] + 0.015 * (dy.index[-1] - dy.index[0]),
         # f"{dy['max'].index.year[-1] + 1}-12-31",
     ]
-    fig.update_xaxes(range=time_lims)
 
-    fig.update_layout(
-        template="none",
+    axes = figs.stacked_rows(row_heights=[5, 2], vertical_spacing=0.125)
+
+    fig_layout = figs.layout(
         height=600,
         margin=dict(l=70, r=30, b=30, t=30, pad=0),
         font=dict(size=14),
-        xaxis=dict(layer="below traces", zeroline=False, matches="x2",),
+        xaxis=dict(
+            **axes["xaxis"],
+            type="date",
+            layer="below traces",
+            zeroline=False,
+            range=time_lims,
+        ),
         xaxis3=dict(
             layer="below traces",
             zeroline=False,
@@ -421,9 +531,23 @@ def observed_flooding(station_id, threshold_key, levels, units):
             fixedrange=True,
             visible=False,
         ),
-        yaxis=dict(layer="below traces", side="left", zeroline=False,),
-        xaxis2=dict(showgrid=True,),
-        yaxis2=dict(layer="below traces", side="left", fixedrange=True,),
+        yaxis=dict(
+            **axes["yaxis"],
+            layer="below traces",
+            side="left",
+            zeroline=False,
+            range=yaxis_range,
+            title=dict(text=units_full + " above MHHW"),
+        ),
+        xaxis2=dict(**axes["xaxis2"], type="date", showgrid=True, range=time_lims),
+        yaxis2=dict(
+            **axes["yaxis2"],
+            layer="below traces",
+            side="left",
+            fixedrange=True,
+            range=[-0.05 - 0.05 * max_count, max_count + 1],
+            title=dict(text="days"),
+        ),
         legend=dict(
             xanchor="center",
             x=0.5,
@@ -436,14 +560,13 @@ def observed_flooding(station_id, threshold_key, levels, units):
             itemdoubleclick=False,
             orientation="h",
         ),
-        modebar=dict(
-            remove=["toImage", "lasso", "select", "zoomIn", "zoomOut"],
-            orientation="h",
-            color="#333333",
-            bgcolor=None,
-        ),
+        modebar=figs.MODEBAR,
+        shapes=shapes,
+        annotations=annotations,
     )
 
+    fig = figs.figure(data, fig_layout)
+
     # --------------------------------------------------------------------
     # --------------------------------------------------------------------
 
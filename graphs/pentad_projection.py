@@ -1,45 +1,23 @@
-import plotly.graph_objects as go
-import plotly.subplots as psb
 import graphs.analysis as anlyz
+import graphs.figures as figs
 
 
-def pentad_projection(meta, pent, yr_lims):
+def pentad_projection(meta, data, yr_lims):
 
-    yr_lims[1] = max([2055, yr_lims[1]])
+    yr_lims = [yr_lims[0], max([2055, yr_lims[1]])]
 
-    if pent is None:
-        fig = go.Figure()
-        fig.update_xaxes(visible=False)
-        fig.update_yaxes(visible=False)
-        fig.update_layout(template="none")
-        fig.add_annotation(
-            {
-                "x": 0.5,
-                "y": 0.5,
-                "text": "No projection for this flooding threshold",
-                "xref": "paper",
-                "yref": "paper",
-                "xanchor": "center",
-                "yanchor": "middle",
-                # "bgcolor": "white",
-                # "borderpad": 2,
-                "showarrow": False,
-            }
-        )
-        return fig
+    if data is None:
+        return figs.blank_figure("No projection for this flooding threshold")
 
     colors = anlyz.color_palette()
     colors = [colors[n] for n in [1, 6, 5]]
 
-    fig = go.Figure()
-
     annotations = []
     shapes = []
     # for yr in pent["pent_avg"].index:
 
-    avg = pent["pent_avg"]
-    mxsn = pent["pent_mxssn"]
-    mxmo = pent["pent_mxmo"]
+    avg = data.pent_avg
+    mxmo = data.pent_mxmo
 
     # shade alternating 5 year periods
     shapes.extend([pentad_shading(y5) for y5 in avg.index[avg.index % 10 == 5]])
@@ -58,41 +36,40 @@ def pentad_projection(meta, pent, yr_lims):
         dict(q=mxmo, dx=3, c=colors[2], leg=showlegend, nm="5-year extreme month",),
     ]
     traces = [pentad_trace(trc) for trc in trace_inputs]
-    for trc in traces:
-        fig.add_trace(trc)
 
     # create annotations for station and threshold in each subplot
     # annotations.extend(pentad_annotations(stn_meta[n], r, c, vspace))
 
     # determine optimal legend location
     last_yr = [y for y in avg.index if y < yr_lims[1]][-1]
-    leg_lower_right = True if avg.loc[last_yr, 50] > 15 else False
-
-    yaxis_format = dict(
-        layer="below traces", range=[-1, 32], zeroline=True, side="left"
-    )
-    fig.update_yaxes(patch=yaxis_format, title_text="Flooding days per month")
-    fig.update_xaxes(
-        range=yr_lims,
-        tickvals=[2012.5 + 5 * v for v in range(18)],
-        ticktext=[
-            #                 str(2030 + 5 * v) + "–" + str((5 * v + 4) % 10)
-            "'" + str(10 + 5 * v) + "–'" + str(10 + 5 * v + 4)
-            for v in range(18)
-        ],
-        showgrid=False,
-    )
+    leg_lower_right = True if avg.at(last_yr, 50) > 15 else False
 
-    fig.update_layout(
+    fig_layout = figs.layout(
         # width=800,
         # height=525,
         paper_bgcolor="#f8f9fa",
         margin=dict(l=60, r=10, b=60, t=35, pad=0),
         font=dict(size=14),
-        template="none",
         shapes=shapes,
         hovermode="closest",
         # hoverlabel_align="left",
+        xaxis=dict(
+            range=yr_lims,
+            tickvals=[2012.5 + 5 * v for v in range(18)],
+            ticktext=[
+                #                 str(2030 + 5 * v) + "–" + str((5 * v + 4) % 10)
+                "'" + str(10 + 5 * v) + "–'" + str(10 + 5 * v + 4)
+                for v in range(18)
+            ],
+            showgrid=False,
+        ),
+        yaxis=dict(
+            layer="below traces",
+            range=[-1, 32],
+            zeroline=True,
+            side="left",
+            title=dict(text="Flooding days per month"),
+        ),
         legend=dict(
             orientation="v",
             xanchor="right" if leg_lower_right else "left",
@@ -103,14 +80,11 @@ def pentad_projection(meta, pent, yr_lims):
             itemdoubleclick=False,
             bgcolor="rgba(0, 0, 0, 0)",
         ),
-        modebar=dict(
-            remove=["toImage", "lasso", "select", "zoomIn", "zoomOut"],
-            orientation="h",
-            color="#333333",
-            bgcolor=None,
-        ),
+        modebar=figs.MODEBAR,
     )
 
+    fig = figs.figure(traces, fig_layout)
+
     return fig
 
 
@@ -122,10 +96,10 @@ def pentad_trace(trace_input):
         type="scatter",
         name=trace_input["nm"],
         x=q.index + trace_input["dx"],
-        y=(q[50].values * 10).round() / 10,
+        y=(q[50] * 10).round() / 10,
         error_y=dict(
-            array=(q[83] - q[50]).values,
-            arrayminus=(q[50] - q[17]).values,
+            array=q[83] - q[50],
+            arrayminus=q[50] - q[17],
             thickness=3,
             width=0,
             #             color="rgba" + trace_input["c"][3:-1] + ", 0.8)",
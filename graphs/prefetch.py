@@ -0,0 +1,135 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from graphs.htf_projection import read_projection_json, load_narrative_facts
+from graphs.projection_store import read_chunk, store_chunk
+from graphs.observed_flooding import (
+    station_levels,
+    load_day_min_max,
+    load_observed_counts,
+)
+from graphs.slr_projection import load_slr_scenarios
+from graphs.station_data import station_data
+
+# -------------------------------------------------------------------------------------
+# Background prefetching of the data a user is likely to ask for next: after a
+# projection is shown, the thresholds a few centimetres either side of it and the same
+# threshold under the other scenarios; when a station is hovered on the map, what its
+# pages show first.
+#
+# Jobs run on a small thread pool and load through station_data.prefetching(), so they
+# only fill room left in the hot tier and never push out data that was asked for.
+# Projections are prefetched as what the cache keeps of them: the decoded chunk of the
+# compact store holding a threshold (CHUNK_SIZE thresholds at once), or the parsed JSON
+# calculations without a store, and the narrative facts of its scenario. Chunks
+# already in the hot tier, as the neighbours of the threshold just shown mostly are,
+# are not loaded again. Jobs already queued are not queued again, and new jobs are
+# dropped while the queue is full. The prefetch hit ratio is reported by
+# station_data.stats().
+#
+# Set FAT_PREFETCH_WORKERS to the number of threads (0 turns prefetching off) and
+# FAT_PREFETCH_RADIUS to the number of centimetre thresholds on either side.
+# -------------------------------------------------------------------------------------
+
+PREFETCH_WORKERS = int(os.environ.get("FAT_PREFETCH_WORKERS", 2))
+PREFETCH_RADIUS = int(os.environ.get("FAT_PREFETCH_RADIUS", 3))
+MAX_QUEUED = 64
+
+SCENARIOS = ["low", "int_low", "int", "int_high", "high", "traj"]
+MAX_THRESHOLD = 305
+
+
+class Prefetcher:
+    def __init__(self, workers=PREFETCH_WORKERS, radius=PREFETCH_RADIUS):
+
+        self.radius = radius
+        self._pool = ThreadPoolExecutor(workers) if workers > 0 else None
+        self._lock = threading.Lock()
+        self._queued = set()
+
+    def submit(self, key, job):
+        """Run job() in the background unless a job with the same key is queued."""
+
+        if self._pool is None:
+            return
+
+        with self._lock:
+            if key in self._queued or len(self._queued) >= MAX_QUEUED:
+                return
+            self._queued.add(key)
+
+        def run():
+            try:
+                with station_data.prefetching():
+                    job()
+            except Exception:
+                pass  # a failed prefetch is just a later cache miss
+            finally:
+                with self._lock:
+                    self._queued.discard(key)
+
+        self._pool.submit(run)
+
+    # ---------------------------------------------------------------------------------
+
+    def projection_sources(self, station_id, scenario, threshold):
+        """Cache keys and loaders of what a projection is read from (its store chunk or
+        JSON calculations, and its scenario's narrative facts) not cached already."""
+
+        c = store_chunk(station_id, scenario, threshold)
+        if c is not None:
+            data_key = ("projection_chunk", station_id, scenario, c)
+
+            def load_data():
+                read_chunk(station_id, scenario, c)
+
+        else:
+            data_key = ("projection_json", station_id, scenario, threshold)
+
+            def load_data():
+                station_data.get(
+                    data_key,
+                    lambda: read_projection_json(station_id, scenario, threshold),
+                )
+
+        def load_facts():
+            load_narrative_facts(station_id, scenario, threshold)
+
+        sources = [
+            (data_key, load_data),
+            (("narrative_facts", station_id, scenario), load_facts),
+        ]
+        return [(key, load) for key, load in sources if not station_data.cached(key)]
+
+    def projection(self, station, scenario, threshold):
+        """Neighbouring thresholds of the same scenario, nearest first, then the same
+        threshold under the other scenarios."""
+
+        t = int(threshold)
+        nearby = [t + d * s for d in range(1, self.radius + 1) for s in [1, -1]]
+        requests = [(scenario, f"{n:03}") for n in nearby if 0 <= n <= MAX_THRESHOLD]
+        requests += [(scn, threshold) for scn in SCENARIOS if scn != scenario]
+
+        for scn, key in requests:
+            for source in self.projection_sources(station["id"], scn, key):
+                self.submit(*source)
+
+    def station(self, station, scenario, threshold_name):
+        """Levels, observations, SLR scenarios and projection a station opens with."""
+
+        def job():
+            sid = station["id"]
+            levels, _, _ = station_levels(sid)
+            key = [h["height_key"] for h in levels if h["value"] == threshold_name]
+            load_day_min_max(sid)
+            load_slr_scenarios(sid)
+            if len(key) > 0:
+                load_observed_counts(sid, key[0])
+                for _, load in self.projection_sources(sid, scenario, key[0]):
+                    load()
+
+        self.submit(("station", station["id"], scenario, threshold_name), job)
+
+
+prefetcher = Prefetcher()
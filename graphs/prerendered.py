@@ -0,0 +1,128 @@
+import os
+import gzip
+
+import orjson
+import pandas as pd
+from plotly.io.json import to_json_plotly
+
+import graphs.figures as figs
+from graphs.projection_store import store_file
+from graphs.htf_projection import narrative_facts_file
+from graphs.station_data import station_data, file_digests
+
+# -------------------------------------------------------------------------------------
+# Pre-rendered figure bundles: the outputs of the projected and observed flooding
+# callbacks for every station, scenario and NOAA threshold, written by
+# data/prerender.py as gzip-compressed JSON under ./data/prerendered/<station>/. The
+# callbacks serve a bundle when there is one and fall back to building the figures
+# live otherwise; the files are also served as static JSON at /prerendered/, with
+# caching headers, for a CDN to pick up.
+#
+# Bundles hold the figures' arrays as JSON lists, whatever the encoding of the server
+# that renders them. Where the serving Dash and plotly.js read typed arrays, the
+# figures of a bundle are read back to numpy arrays as it is loaded, and the
+# callbacks type them as they send them (graphs/figures.py typed_arrays), as they do
+# figures built live.
+#
+# A bundle records the size and hash of the data files it was rendered from under
+# "sources", and is ignored once any of them differs, so rebuilding the data never
+# serves stale figures. Set FAT_PRERENDERED=off to always
+# build figures live.
+# -------------------------------------------------------------------------------------
+
+PRERENDERED_DIR = "./data/prerendered"
+PRERENDERED = os.environ.get("FAT_PRERENDERED", "on") != "off"
+
+
+def projection_bundle(scenario, threshold_key):
+    return f"{scenario}/{threshold_key}"
+
+
+def observed_bundle(threshold_key, units):
+    return f"observed/{threshold_key}_{units}"
+
+
+def bundle_file(station_id, name):
+    return f"{PRERENDERED_DIR}/{station_id}/{name}.json.gz"
+
+
+def projection_sources(station_id, scenario, threshold_key):
+    return [
+        store_file(station_id, scenario),
+        narrative_facts_file(station_id, scenario),
+        f"./data/ensemble_calcs/{station_id}/{scenario}/{threshold_key}.json",
+    ]
+
+
+def observed_sources(station_id, threshold_key):
+    return [
+        f"./data/levels/{station_id}.json",
+        f"./data/day_min_max/{station_id}.csv",
+        f"./data/htf_observed/{station_id}/{threshold_key}.json",
+    ]
+
+
+def observed_outputs(fig, analysis):
+    """Bundle of the observed flooding graph and analysis; the monthly climatology is
+    kept as a table so the text can be written from it on request."""
+
+    climatology = analysis["climatology"].to_dict("split")
+    return {"obs": [fig, {**analysis, "climatology": climatology}]}
+
+
+def observed_from_bundle(bundle):
+
+    fig, analysis = bundle["obs"]
+    climatology = pd.DataFrame(**analysis["climatology"])
+
+    return fig, {**analysis, "climatology": climatology}
+
+
+def write_bundle(station_id, name, outputs, sources):
+    """Write callback outputs as a bundle, with the digests of the data files they
+    were rendered from; returns its size in bytes."""
+
+    fname = bundle_file(station_id, name)
+    os.makedirs(os.path.dirname(fname), exist_ok=True)
+
+    # the encoder Dash uses for callback responses, so bundles serve the same JSON
+    bundle = {"sources": file_digests(sources), **outputs}
+    data = gzip.compress(to_json_plotly(bundle).encode(), compresslevel=9)
+    with open(fname + ".tmp", "wb") as f:
+        f.write(data)
+    os.replace(fname + ".tmp", fname)
+
+    return len(data)
+
+
+def bundle_arrays(obj):
+    """A bundle with the arrays of its figures as numpy arrays."""
+
+    if isinstance(obj, dict):
+        if "data" in obj and "layout" in obj:
+            return figs.figure_arrays(obj)
+        return {k: bundle_arrays(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [bundle_arrays(v) for v in obj]
+    return obj
+
+
+def load_bundle(station_id, name, sources):
+    """Callback outputs of a bundle, or None if there is none or any of its data files
+    has changed since it was rendered."""
+
+    if not PRERENDERED:
+        return None
+
+    fname = bundle_file(station_id, name)
+
+    def read():
+        if not os.path.exists(fname):
+            return None
+        with open(fname, "rb") as f:
+            bundle = orjson.loads(gzip.decompress(f.read()))
+        if bundle.pop("sources", None) != file_digests(sources):
+            return None
+        return bundle_arrays(bundle) if figs.TYPED_ARRAYS else bundle
+
+    return station_data.get(("prerendered", station_id, name), read)
@@ -0,0 +1,110 @@
+import numpy as np
+
+# -------------------------------------------------------------------------------------
+# Projection data for a single station/scenario/threshold, as calculated in
+# ./data/ensemble_calcs/<station>/<scenario>/<threshold>.json. Each block of the file
+# is turned into a Table (numpy arrays) only the first time it is used; blocks that a
+# page never shows are never converted.
+# -------------------------------------------------------------------------------------
+
+# attribute name: (block in the file, index key, values key, column type)
+BLOCKS = {
+    "annual": ("annual_percentiles", "years", "percentiles", int),
+    "pent_avg": ("pentad_mean_month_percentiles", "pentads", "percentiles", int),
+    "pent_mxmo": ("pentad_max_month_percentiles", "pentads", "percentiles", int),
+    "pent_mxssn": ("pentad_max_season_percentiles", "pentads", "percentiles", int),
+    "annual_at_least": ("annual_probabilities", "years", "prob_at_least_n", str),
+    "annual_first_yr": ("annual_probabilities", "years", "prob_first_year", str),
+    "monthly_at_least": ("monthly_probabilities", "years", "prob_at_least_n", str),
+    "monthly_first_yr": ("monthly_probabilities", "years", "prob_first_year", str),
+}
+
+
+class Table:
+    """One block of the projection file: a sorted index of years (or pentads) and a
+    2-D array with a column per percentile (or per count of flooding days)."""
+
+    __slots__ = ("index", "columns", "values", "_col")
+
+    def __init__(self, index, columns, values):
+        self.index = index
+        self.columns = columns
+        self.values = values
+        self._col = {c: n for n, c in enumerate(columns)}
+
+    def __getitem__(self, col):
+        return self.values[:, self._col[col]]
+
+    def __len__(self):
+        return self.index.size
+
+    def rows(self, keys):
+        """Row(s) of a year (or list of years); KeyError if any is not in the index,
+        as with DataFrame.loc."""
+        rows = np.searchsorted(self.index, keys)
+        found = np.take(self.index, rows, mode="clip") == keys
+        if not np.all(found):
+            raise KeyError(np.asarray(keys)[~found].tolist() if np.ndim(keys) else keys)
+        return rows
+
+    def at(self, keys, col):
+        """Value(s) in a column for a year (or list of years)."""
+        return self.values[self.rows(keys), self._col[col]]
+
+
+class ProjectionData:
+    """Blocks of a projection file, decoded on first access. The source is either the
+    parsed JSON file (JsonSource) or a record of the compact projection store
+    (graphs.projection_store.StoreRecord)."""
+
+    __slots__ = ("scenario", "threshold", "yoi", "_source", "clim") + tuple(BLOCKS)
+
+    def __init__(self, scenario, threshold, source):
+        self.scenario = scenario
+        self.threshold = threshold
+        self.yoi = source.yoi()
+        self._source = source
+
+    def __getattr__(self, name):
+        # only called for slots that have not been filled yet
+        if name != "clim" and name not in BLOCKS:
+            raise AttributeError(name)
+        value = self._source.decode(name)
+        setattr(self, name, value)
+        return value
+
+
+class JsonSource:
+    """A projection file as parsed by json.load. The monthly percentiles (clim) are
+    passed to the browser as-is and are never converted."""
+
+    __slots__ = ("analysis", "_indexes")
+
+    def __init__(self, analysis):
+        self.analysis = analysis
+        self._indexes = dict()
+
+    def yoi(self):
+        return self.analysis["yoi"]
+
+    def _index(self, keys):
+        # blocks with the same years share a single index array
+        k = tuple(keys)
+        if k not in self._indexes:
+            self._indexes[k] = np.array(keys)
+        return self._indexes[k]
+
+    def decode(self, name):
+
+        if name == "clim":
+            return self.analysis["monthly_percentiles"]
+
+        block, index_key, values_key, col_type = BLOCKS[name]
+        b = self.analysis[block]
+        v = b[values_key]
+
+        return Table(
+            self._index(b[index_key]),
+            [col_type(c) for c in v],
+            np.array([v[c] for c in v]).T,
+        )
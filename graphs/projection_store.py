@@ -0,0 +1,377 @@
+import os
+import glob
+import json
+import zlib
+import struct
+import zipfile
+
+import numpy as np
+
+from graphs.projection_data import BLOCKS, Table, ProjectionData
+from graphs.shared_cache import shared_arrays
+from graphs.station_data import station_data, files_digest
+
+# -------------------------------------------------------------------------------------
+# Compact projection store. All thresholds of a station/scenario are kept in one file,
+# ./data/ensemble_calcs/<station>/<scenario>.npz, with each block of the JSON files
+# stacked into a single array with a leading threshold axis:
+#
+#   annual percentiles (flooding days per year, 0-366)     uint16, exact
+#   pentad and monthly percentiles (days per month, 0-31)   uint8, exact
+#   probabilities (0-1)                                     uint16 fixed point,
+#                                                           p = q / 60000, error at
+#                                                           most 0.5 / 60000 (8.3e-6)
+#
+# The probabilities are fractions of a 1000-member ensemble, and 60000 is a multiple of
+# 1000, so in practice they decode to exactly the values in the JSON files.
+#
+# Consecutive thresholds give nearly identical curves, so the arrays are split into
+# chunks of CHUNK_SIZE thresholds, each threshold within a chunk is stored as the
+# (wrapping, unsigned) difference from the previous one, and each chunk is compressed
+# separately with zlib. Looking up a threshold decompresses only its own chunk.
+#
+# The JSON files remain the originals; data/compact_store.py builds the store from
+# them and reports the decoding error against them. The store records the size and
+# hash of the JSON files it was built from, and is not used once they differ (the
+# JSON files are read instead), so rebuilt calculations are never served from an old
+# store.
+# -------------------------------------------------------------------------------------
+
+STORE_VERSION = 2
+CHUNK_SIZE = 16
+
+PROB_SCALE = 60000
+PROB_MAX_ERROR = 0.5 / PROB_SCALE
+
+# storage dtype and fixed-point scale (None for integer counts) of each block
+ENCODING = {
+    "annual": (np.uint16, None),
+    "pent_avg": (np.uint8, None),
+    "pent_mxmo": (np.uint8, None),
+    "pent_mxssn": (np.uint8, None),
+    "annual_at_least": (np.uint16, PROB_SCALE),
+    "annual_first_yr": (np.uint16, PROB_SCALE),
+    "monthly_at_least": (np.uint16, PROB_SCALE),
+    "monthly_first_yr": (np.uint16, PROB_SCALE),
+    "clim": (np.uint8, None),
+}
+
+
+def store_file(station_id, scenario):
+    return f"./data/ensemble_calcs/{station_id}/{scenario}.npz"
+
+
+def projection_files(station_id, scenario):
+    """The JSON calculations a store is built from, in threshold order."""
+    return sorted(
+        glob.glob(f"./data/ensemble_calcs/{station_id}/{scenario}/[0-9]*.json")
+    )
+
+
+def encode(values, name):
+    dtype, scale = ENCODING[name]
+    values = np.asarray(values, dtype=float)
+    if scale is not None:
+        values = values * scale
+    info = np.iinfo(dtype)
+    if values.min() < info.min or values.max() > info.max:
+        raise ValueError(f"{name} values out of range for {np.dtype(dtype).name}")
+    return np.round(values).astype(dtype)
+
+
+def decode(values, name):
+    dtype, scale = ENCODING[name]
+    if scale is not None:
+        return values / scale
+    return values.astype(np.int64)
+
+
+# -------------------------------------------------------------------------------------
+# building
+
+
+def build_store(station_id, scenario):
+    """Stack the JSON files of a station/scenario into the arrays of the store."""
+
+    fnames = projection_files(station_id, scenario)
+
+    thresholds = []
+    yoi = []
+    stacked = {name: [] for name in ENCODING}
+    axes = dict()
+
+    def check_axis(key, values):
+        # every threshold must share the same years/pentads/columns
+        if key not in axes:
+            axes[key] = list(values)
+        elif axes[key] != list(values):
+            raise ValueError(f"{key} differ between thresholds of {scenario}")
+
+    for fname in fnames:
+
+        with open(fname, "r") as f:
+            analysis = json.load(f)
+
+        thresholds.append(int(os.path.basename(fname)[:-5]))
+        yoi.append(analysis["yoi"] if analysis["yoi"] is not None else [0, 0, 0])
+
+        for name, (block, index_key, values_key, _) in BLOCKS.items():
+            b = analysis[block]
+            check_axis(index_key, b[index_key])
+            check_axis(name + "_columns", [int(c) for c in b[values_key]])
+            stacked[name].append([b[values_key][c] for c in b[values_key]])
+
+        clim = analysis["monthly_percentiles"]
+        check_axis("years", [int(y) for y in clim])
+        for y in clim:
+            check_axis("clim_columns", [int(c) for c in clim[y]])
+        stacked["clim"].append([[clim[y][c] for c in clim[y]] for y in clim])
+
+    store = {
+        "sources": np.array(files_digest(fnames)),
+        "thresholds": np.array(thresholds, dtype=np.uint16),
+        "yoi": np.array(yoi, dtype=np.int16),
+        **{key: np.array(axes[key], dtype=np.int64) for key in axes},
+    }
+    for name in BLOCKS:
+        # (threshold, column, row) -> (threshold, row, column)
+        store[name] = encode(stacked[name], name).transpose(0, 2, 1)
+    store["clim"] = encode(stacked["clim"], "clim")
+
+    return store
+
+
+def delta_encode(values):
+    """Differences along the threshold axis, wrapping in the unsigned dtype."""
+    deltas = values.copy()
+    deltas[1:] = values[1:] - values[:-1]
+    return deltas
+
+
+def delta_decode(deltas):
+    return np.cumsum(deltas, axis=0, dtype=deltas.dtype)
+
+
+def write_store(station_id, scenario, store):
+
+    n = store["thresholds"].size
+    chunks = []
+    for c0 in range(0, n, CHUNK_SIZE):
+        raw = b"".join(
+            delta_encode(np.ascontiguousarray(store[name][c0 : c0 + CHUNK_SIZE]))
+            .tobytes()
+            for name in ENCODING
+        )
+        chunks.append(zlib.compress(raw, 9))
+
+    np.savez(
+        store_file(station_id, scenario),
+        version=STORE_VERSION,
+        chunk_size=CHUNK_SIZE,
+        chunk_offsets=np.cumsum([0] + [len(c) for c in chunks]),
+        chunks=np.frombuffer(b"".join(chunks), dtype=np.uint8),
+        # shape of a single threshold of each array, for decoding the chunks
+        **{name + "_shape": store[name].shape[1:] for name in ENCODING},
+        **{k: v for k, v in store.items() if k not in ENCODING},
+    )
+
+
+# -------------------------------------------------------------------------------------
+# reading
+
+
+def open_store(station_id, scenario):
+    """Axes and memory-mapped compressed chunks of a station/scenario store, or None
+    if it has not been built or its JSON calculations have changed since."""
+
+    if not store_current(station_id, scenario):
+        return None
+
+    return station_data.mapped(
+        ("projection_store", station_id, scenario),
+        lambda: map_store(store_file(station_id, scenario)),
+    )
+
+
+def store_current(station_id, scenario):
+    """Whether a station/scenario store exists and was built from its JSON
+    calculations as they are now. Checked once."""
+
+    def check():
+        filename = store_file(station_id, scenario)
+        if not os.path.exists(filename):
+            return False
+        with np.load(filename) as f:
+            if "sources" not in f.files:
+                return False
+            sources = str(f["sources"])
+        return sources == files_digest(projection_files(station_id, scenario))
+
+    return station_data.get(("projection_store_current", station_id, scenario), check)
+
+
+def map_store(filename):
+
+    if not os.path.exists(filename):
+        return None
+
+    with np.load(filename) as f:
+        store = {k: f[k] for k in f.files if k != "chunks"}
+
+    if store["version"] != STORE_VERSION:
+        raise ValueError(f"{filename} is an old store version; rebuild it")
+
+    store["chunks"] = npz_memmap(filename, "chunks.npy")
+    store["positions"] = {int(t): n for n, t in enumerate(store["thresholds"])}
+
+    return store
+
+
+def npz_memmap(filename, member):
+    """Memory-map an array saved uncompressed in an .npz file (np.savez)."""
+
+    with zipfile.ZipFile(filename) as z:
+        info = z.getinfo(member)
+    if info.compress_type != zipfile.ZIP_STORED:
+        raise ValueError(f"{member} in {filename} is compressed and cannot be mapped")
+
+    with open(filename, "rb") as f:
+        # skip the zip local file header to the start of the .npy data
+        f.seek(info.header_offset + 26)
+        name_len, extra_len = struct.unpack("<HH", f.read(4))
+        f.seek(info.header_offset + 30 + name_len + extra_len)
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+
+    return np.memmap(
+        filename,
+        dtype=dtype,
+        mode="r",
+        shape=shape,
+        offset=offset,
+        order="F" if fortran_order else "C",
+    )
+
+
+def read_chunk(station_id, scenario, c):
+    """Chunk c of a store as an array per block, each with a leading axis over the
+    thresholds in the chunk. Decoded chunks are shared between worker processes."""
+
+    def load():
+        store = open_store(station_id, scenario)
+        return shared_arrays(
+            f"ensemble_calcs/{station_id}/{scenario}/{c}",
+            [store_file(station_id, scenario)],
+            lambda: decode_chunk(store, c),
+        )
+
+    return station_data.get(("projection_chunk", station_id, scenario, c), load)
+
+
+def store_chunk(station_id, scenario, threshold):
+    """Index of the chunk holding a threshold key (e.g. "052") in its store, or None
+    if the store or the threshold is not available."""
+
+    store = open_store(station_id, scenario)
+    if store is None or int(threshold) not in store["positions"]:
+        return None
+
+    return store["positions"][int(threshold)] // int(store["chunk_size"])
+
+
+def read_block(station_id, scenario, name):
+    """A block of a store at every threshold, as one array with a leading threshold
+    axis, or None if the store has not been built. Shared between worker processes."""
+
+    def load():
+        store = open_store(station_id, scenario)
+        if store is None:
+            return None
+        chunks = store["chunk_offsets"].size - 1
+        return shared_arrays(
+            f"ensemble_calcs/{station_id}/{scenario}/{name}",
+            [store_file(station_id, scenario)],
+            lambda: {
+                name: np.concatenate(
+                    [read_chunk(station_id, scenario, c)[name] for c in range(chunks)]
+                )
+            },
+        )[name]
+
+    return station_data.get(("projection_block", station_id, scenario, name), load)
+
+
+def decode_chunk(store, c):
+    """Decompress and delta-decode chunk c of a store."""
+
+    o1, o2 = store["chunk_offsets"][c : c + 2]
+    raw = zlib.decompress(store["chunks"][o1:o2].tobytes())
+    nt = min(store["chunk_size"], store["thresholds"].size - c * store["chunk_size"])
+
+    chunk = dict()
+    offset = 0
+    for name, (dtype, _) in ENCODING.items():
+        shape = (nt, *store[name + "_shape"])
+        count = int(np.prod(shape))
+        deltas = np.frombuffer(raw, dtype=dtype, count=count, offset=offset)
+        chunk[name] = delta_decode(deltas.reshape(shape))
+        offset += count * np.dtype(dtype).itemsize
+
+    return chunk
+
+
+def load_stored_projection(station_id, scenario, threshold):
+    """ProjectionData for a threshold key (e.g. "052") from the store, or None if the
+    store or the threshold is not available."""
+
+    store = open_store(station_id, scenario)
+
+    if store is None or int(threshold) not in store["positions"]:
+        return None
+
+    record = StoreRecord(station_id, scenario, store["positions"][int(threshold)])
+
+    return ProjectionData(scenario, threshold, record)
+
+
+class StoreRecord:
+    """A single threshold of a store, decoded one block at a time."""
+
+    __slots__ = ("station_id", "scenario", "n", "store")
+
+    def __init__(self, station_id, scenario, n):
+        self.station_id = station_id
+        self.scenario = scenario
+        self.n = n
+        self.store = open_store(station_id, scenario)
+
+    def yoi(self):
+        yoi = self.store["yoi"][self.n]
+        return None if yoi[0] == 0 else yoi.tolist()
+
+    def _values(self, name):
+        c, row = divmod(self.n, int(self.store["chunk_size"]))
+        return read_chunk(self.station_id, self.scenario, c)[name][row]
+
+    def decode(self, name):
+
+        if name == "clim":
+            years = self.store["years"].tolist()
+            pcts = self.store["clim_columns"].tolist()
+            clim = self._values("clim").tolist()
+            return {
+                str(y): {str(p): clim[i][j] for j, p in enumerate(pcts)}
+                for i, y in enumerate(years)
+            }
+
+        _, index_key, _, col_type = BLOCKS[name]
+
+        return Table(
+            self.store[index_key],
+            [col_type(c) for c in self.store[name + "_columns"].tolist()],
+            decode(self._values(name), name),
+        )
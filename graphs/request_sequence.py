@@ -0,0 +1,201 @@
+import os
+import time
+import secrets
+import threading
+import functools
+from collections import Counter, OrderedDict
+
+import dash
+import flask
+from dash.exceptions import PreventUpdate
+
+# -------------------------------------------------------------------------------------
+# Per-session request sequencing for callbacks that fire in bursts (typing into
+# threshold-float, arrowing through scenario-select). Each request to a sequenced
+# callback takes the next number on its channel (session and callback). A request is
+# superseded once a newer request on its channel has returned an update: it stops and
+# returns no update, since the browser has a newer answer.
+#
+# While a newer request is still running, an older one cannot tell whether it will
+# answer: it may end in PreventUpdate or an error, and then the older one's update is
+# the last the browser gets. An older request that finishes first returns its update,
+# which the newer one's replaces if it answers.
+#
+# A request that arrives within DEBOUNCE of the previous one on its channel is part of
+# a burst: it waits DEBOUNCE before doing any work, then for any newer requests on its
+# channel to finish, and only does the work if none of them answered; a burst is thus
+# coalesced into the last request that answers. Requests that are not part of a burst
+# start at once. Callbacks can call checkpoint() between expensive steps to give up as
+# soon as they are superseded; these checkpoints do not wait, since the request may be
+# building something (graphs/single_flight.py) that a newer one is waiting for.
+#
+# Callbacks whose work depends on which input fired them (update_page) are sequenced
+# per trigger, so that only repeated changes of the same input supersede each other.
+#
+# Sessions are identified by a cookie set by init_sessions(); sequencing is per server
+# process. Set FAT_DEBOUNCE_MS to change the burst window (0 turns waiting off).
+# -------------------------------------------------------------------------------------
+
+SESSION_COOKIE = "fat_session"
+DEBOUNCE = float(os.environ.get("FAT_DEBOUNCE_MS", 60)) / 1000
+MAX_CHANNELS = 10000
+
+
+def init_sessions(server):
+    """Give every browser a session id cookie."""
+
+    @server.before_request
+    def read_session():
+        flask.g.session_id = flask.request.cookies.get(SESSION_COOKIE)
+        flask.g.new_session = flask.g.session_id is None
+        if flask.g.new_session:
+            flask.g.session_id = secrets.token_hex(8)
+
+    @server.after_request
+    def write_session(response):
+        if flask.g.get("new_session", False):
+            response.set_cookie(SESSION_COOKIE, flask.g.session_id, samesite="Lax")
+        return response
+
+
+class RequestSequencer:
+    def __init__(self, debounce=DEBOUNCE):
+
+        self.debounce = debounce
+        self._lock = threading.Lock()
+        # notified whenever a request finishes
+        self._finished = threading.Condition(self._lock)
+        # channel -> time the latest request started, number of the newest request
+        # that returned an update, and numbers of the requests running
+        self._channels = OrderedDict()
+        self._next = 0
+        self._stats = Counter()
+        # channel and number of the request running in this thread
+        self._local = threading.local()
+
+    def sequenced(self, name, per_trigger=False):
+        """Decorator for a callback whose superseded requests should be dropped; with
+        per_trigger, requests fired by different inputs do not supersede each other."""
+
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+
+                session = (
+                    flask.g.get("session_id", None)
+                    if flask.has_request_context()
+                    else None
+                )
+                if session is None:
+                    return func(*args, **kwargs)
+
+                channel = (session, name)
+                if per_trigger:
+                    channel += (dash.callback_context.triggered[0]["prop_id"],)
+                burst = self._start(channel)
+                if burst and self.debounce > 0:
+                    time.sleep(self.debounce)
+
+                ticket = self._local.ticket
+                try:
+                    if self._superseded(*ticket, wait=True):
+                        self._count("superseded_waiting")
+                        raise PreventUpdate()
+                    result = func(*args, **kwargs)
+                except BaseException:
+                    self._finish(*ticket, answered=False)
+                    raise
+                finally:
+                    self._local.ticket = None
+
+                # a newer request answered meanwhile
+                if not self._finish(*ticket, answered=True):
+                    self._count("superseded_done")
+                    raise PreventUpdate()
+
+                self._count("completed")
+                return result
+
+            return wrapper
+
+        return decorator
+
+    def _start(self, channel):
+
+        now = time.monotonic()
+        with self._lock:
+            self._next += 1
+            previous = self._channels.pop(channel, None)
+            started, answered, running = (
+                previous if previous is not None else (None, 0, set())
+            )
+            running.add(self._next)
+            self._channels[channel] = (now, answered, running)
+            while len(self._channels) > MAX_CHANNELS:
+                self._channels.popitem(last=False)
+            self._stats["started"] += 1
+            self._local.ticket = (channel, self._next)
+
+        return started is not None and now - started < self.debounce
+
+    def _finish(self, channel, number, answered):
+        """Record the end of a request; with answered, whether its update is still the
+        newest (it is not if a newer request answered first)."""
+
+        with self._lock:
+            self._finished.notify_all()
+            entry = self._channels.get(channel)
+            if entry is None:
+                return True
+            started, newest, running = entry
+            running.discard(number)
+            if answered and number > newest:
+                self._channels[channel] = (started, number, running)
+            return number > newest
+
+    def _superseded(self, channel, number, wait=False):
+        """Whether a newer request on the channel has answered; with wait, waits for
+        the newer requests still running to finish first."""
+
+        with self._lock:
+            while True:
+                entry = self._channels.get(channel)
+                if entry is None:
+                    return False
+                _, newest, running = entry
+                if newest > number:
+                    return True
+                if not wait or not any(n > number for n in running):
+                    return False
+                self._finished.wait()
+
+    def _count(self, outcome):
+        with self._lock:
+            self._stats[outcome] += 1
+
+    def checkpoint(self):
+        """Stop the request running in this thread if a newer one on its channel has
+        answered; does nothing outside a sequenced callback."""
+
+        ticket = getattr(self._local, "ticket", None)
+        if ticket is not None and self._superseded(*ticket):
+            self._count("superseded_running")
+            raise PreventUpdate()
+
+    def stats(self):
+        with self._lock:
+            started = self._stats["started"]
+            superseded = sum(
+                n for k, n in self._stats.items() if k.startswith("superseded")
+            )
+            return {
+                **dict(self._stats),
+                "sessions": len({channel[0] for channel in self._channels}),
+                # share of requests dropped because a newer one replaced them
+                "superseded_ratio": superseded / started if started > 0 else None,
+            }
+
+
+sequencer = RequestSequencer()
+sequenced = sequencer.sequenced
+checkpoint = sequencer.checkpoint
@@ -0,0 +1,128 @@
+import graphs.analysis as anlyz
+import graphs.figures as figs
+from graphs.htf_projection import load_projection_batch
+from graphs.station_data import station_data
+
+# -------------------------------------------------------------------------------------
+# Projected flooding days of every SLR scenario at the current threshold, overlaid in
+# one graph with a table of the YOI and onset years of each. The six projections are
+# loaded concurrently in one batch and cached together, so the panel and flipping
+# between scenarios afterwards cost a single round of file reads.
+# -------------------------------------------------------------------------------------
+
+# in the order of the SLR scenarios graph, with the same colors
+SCENARIOS = ["low", "int_low", "int", "int_high", "high", "traj"]
+
+
+def scenario_colors():
+    col = anlyz.color_palette()
+    return dict(zip(SCENARIOS, [col[c] for c in [1, 0, 5, 6, 4]] + ["#000"]))
+
+
+def load_scenario_comparison(station, threshold):
+    """Median and likely range of annual flooding days, YOI and onset years of every
+    scenario at a threshold; scenarios without a projection are left out."""
+
+    def load():
+        batch = load_projection_batch(station, [(scn, threshold) for scn in SCENARIOS])
+
+        comparison = dict()
+        for (scn, _), (meta, data, facts) in batch.items():
+            if data is None:
+                continue
+            annual = data.annual
+            comparison[scn] = {
+                "years": annual.index,
+                "17": annual[17],
+                "50": annual[50],
+                "83": annual[83],
+                "yoi": meta["steps"][1] if meta["steps"] is not None else None,
+                "routine_onset": facts["routine_onset"],
+                "chronic_onset": facts["chronic_onset"],
+            }
+
+        return comparison
+
+    return station_data.get(("scenario_comparison", station["id"], threshold), load)
+
+
+def scenario_comparison(comparison, names, scn_focus="int"):
+
+    if comparison is None or len(comparison) == 0:
+        return figs.blank_figure("No projections for this flooding threshold")
+
+    col = scenario_colors()
+
+    traces = []
+    for scn, c in comparison.items():
+        focus = scn == scn_focus
+        fill = anlyz.fill_color(col[scn], 0.3 if focus else 0.12)
+        traces.extend(
+            [
+                {
+                    "x": c["years"],
+                    "y": c["17"],
+                    "fill": "none",
+                    "showlegend": False,
+                    "legendgroup": scn,
+                    "line": {"color": fill, "width": 0},
+                    "hoverinfo": "none",
+                },
+                {
+                    "x": c["years"],
+                    "y": c["83"],
+                    "fill": "tonexty",
+                    "fillcolor": fill,
+                    "showlegend": False,
+                    "legendgroup": scn,
+                    "mode": "none",
+                    "hoverinfo": "none",
+                },
+                {
+                    "x": c["years"],
+                    "y": c["50"],
+                    "name": names[scn],
+                    "legendgroup": scn,
+                    "line": {"color": col[scn], "width": 4 if focus else 2},
+                    "hovertemplate": "%{y}<extra>" + names[scn] + "</extra>",
+                },
+            ]
+        )
+
+    fig_layout = figs.layout(
+        margin=dict(l=60, r=10, b=42, t=30, pad=0),
+        font=dict(size=14),
+        xaxis=dict(layer="below traces", range=[2020, 2100]),
+        yaxis=dict(
+            layer="below traces",
+            range=[-5, 370],
+            title=dict(text="Flooding days per year"),
+        ),
+        hovermode="x",
+        legend=dict(x=0.02, y=1, itemclick="toggle", itemdoubleclick="toggleothers"),
+        modebar=figs.MODEBAR,
+    )
+
+    return figs.figure(traces, fig_layout)
+
+
+def scenario_summary_table(comparison, names):
+    """Rows of the YOI/onset table, one per scenario."""
+
+    if comparison is None:
+        return []
+
+    def year(y, end):
+        if y == "current":
+            return "Now"
+        return f"After {end}" if y is None else str(y)
+
+    return [
+        {
+            "scenario": names[scn],
+            "yoi": str(c["yoi"]) if c["yoi"] is not None else "–",
+            "routine_onset": year(c["routine_onset"], c["years"][-1]),
+            "chronic_onset": year(c["chronic_onset"], c["years"][-1]),
+        }
+        for scn, c in comparison.items()
+    ]
@@ -0,0 +1,101 @@
+import os
+import glob
+import shutil
+import tempfile
+import functools
+
+import numpy as np
+
+# -------------------------------------------------------------------------------------
+# Decoded station arrays shared between server worker processes. The first process to
+# need an entry builds it and saves its arrays as .npy files in a directory under
+# CACHE_DIR (shared memory on Linux); every process then memory-maps those files
+# read-only, so all workers read the same pages and memory does not grow with the
+# number of workers.
+#
+# The directory tree is the index: an entry for key "day_min_max/1612340" lives in
+# CACHE_DIR/day_min_max/1612340.<version>/, where the version is taken from the
+# modification time and size of the source files, so rebuilt data files get a new
+# entry. Entries are published with an atomic rename, so readers never see a partly
+# written entry.
+#
+# Set FAT_SHARED_CACHE to a directory to move the cache, or to "off" to disable it.
+# -------------------------------------------------------------------------------------
+
+CACHE_DIR = os.environ.get(
+    "FAT_SHARED_CACHE",
+    os.path.join(
+        "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(),
+        "flooding-analysis-tool",
+    ),
+)
+
+
+def source_version(sources):
+    stats = [os.stat(f) for f in sources]
+    return "-".join(f"{st.st_mtime_ns:x}{st.st_size:x}" for st in stats)
+
+
+def shared_arrays(key, sources, build):
+    """Read-only arrays for key, built by build() (returning a dict of numeric
+    arrays) the first time any process asks for them."""
+
+    if CACHE_DIR == "off":
+        return build()
+
+    path = os.path.join(CACHE_DIR, key) + "." + source_version(sources)
+
+    if not os.path.isdir(path):
+        try:
+            publish(path, build())
+        except OSError:
+            # cache directory not writable; serve without sharing
+            return build()
+
+    return attach(path)
+
+
+def publish(path, arrays):
+
+    tmp = f"{path}.tmp{os.getpid()}"
+    published = False
+    try:
+        os.makedirs(tmp, exist_ok=True)
+        for name, values in arrays.items():
+            fname = os.path.join(tmp, name + ".npy")
+            np.save(fname, np.asarray(values), allow_pickle=False)
+        try:
+            os.rename(tmp, path)
+            published = True
+        except OSError:
+            # another process published the same entry first
+            if not os.path.isdir(path):
+                raise
+    finally:
+        # a failed write (shared memory full, say) must not leave its files behind
+        if not published:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    if not published:
+        return
+
+    # drop entries built from older versions of the source files; processes that
+    # still have them mapped keep their pages until they let go
+    stem = path.rsplit(".", 1)[0]
+    for old in glob.glob(glob.escape(stem) + ".*"):
+        if old != path and ".tmp" not in old:
+            shutil.rmtree(old, ignore_errors=True)
+
+
+@functools.lru_cache(maxsize=512)
+def attach(path):
+    return {
+        os.path.basename(f)[:-4]: np.load(f, mmap_mode="r")
+        for f in glob.glob(os.path.join(glob.escape(path), "*.npy"))
+    }
+
+
+def clear_shared_cache():
+    attach.cache_clear()
+    if CACHE_DIR != "off":
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
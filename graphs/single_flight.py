@@ -0,0 +1,111 @@
+import threading
+from collections import Counter
+
+# -------------------------------------------------------------------------------------
+# Single-flight execution: concurrent calls for the same key wait for the one call in
+# flight and share its result, instead of each repeating the work. Used by the station
+# data manager for every load, and by the app for the figures of the heavier pages.
+#
+# If the call in flight fails (or is abandoned because its own request was superseded)
+# the waiting calls try again, so one session's cancellation never reaches another.
+# -------------------------------------------------------------------------------------
+
+# keys kept in the per-key waiter counts
+MAX_KEYS = 1000
+
+
+class _Call:
+    __slots__ = ("done", "result", "failed", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.failed = False
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self):
+
+        self._lock = threading.Lock()
+        self._calls = dict()
+        # by kind of key (its first element): calls made, calls that waited instead,
+        # and the most calls that waited on a single one
+        self._leaders = Counter()
+        self._waiters = Counter()
+        self._max_waiters = Counter()
+        # waiters of each key
+        self._key_waiters = Counter()
+
+    def do(self, key, func):
+        """func() for key, or the result of the call for key already in flight."""
+
+        while True:
+
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+                else:
+                    call.waiters += 1
+
+            if leader:
+                return self._lead(key, call, func)
+
+            call.done.wait()
+            with self._lock:
+                self._waiters[key[0]] += 1
+            if not call.failed:
+                return call.result
+
+    def _lead(self, key, call, func):
+
+        try:
+            call.result = func()
+        except BaseException:
+            call.failed = True
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                self._leaders[key[0]] += 1
+                if call.waiters > 0:
+                    self._max_waiters[key[0]] = max(
+                        self._max_waiters[key[0]], call.waiters
+                    )
+                    self._key_waiters[key] += call.waiters
+                    if len(self._key_waiters) > 2 * MAX_KEYS:
+                        self._key_waiters = Counter(
+                            dict(self._key_waiters.most_common(MAX_KEYS))
+                        )
+            call.done.set()
+
+        return call.result
+
+    def stats(self, top=20):
+        """Calls and waiters by kind of key, the keys that were waited on most, and
+        the calls in flight now with their waiters."""
+
+        with self._lock:
+            return {
+                "by_kind": {
+                    kind: {
+                        "calls": self._leaders[kind],
+                        "waiters": self._waiters[kind],
+                        "max_waiters": self._max_waiters[kind],
+                    }
+                    for kind in self._leaders
+                },
+                "top_keys": [
+                    {"key": list(key), "waiters": n}
+                    for key, n in self._key_waiters.most_common(top)
+                ],
+                "in_flight": [
+                    {"key": list(key), "waiters": call.waiters}
+                    for key, call in self._calls.items()
+                ],
+            }
+
+
+single_flight = SingleFlight()
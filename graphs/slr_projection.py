@@ -1,10 +1,184 @@
-import plotly.graph_objects as go
+import os
+import json
+
 import numpy as np
 import pandas as pd
-import xarray as xr
-import json
+from dash import dcc
 
 import graphs.analysis as anlyz
+import graphs.figures as figs
+from graphs.station_data import station_data, file_digest
+
+
+def slr_scenarios_file(station_id):
+    return f"./data/slr_scenarios/{station_id}.json"
+
+
+def load_slr_scenarios(station_id):
+    """SLR scenarios of a station as parsed from JSON; shared between requests, so it
+    must not be modified."""
+
+    def read():
+        with open(slr_scenarios_file(station_id), "r") as f:
+            return json.load(f)
+
+    return station_data.get(("slr_scenarios", station_id), read)
+
+
+# -------------------------------------------------------------------------------------
+# SLR summary: the scenario table, the median SLR of each scenario in its last year and
+# the likelihood statements of the SLR page, in both units. Written per station by
+# data/slr_summary.py to ./data/slr_summary/<station>.json, with the size and hash of
+# the scenarios file it was computed from, and read once; computed from the SLR
+# scenarios instead if it is missing or the scenarios file has changed since.
+# -------------------------------------------------------------------------------------
+
+SUMMARY_YEARS = [2050, 2100]
+
+# chance that global SLR meets or exceeds each ITF scenario by 2100 (ITF 2022)
+SCENARIO_PROBABILITIES = {
+    "3ºC GSW": {"low": ">99%", "int_low": "82%", "int": "5%", "int_high": "<1%"},
+    "5ºC GSW": {"low": ">99%", "int_low": "97%", "int": "10%", "int_high": "1%"},
+    "VHE/LCP": {"low": ">99%", "int_low": "96%", "int": "49%", "int_high": "20%"},
+}
+for p, h in zip(SCENARIO_PROBABILITIES.values(), ["<1%", "<1%", "8%"]):
+    p.update({"high": h, "traj": "-%"})
+
+# the same as IPCC likelihoods
+SCENARIO_LIKELIHOODS = {
+    "3ºC GSW": {
+        "low": "virtually certain",
+        "int_low": "likely",
+        "int": "very unlikely",
+        "int_high": "exceptionally unlikely",
+        "high": "exceptionally unlikely",
+    },
+    "5ºC GSW": {
+        "low": "virtually certain",
+        "int_low": "very likely",
+        "int": "very unlikely",
+        "int_high": "exceptionally unlikely",
+        "high": "exceptionally unlikely",
+    },
+    "VHE/LCP": {
+        "low": "virtually certain",
+        "int_low": "very likely",
+        "int": "about as likely as not",
+        "int_high": "unlikely",
+        "high": "very unlikely",
+    },
+}
+
+LIKELIHOOD_CHANCES = {
+    "virtually certain": "99–100% chance",
+    "very likely": "90–100% chance",
+    "likely": "66–100% chance",
+    "about as likely as not": "33–66% chance",
+    "unlikely": "0–33% chance",
+    "very unlikely": "0–10% chance",
+    "exceptionally unlikely": "0–1% chance",
+}
+
+
+def slr_summary_file(station_id):
+    return f"./data/slr_summary/{station_id}.json"
+
+
+def slr_summary(slr):
+    """SLR summary of a station's scenarios, as written to its summary file."""
+
+    scenarios = [s for s in slr["names"] if s != "traj"] + [
+        s for s in slr["names"] if s == "traj"
+    ]
+    medians = {
+        s: dict(
+            zip(
+                slr["scenarios"]["years"]["traj" if s == "traj" else "scenarios"],
+                slr["scenarios"]["values"][s]["50"],
+            )
+        )
+        for s in scenarios
+    }
+    year = {s: 2050 if s == "traj" else 2100 for s in scenarios}
+
+    summary = {"year": year}
+    for units in ["ft", "m"]:
+        uf = 3.28084 if units == "ft" else 1.0
+
+        def height(v):
+            return "–" if v is None else str(np.round(v * uf, 2))
+
+        summary[units] = {
+            "table": [
+                {
+                    "id": s,
+                    "Scenario": slr["names"][s],
+                    **{
+                        str(y): height(medians[s].get(y)) + " " + units
+                        for y in SUMMARY_YEARS
+                    },
+                    **{c: p[s] for c, p in SCENARIO_PROBABILITIES.items()},
+                }
+                for s in scenarios
+            ],
+            # truncated, not rounded
+            "by_year": {
+                s: str(int(100 * medians[s][year[s]] * uf) / 100) + " " + units
+                for s in scenarios
+            },
+        }
+
+    summary["likelihood"] = {
+        s: likelihood_statement(slr["names"][s], s) for s in scenarios
+    }
+
+    return summary
+
+
+def likelihood_statement(name, scenario):
+    """Markdown of the likelihood of global SLR meeting a scenario by 2100, as an
+    introduction and bullets; None for the observed trajectory."""
+
+    if scenario not in SCENARIO_LIKELIHOODS["3ºC GSW"]:
+        return None
+
+    l3deg, l5deg, lmici = [lk[scenario] for lk in SCENARIO_LIKELIHOODS.values()]
+    return {
+        "intro": f"The [2022 U.S. Interagency Task Force (ITF) report](https://oceanservice.noaa.gov/hazards/sealevelrise/sealevelrise-tech-report-sections.html) provides the likelihood that *global* mean sea level will meet or exceed the ITF scenarios given various levels of global warming/emissions from [IPCC AR6 ](https://www.ipcc.ch/assessment-report/ar6/) climate models. Note that the likelihood of *local* mean sea level meeting or exceeding a given *local* scenario may differ slightly from the global likelihoods, but the global likelihoods provide a general sense of how likely the scenarios are under various future conditions. The likelihood that *global* sea-level rise will meet or exceed the selected **{name} Scenario** by 2100 is ... ",
+        "bullets": [
+            f"- ***{l3deg.capitalize()}*** for 3ºC of global average surface warming ({LIKELIHOOD_CHANCES[l3deg]})\\*",
+            f"- ***{l5deg.capitalize()}*** for 5ºC of global average surface warming ({LIKELIHOOD_CHANCES[l5deg]})\\*",
+            f"- ***{lmici.capitalize()}*** for very high greenhouse gas emissions** when including the potential for marine ice cliff instability ({LIKELIHOOD_CHANCES[lmici]})\\*",
+        ],
+    }
+
+
+def load_slr_summary(station_id):
+    """SLR summary of a station, from its summary file if it is up to date; shared
+    between requests, so it must not be modified."""
+
+    def read():
+        fname = slr_summary_file(station_id)
+        if os.path.exists(fname):
+            with open(fname, "r") as f:
+                stored = json.load(f)
+            if stored.get("source") == file_digest(slr_scenarios_file(station_id)):
+                return stored["summary"]
+        return slr_summary(load_slr_scenarios(station_id))
+
+    return station_data.get(("slr_summary", station_id), read)
+
+
+def slr_likelihood_text(statement):
+    """Likelihood statement of the SLR page from its Markdown."""
+
+    if statement is None:
+        return "Likelihoods are not evaluated for Observed Trajectories."
+
+    return [
+        dcc.Markdown([statement["intro"]], link_target="_blank"),
+        dcc.Markdown(id="slr-likelihood-bullets", children=statement["bullets"]),
+    ]
 
 
 def slr_projection(slr, scn_focus="int", units="ft"):
@@ -40,17 +214,15 @@ def slr_projection(slr, scn_focus="int", units="ft"):
 
     lw = [5 if s == scn_focus else (3 if s == "traj" else 2) for s in scn_nm]
 
-    fig = go.Figure()
+    traces = []
 
     n = [n for n, scn in enumerate(scn_nm) if scn == scn_focus][0]
     fill_color = anlyz.fill_color(col[n], 0.2)
     years_key = "traj" if scn_focus == "traj" else "scenarios"
-    fig.add_trace(
+    traces.append(
         {
             "x": slr["scenarios"]["years"][years_key],
-            "y": [
-                round(v * uf, 3) for v in slr["scenarios"]["values"][scn_focus]["17"]
-            ],
+            "y": figs.rounded(slr["scenarios"]["values"][scn_focus]["17"], 3, uf),
             "type": "scatter",
             "fill": "none",
             "showlegend": False,
@@ -58,12 +230,10 @@ def slr_projection(slr, scn_focus="int", units="ft"):
             "hoverinfo": "none",
         }
     )
-    fig.add_trace(
+    traces.append(
         {
             "x": slr["scenarios"]["years"][years_key],
-            "y": [
-                round(v * uf, 3) for v in slr["scenarios"]["values"][scn_focus]["83"]
-            ],
+            "y": figs.rounded(slr["scenarios"]["values"][scn_focus]["83"], 3, uf),
             "type": "scatter",
             "fill": "tonexty",
             "fillcolor": fill_color,
@@ -74,10 +244,10 @@ def slr_projection(slr, scn_focus="int", units="ft"):
     )
     for n, scn in enumerate(scn_nm):
         years_key = "traj" if scn == "traj" else "scenarios"
-        fig.add_trace(
+        traces.append(
             {
                 "x": slr["scenarios"]["years"][years_key],
-                "y": [round(v * uf, 3) for v in slr["scenarios"]["values"][scn]["50"]],
+                "y": figs.rounded(slr["scenarios"]["values"][scn]["50"], 3, uf),
                 "type": "scatter",
                 "name": scn_nm[scn],
                 "showlegend": True,
@@ -91,17 +261,15 @@ def slr_projection(slr, scn_focus="int", units="ft"):
             }
         )
 
+    obs_values = figs.rounded(slr["observations"]["values"], 3, uf)
     obs = (
-        pd.Series(
-            [round(v * uf, 3) for v in slr["observations"]["values"]],
-            index=slr["observations"]["years"],
-        )
+        pd.Series(obs_values, index=slr["observations"]["years"])
         .interpolate()
         .dropna()
     )
-    fig.add_trace(
+    traces.append(
         {
-            "x": obs.index,
+            "x": obs.index.values,
             "y": obs.values,
             "type": "scatter",
             "mode": "lines",
@@ -112,32 +280,30 @@ def slr_projection(slr, scn_focus="int", units="ft"):
             # "hovertemplate": "%{y:.2f}<extra></extra>",
         },
     )
-    fig.add_trace(
-        go.Scatter(
-            {
-                "x": slr["observations"]["years"],
-                "y": [round(v * uf, 3) for v in slr["observations"]["values"]],
-                "mode": "markers",
-                "name": "Observed",
-                "showlegend": True,
-                "marker": {"size": 7, "color": "#888",},
-                # "line": {"color": "#888", "width": 3,},
-                "hovertemplate": "%{y:.2f}<extra></extra>",
-            }
-        )
-    )
-
-    fig.update_yaxes(
-        title_text="Sea-level rise (" + units_long + ")", side="right", range=slr_lims,
+    traces.append(
+        {
+            "x": slr["observations"]["years"],
+            "y": obs_values,
+            "type": "scatter",
+            "mode": "markers",
+            "name": "Observed",
+            "showlegend": True,
+            "marker": {"size": 7, "color": "#888",},
+            # "line": {"color": "#888", "width": 3,},
+            "hovertemplate": "%{y:.2f}<extra></extra>",
+        }
     )
-    fig.update_xaxes(range=yr_lims)
 
-    fig.update_layout(
-        template="none",
+    fig_layout = figs.layout(
         margin=dict(l=60, r=10, b=42, t=25, pad=0),
         font=dict(size=14),
-        xaxis=dict(layer="below traces",),
-        yaxis=dict(layer="below traces", side="left",),
+        xaxis=dict(layer="below traces", range=yr_lims),
+        yaxis=dict(
+            layer="below traces",
+            side="left",
+            range=slr_lims,
+            title=dict(text="Sea-level rise (" + units_long + ")"),
+        ),
         hovermode="x",
         #     hoverlabel_align="left",
         legend=dict(
@@ -150,135 +316,223 @@ def slr_projection(slr, scn_focus="int", units="ft"):
         #     font=dict(size=24),
         # ),
         # annotations=annotations,
-        modebar=dict(
-            remove=["toImage", "lasso", "select", "zoomIn", "zoomOut"],
-            orientation="h",
-            color="#333333",
-            bgcolor=None,
-        ),
+        modebar=figs.MODEBAR,
     )
 
+    fig = figs.figure(traces, fig_layout)
+
     return fig
 
 
-def slr_budget(slr, year_focus=2100, scn_focus="int", units="ft", single_scn=True):
+# -------------------------------------------------------------------------------------
+# SLR budget: the contributions to SLR of each scenario (not the observed trajectory)
+# as one (year, component, scenario) float32 array with the years, components and
+# scenarios along its axes, built once per station from the year-keyed contributions
+# of the SLR scenarios. The budget of a year is a single slice of it, and the budget of
+# a scenario over all years another. The array goes to the slr-budget-data-store as a
+# typed array where figs.TYPED_ARRAYS holds (Dash 2.13 or later, as pinned in
+# requirements.txt), and as nested JSON lists otherwise.
+# -------------------------------------------------------------------------------------
+
+BUDGET_COLORS = [
+    "#D55E00",
+    "#ADE1FF",
+    "#56B4E9",
+    "#0072B2",
+    "#F0E442",
+    "#009E73",
+    "#CC79A7",
+    "#685044",
+    "#E69F00",
+]
+
+# float32 holds the contributions (at most 4 decimals) to this many decimals
+BUDGET_DECIMALS = 5
+
+
+def slr_budget_arrays(slr):
+    """Contributions to SLR of a station's scenarios as a (year, component, scenario)
+    float32 array, with the years, components and scenarios of its axes."""
+
+    contributions = slr["contributions"]
+    years = list(contributions)
+    components = list(contributions[years[0]])
+
+    return {
+        "names": slr["names"],
+        "years": [int(y) for y in years],
+        "components": components,
+        "scenarios": [s for s in slr["names"] if s != "traj"],
+        "values": np.array(
+            [[contributions[y][c] for c in components] for y in years],
+            dtype=np.float32,
+        ),
+    }
+
+
+def load_slr_budget(station_id):
+    """SLR budget arrays of a station; shared between requests, so they must not be
+    modified."""
+
+    return station_data.get(
+        ("slr_budget", station_id),
+        lambda: slr_budget_arrays(load_slr_scenarios(station_id)),
+    )
+
+
+def budget_store(budget):
+    """SLR budget arrays for the slr-budget-data-store."""
+
+    typed = None
+    if figs.TYPED_ARRAYS:
+        typed = figs.typed_array(budget["values"], floats="f4")
+    return {
+        **{k: budget[k] for k in ["names", "years", "components", "scenarios"]},
+        "values": budget_values(budget["values"]).tolist() if typed is None else typed,
+    }
+
+
+def budget_from_store(store):
+    """The SLR budget arrays of the slr-budget-data-store."""
+
+    return {
+        **store,
+        "values": np.asarray(figs.from_typed(store["values"]), dtype=np.float32),
+    }
+
+
+def budget_values(values):
+    """Contributions (m) of a slice of the budget array as float64, to the decimals
+    they were given in."""
+    return np.round(values.astype(float), BUDGET_DECIMALS)
+
+
+def budget_traces(budget, x, values, uf, **kwargs):
+    """Stacked bars of the contributions other than the total: values are
+    (component, x)."""
+
+    return [
+        dict(
+            type="bar",
+            x=x,
+            y=figs.rounded(v, 3, uf),
+            name=c,
+            marker=dict(color=BUDGET_COLORS[n], opacity=0.9),
+            hovertemplate="%{y:.2f}<extra></extra>",
+            **kwargs,
+        )
+        for n, (c, v) in enumerate(zip(budget["components"], values))
+        if c != "Total"
+    ]
+
+
+def slr_budget(budget, year_focus=2100, scn_focus="int", units="ft", single_scn=True):
 
     year_focus = 2050 if (year_focus > 2050) & (scn_focus == "traj") else year_focus
 
     units_long = "feet" if units == "ft" else "meters"
     uf = uf = 3.28084 if units == "ft" else 1.0
 
-    scenarios = slr["names"]
+    scenarios = list(budget["names"])
     if single_scn:
         scenarios = [s for s in scenarios if s == scn_focus]
 
-    col = [
-        "#D55E00",
-        "#ADE1FF",
-        "#56B4E9",
-        "#0072B2",
-        "#F0E442",
-        "#009E73",
-        "#CC79A7",
-        "#685044",
-        "#E69F00",
-    ]
-
-    fig = go.Figure()
+    xc = [budget["names"][s] for s in scenarios]  # xaxis labels
 
-    xc = [slr["names"][s] for s in scenarios]  # xaxis labels
+    shapes = []
+    annotations = []
 
     # highlight selected scenario if showing mulitple scenarios in budget graph
     if not single_scn:
         if scn_focus in scenarios:
             for n, s in enumerate(scenarios):
                 if s != scn_focus:
-                    fig.add_vrect(
-                        x0=n - 0.5,
-                        x1=n + 0.5,
-                        line_width=0,
-                        fillcolor="gray",
-                        opacity=0.06,
-                        layer="below",
+                    shapes.append(
+                        dict(
+                            type="rect",
+                            x0=n - 0.5,
+                            x1=n + 0.5,
+                            xref="x",
+                            y0=0,
+                            y1=1,
+                            yref="y domain",
+                            line=dict(width=0),
+                            fillcolor="gray",
+                            opacity=0.06,
+                            layer="below",
+                        )
                     )
     else:
         if scn_focus == "traj":
-            fig.add_annotation(
-                text=f"Unavailable",
-                font=dict(size=18),
-                xref="paper",
-                yref="paper",
-                x=0.5,
-                y=0.5,
-                showarrow=False,
-            )
-
-    for n, c in enumerate(slr["contributions"][str(year_focus)]):
-        if c != "Total":
-            fig.add_trace(
-                go.Bar(
-                    x=xc,
-                    y=[
-                        round(v * uf, 3)
-                        for v in [
-                            slr["contributions"][str(year_focus)][c][k]
-                            for k, s in enumerate(slr["names"])
-                            if s in scenarios and s != "traj"
-                        ]
-                    ],
-                    name=c,
-                    marker=dict(color=col[n], opacity=0.9),
-                    width=0.5,
-                    hovertemplate="%{y:.2f}<extra></extra>",
+            annotations.append(
+                dict(
+                    text=f"Unavailable",
+                    font=dict(size=18),
+                    xref="paper",
+                    yref="paper",
+                    x=0.5,
+                    y=0.5,
+                    showarrow=False,
                 )
             )
-        # else:
-        #     fig.add_trace(
-        #         go.Scatter(
-        #             x=xc,
-        #             y=[
-        #                 round(v * uf, 3)
-        #                 for v in slr["contributions"][str(year_focus)][c]
-        #             ],
-        #             name=c,
-        #             mode="markers",
-        #             marker=dict(color="black", size=13),
-        #             hovertemplate="%{y:.2f}<extra></extra>",
-        #         )
-
-        #     )
-
-    # fig.add_annotation(
-    #     text=f"<b>{year_focus}</b>",
-    #     font=dict(size=32),
-    #     xref="paper",
-    #     yref="paper",
-    #     x=0.05,
-    #     y=0.94,
-    #     showarrow=False,
-    # )
-
-    fig.update_xaxes(title_text=f"ITF Scenario", titlefont=dict(size=14))
-    fig.update_yaxes(title_text=f"Sea-level rise ({units_long})",)
-    fig.update_layout(
-        template="none",
+
+    # (component, scenario) contributions of the year
+    k = [n for n, s in enumerate(budget["scenarios"]) if s in scenarios]
+    y = budget["years"].index(year_focus)
+    values = budget_values(budget["values"][y][:, k])
+    traces = budget_traces(budget, xc, values, uf, width=0.5)
+
+    fig_layout = figs.layout(
         margin=dict(l=60, r=10, b=45, t=25, pad=7),
         font=dict(size=14),
+        xaxis=dict(title=dict(text=f"ITF Scenario", font=dict(size=14))),
+        yaxis=dict(title=dict(text=f"Sea-level rise ({units_long})")),
         barmode="relative",
         hovermode="x",
         hoverlabel=dict(font=dict(size=14),),
         legend=dict(traceorder="reversed", itemclick=False, itemdoubleclick=False,),
-        modebar=dict(
-            remove=["toImage", "lasso", "select", "zoomIn", "zoomOut"],
-            orientation="h",
-            color="#333333",
-            bgcolor=None,
-        ),
+        modebar=figs.MODEBAR,
     )
+    if len(shapes) > 0:
+        fig_layout["shapes"] = shapes
+    if len(annotations) > 0:
+        fig_layout["annotations"] = annotations
+
+    fig = figs.figure(traces, fig_layout)
 
     return fig
 
 
+def slr_budget_over_time(budget, scn_focus="int", units="ft"):
+    """Contributions to SLR of a scenario in every year, as stacked bars."""
+
+    if scn_focus not in budget["scenarios"]:
+        return figs.blank_figure("Unavailable")
+
+    units_long = "feet" if units == "ft" else "meters"
+    uf = 3.28084 if units == "ft" else 1.0
+
+    # (component, year) contributions of the scenario
+    k = budget["scenarios"].index(scn_focus)
+    values = budget_values(budget["values"][:, :, k].T)
+    traces = budget_traces(budget, budget["years"], values, uf)
+
+    fig_layout = figs.layout(
+        margin=dict(l=60, r=10, b=45, t=25, pad=7),
+        font=dict(size=14),
+        xaxis=dict(title=dict(text="Year", font=dict(size=14))),
+        yaxis=dict(title=dict(text=f"Sea-level rise ({units_long})")),
+        barmode="relative",
+        bargap=0.1,
+        hovermode="x",
+        hoverlabel=dict(font=dict(size=14),),
+        legend=dict(traceorder="reversed", itemclick=False, itemdoubleclick=False,),
+        modebar=figs.MODEBAR,
+    )
+
+    return figs.figure(traces, fig_layout)
+
+
 def slr_scenario_table(scn_focus="int"):
     sat_tbl = {
         "Global Mean Surface Air Temperature": [
@@ -0,0 +1,306 @@
+import os
+import sys
+import hashlib
+import threading
+from contextlib import contextmanager
+from collections import Counter, OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from graphs.single_flight import single_flight
+
+# -------------------------------------------------------------------------------------
+# Station data manager. Every loader in graphs/ gets its data through `station_data`,
+# which keeps it in one of three tiers:
+#
+#   hot    decoded values (arrays, frames, parsed JSON) in this process, kept in an
+#          LRU under a byte budget (HOT_BYTES)
+#   warm   memory-mapped data: the compressed chunks of the projection stores and the
+#          shared decoded arrays of graphs.shared_cache; cheap to keep, decoded on use
+#   cold   files on disk that are not mapped
+#
+# A value loaded from the warm or cold tier is only promoted into the hot tier if it
+# fits, or if it has been used at least as often as the least recently used hot values
+# it would push out; those are demoted (their warm mappings, if any, stay). Counts of
+# use decay over time so that the tiers follow recent demand.
+#
+# Loads made inside prefetching() (see graphs/prefetch.py) are only kept in the hot tier
+# if they fit in the room left: prefetching never demotes values that were asked for.
+# They do not count as uses, and a prefetched value counts as a prefetch hit the first
+# time a request finds it in the hot tier.
+#
+# Concurrent misses for the same key are loaded once (graphs/single_flight.py).
+#
+# Set FAT_HOT_MB to change the hot budget and FAT_WARM_ENTRIES the number of mappings.
+# -------------------------------------------------------------------------------------
+
+HOT_BYTES = int(float(os.environ.get("FAT_HOT_MB", 256)) * 2 ** 20)
+WARM_ENTRIES = int(os.environ.get("FAT_WARM_ENTRIES", 512))
+
+# halve all use counts after this many accesses
+DECAY_EVERY = 10000
+
+
+def sizeof(value):
+    """Approximate private memory held by a decoded value. Memory-mapped arrays are
+    counted at their mapped size."""
+
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(value.memory_usage(index=True, deep=False).sum())
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            sizeof(k) + sizeof(v) for k, v in value.items()
+        )
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(sizeof(v) for v in value)
+    if hasattr(value, "__slots__"):
+        return sum(sizeof(getattr(value, s, None)) for s in value.__slots__)
+    return sys.getsizeof(value)
+
+
+class StationDataManager:
+    def __init__(self, hot_bytes=HOT_BYTES, warm_entries=WARM_ENTRIES):
+
+        self.hot_bytes = hot_bytes
+        self.warm_entries = warm_entries
+
+        self._lock = threading.Lock()
+        self._hot = OrderedDict()  # key -> (value, nbytes)
+        self._hot_used = 0
+        self._warm = OrderedDict()  # key -> (mapping, nbytes)
+        self._uses = Counter()
+        self._accesses = 0
+        # tier -> kind -> number of values served from that tier
+        self._stats = {tier: Counter() for tier in ["hot", "warm", "cold"]}
+        # prefetched values not yet asked for, and counts of prefetch outcomes
+        self._prefetched = set()
+        self._prefetch = Counter()
+        # tier that the load running in this thread read from, and whether the thread
+        # is prefetching
+        self._local = threading.local()
+
+    # ---------------------------------------------------------------------------------
+
+    def get(self, key, load):
+        """Decoded value for key (a tuple starting with the kind of data), using
+        load() to produce it from the warm or cold tier on a miss."""
+
+        prefetch = getattr(self._local, "prefetch", False)
+
+        with self._lock:
+            if key in self._hot:
+                if not prefetch:
+                    self._count(key)
+                    self._hot.move_to_end(key)
+                    self._stats["hot"][key[0]] += 1
+                    if key in self._prefetched:
+                        self._prefetched.remove(key)
+                        self._prefetch["hits"] += 1
+                return self._hot[key][0]
+            if not prefetch:
+                self._count(key)
+
+        # concurrent misses for the same key share a single load
+        return single_flight.do(key, lambda: self._load(key, load, prefetch))
+
+    def _load(self, key, load, prefetch):
+
+        self._local.tier = "cold"
+        value = load()
+        admitted = self._promote(key, value, demote=not prefetch)
+
+        with self._lock:
+            if prefetch:
+                if admitted:
+                    self._prefetched.add(key)
+                    self._prefetch["loaded"] += 1
+            else:
+                self._stats[self._local.tier][key[0]] += 1
+
+        return value
+
+    def cached(self, key):
+        """Whether key is in the hot tier; does not count as a use."""
+
+        with self._lock:
+            return key in self._hot
+
+    @contextmanager
+    def prefetching(self):
+        """Loads in this block are prefetches: kept only if they fit without demoting
+        anything, and not counted as demand."""
+
+        self._local.prefetch = True
+        try:
+            yield
+        finally:
+            self._local.prefetch = False
+
+    def mapped(self, key, open_map, nbytes=None):
+        """Memory-mapped handle for key, opened with open_map() on a miss. Mappings
+        are demoted to the cold tier (dropped) in LRU order past WARM_ENTRIES."""
+
+        with self._lock:
+            if key in self._warm:
+                self._warm.move_to_end(key)
+                self._local.tier = "warm"
+                return self._warm[key][0]
+
+        mapping = open_map()
+        size = sizeof(mapping) if nbytes is None else nbytes(mapping)
+
+        with self._lock:
+            self._local.tier = "cold"
+            if mapping is not None:
+                self._warm[key] = (mapping, size)
+                while len(self._warm) > self.warm_entries:
+                    self._warm.popitem(last=False)
+
+        return mapping
+
+    def _count(self, key):
+        self._uses[key] += 1
+        self._accesses += 1
+        if self._accesses % DECAY_EVERY == 0:
+            self._uses = Counter(
+                {k: n // 2 for k, n in self._uses.items() if n // 2 > 0}
+            )
+
+    def _promote(self, key, value, demote=True):
+
+        size = sizeof(value)
+
+        with self._lock:
+
+            if key in self._hot or size > self.hot_bytes:
+                return False
+            if not demote and self._hot_used + size > self.hot_bytes:
+                return False
+
+            # make room by demoting least recently used values, unless they are used
+            # more often than the new value
+            victims = []
+            room = self.hot_bytes - self._hot_used
+            for k, (_, n) in self._hot.items():
+                if room >= size:
+                    break
+                if self._uses[k] > self._uses[key]:
+                    return False
+                victims.append(k)
+                room += n
+            if room < size:
+                return False
+
+            for k in victims:
+                self._hot_used -= self._hot.pop(k)[1]
+                if k in self._prefetched:
+                    self._prefetched.remove(k)
+                    self._prefetch["demoted"] += 1
+            self._hot[key] = (value, size)
+            self._hot_used += size
+
+            return True
+
+    # ---------------------------------------------------------------------------------
+
+    def stats(self):
+        """Occupancy and hits of each tier, overall and by kind of data."""
+
+        with self._lock:
+
+            def by_kind(entries):
+                kinds = Counter()
+                for k, (_, n) in entries.items():
+                    kinds[k[0]] += n
+                return dict(kinds)
+
+            hits = {tier: sum(c.values()) for tier, c in self._stats.items()}
+            total = sum(hits.values())
+
+            return {
+                "hot": {
+                    "entries": len(self._hot),
+                    "bytes": self._hot_used,
+                    "budget_bytes": self.hot_bytes,
+                    "bytes_by_kind": by_kind(self._hot),
+                    "hits": dict(self._stats["hot"]),
+                },
+                "warm": {
+                    "entries": len(self._warm),
+                    "max_entries": self.warm_entries,
+                    "bytes": sum(n for _, n in self._warm.values()),
+                    "bytes_by_kind": by_kind(self._warm),
+                    "hits": dict(self._stats["warm"]),
+                },
+                "cold": {"hits": dict(self._stats["cold"])},
+                "hit_ratio": {
+                    tier: (hits[tier] / total if total > 0 else None)
+                    for tier in hits
+                },
+                "prefetch": {
+                    "loaded": self._prefetch["loaded"],
+                    "hits": self._prefetch["hits"],
+                    "demoted_unused": self._prefetch["demoted"],
+                    # share of prefetched values that a request went on to use
+                    "hit_ratio": (
+                        self._prefetch["hits"] / self._prefetch["loaded"]
+                        if self._prefetch["loaded"] > 0
+                        else None
+                    ),
+                },
+            }
+
+    def clear(self):
+        with self._lock:
+            self._hot.clear()
+            self._hot_used = 0
+            self._warm.clear()
+            self._uses.clear()
+            for c in self._stats.values():
+                c.clear()
+            self._prefetched.clear()
+            self._prefetch.clear()
+
+
+station_data = StationDataManager()
+
+
+def file_digest(fname):
+    """Size and BLAKE2 hash of a file's contents, or None if there is none. Files
+    precomputed from others (the station index, SLR summaries, pre-rendered bundles)
+    record the digests of their sources to tell when they are out of date, since
+    modification times do not survive checkouts and copies. Read once."""
+
+    def read():
+        if not os.path.exists(fname):
+            return None
+        with open(fname, "rb") as f:
+            data = f.read()
+        return f"{len(data):x}-{hashlib.blake2b(data, digest_size=16).hexdigest()}"
+
+    return station_data.get(("file_digest", fname), read)
+
+
+def file_digests(fnames):
+    """Digests of files, keyed by file name."""
+    return {f: file_digest(f) for f in fnames}
+
+
+def files_digest(fnames):
+    """Total size and BLAKE2 hash of the names and contents of a list of files, for
+    files precomputed from many others (the projection stores). Not kept: the caller
+    keeps what it checked."""
+
+    h = hashlib.blake2b(digest_size=16)
+    size = 0
+    for fname in fnames:
+        with open(fname, "rb") as f:
+            data = f.read()
+        h.update(f"{os.path.basename(fname)}:{len(data)}:".encode())
+        h.update(data)
+        size += len(data)
+
+    return f"{size:x}-{h.hexdigest()}"
@@ -1,18 +1,39 @@
 import plotly.graph_objs as go
 
+try:
+    from dash import Patch
+except ImportError:
+    # dash < 2.9: the whole map is sent on every redraw
+    Patch = None
+
+# -------------------------------------------------------------------------------------
+# The stations map is built once at startup, with every station's marker, label and
+# customdata, and goes in the layout. Redrawing it for another station changes only the
+# selected marker and the viewport, so a redraw is sent as a Patch of those three
+# properties (a few hundred bytes) instead of the whole figure. Patch needs Dash 2.9
+# or later, as pinned in requirements.txt; older versions get the whole figure.
+# -------------------------------------------------------------------------------------
 
-def create_stations_map(stations, mapbox_access_token, station_select=None):
+
+def stations_map_view(stations, station_select=None):
+    """Selected marker and viewport of the stations map for a station (or none)."""
 
     if station_select is not None:
-        slct_idx = stations.index.get_loc(station_select)
-        clat = stations.loc[station_select].lat
-        clon = stations.loc[station_select].lon
-        zm = 6
-    else:
-        clat = 32
-        clon = 210
-        zm = 1.7
-        slct_idx = None
+        return dict(
+            selectedpoints=[stations.index.get_loc(station_select)],
+            center=dict(
+                lat=float(stations.loc[station_select].lat),
+                lon=float(stations.loc[station_select].lon),
+            ),
+            zoom=6,
+        )
+
+    return dict(selectedpoints=[None], center=dict(lat=32, lon=210), zoom=1.7)
+
+
+def create_stations_map(stations, mapbox_access_token, station_select=None):
+
+    view = stations_map_view(stations, station_select)
 
     m = go.Figure(
         go.Scattermapbox(
@@ -22,7 +43,7 @@ def create_stations_map(stations, mapbox_access_token, station_select=None):
             marker=dict(color="#0072B2", size=12),
             opacity=0.8,
             line=dict(width=2),
-            selectedpoints=[slct_idx],
+            selectedpoints=view["selectedpoints"],
             selected=dict(marker=dict(color="#D55E00", size=18)),
             customdata=[dict(id=s, name=stations.name.loc[s]) for s in stations.index],
             hovertemplate="%{text}<extra></extra>",
@@ -45,11 +66,28 @@ def create_stations_map(stations, mapbox_access_token, station_select=None):
         mapbox=go.layout.Mapbox(
             accesstoken=mapbox_access_token,
             bearing=0,
-            center=go.layout.mapbox.Center(lat=clat, lon=clon),
+            center=go.layout.mapbox.Center(**view["center"]),
             pitch=0,
-            zoom=zm,
+            zoom=view["zoom"],
             style="mapbox://styles/mapbox/light-v10",
         ),
     )
 
     return m
+
+
+def stations_map_update(stations, mapbox_access_token, station_select=None):
+    """The stations map redrawn for a station, as a Patch of the map in the layout
+    (or the whole figure without Patch)."""
+
+    if Patch is None:
+        return create_stations_map(stations, mapbox_access_token, station_select)
+
+    view = stations_map_view(stations, station_select)
+
+    patch = Patch()
+    patch["data"][0]["selectedpoints"] = view["selectedpoints"]
+    patch["layout"]["mapbox"]["center"] = view["center"]
+    patch["layout"]["mapbox"]["zoom"] = view["zoom"]
+
+    return patch
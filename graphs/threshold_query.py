@@ -0,0 +1,104 @@
+import numpy as np
+
+from graphs.projection_store import open_store, read_block
+
+# -------------------------------------------------------------------------------------
+# Inverse of the projections: the highest flooding threshold expected to see at least
+# N flooding days per year, for every year of a range at once.
+#
+# Flooding days fall as the threshold rises, so each year is a binary search along the
+# threshold axis of the stored annual percentiles, run for all years together. The
+# percentiles come from a finite ensemble and can rise by a day or two between
+# neighbouring thresholds; the search runs on the largest number of days at the
+# threshold or any higher one, so it finds the highest threshold that qualifies. The
+# result is interpolated linearly between the centimetre thresholds on either side.
+# -------------------------------------------------------------------------------------
+
+
+def threshold_for_days(station_id, scenario, days, years, percentile=50):
+    """Highest threshold (cm above MHHW) with at least `days` flooding days per year at
+    the given percentile, for each of `years`. Years outside the projection and years
+    in which even the lowest threshold sees fewer days give NaN. Returns None if the
+    store has not been built."""
+
+    store = open_store(station_id, scenario)
+    if store is None:
+        return None
+
+    columns = store["annual_columns"].tolist()
+    if percentile not in columns:
+        raise ValueError(f"percentile must be one of {columns}")
+
+    years = np.atleast_1d(np.asarray(years, dtype=int))
+    n = np.searchsorted(store["years"], years).clip(max=store["years"].size - 1)
+    valid = store["years"][n] == years
+
+    thresholds = store["thresholds"].astype(float)
+    nt = thresholds.size
+
+    # (threshold, year) for the requested percentile, then the largest number of days
+    # at each threshold or above
+    d = read_block(station_id, scenario, "annual")[:, n, columns.index(percentile)]
+    env = np.maximum.accumulate(d[::-1].astype(float), axis=0)[::-1]
+
+    # number of thresholds with at least `days` days, per year
+    cols = np.arange(years.size)
+    lo = np.zeros(years.size, dtype=int)
+    hi = np.full(years.size, nt)
+    while (lo < hi).any():
+        mid = (lo + hi) // 2
+        ge = env[mid.clip(max=nt - 1), cols] >= days
+        active = lo < hi
+        lo = np.where(active & ge, mid + 1, lo)
+        hi = np.where(active & ~ge, mid, hi)
+    k = lo - 1
+
+    # interpolate to where the days drop to `days` between thresholds k and k + 1
+    k0 = k.clip(0, nt - 1)
+    k1 = (k + 1).clip(0, nt - 1)
+    e0 = env[k0, cols]
+    e1 = env[k1, cols]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        frac = np.where(k1 > k0, (e0 - days) / (e0 - e1), 0.0)
+    cm = thresholds[k0] + frac * (thresholds[k1] - thresholds[k0])
+
+    cm[(k < 0) | ~valid] = np.nan
+
+    return {
+        "years": years,
+        "threshold_cm": cm,
+        # at least `days` days even at the highest threshold in the store
+        "above_range": (k == nt - 1) & valid,
+    }
+
+
+def projection_years(station_id, scenario):
+    """First and last year of a station/scenario store, or None if it has not been
+    built."""
+
+    store = open_store(station_id, scenario)
+    if store is None:
+        return None
+
+    return int(store["years"][0]), int(store["years"][-1])
+
+
+def threshold_query(station_id, scenario, days, years, percentile=50):
+    """threshold_for_days() as a JSON-ready dict, or None if there is no store."""
+
+    result = threshold_for_days(station_id, scenario, days, years, percentile)
+    if result is None:
+        return None
+
+    return {
+        "station_id": station_id,
+        "scenario": scenario,
+        "days": days,
+        "percentile": percentile,
+        "years": result["years"].tolist(),
+        "threshold_cm": [
+            None if np.isnan(cm) else round(cm, 1)
+            for cm in result["threshold_cm"].tolist()
+        ],
+        "above_range": result["above_range"].tolist(),
+    }
@@ -0,0 +1,144 @@
+import numpy as np
+
+import graphs.analysis as anlyz
+import graphs.figures as figs
+from graphs.projection_store import open_store, read_block
+
+# -------------------------------------------------------------------------------------
+# Flooding days per year against flooding threshold, for a single year: the annual
+# percentiles of every threshold of a station/scenario, read as one slice of the
+# threshold axis of the projection store instead of one JSON file per threshold.
+# -------------------------------------------------------------------------------------
+
+
+def threshold_sweep_data(station_id, scenario, year):
+    """Percentiles of flooding days in a year at every threshold, or None if the
+    store has not been built or does not include the year."""
+
+    store = open_store(station_id, scenario)
+    if store is None:
+        return None
+
+    years = store["years"]
+    n = np.searchsorted(years, int(year))
+    if n == years.size or years[n] != int(year):
+        return None
+
+    # (threshold, year, percentile) -> (threshold, percentile)
+    days = read_block(station_id, scenario, "annual")[:, n, :]
+
+    return {
+        "station_id": station_id,
+        "scenario": scenario,
+        "year": int(year),
+        "thresholds": store["thresholds"],  # cm above MHHW
+        "percentiles": {
+            str(p): days[:, j] for j, p in enumerate(store["annual_columns"].tolist())
+        },
+    }
+
+
+def threshold_sweep(sweep, threshold, units="ft"):
+
+    if sweep is None:
+        return figs.blank_figure("No projection for this year")
+
+    uf = 3.281 if units == "ft" else 1.0
+    x = figs.rounded(sweep["thresholds"], 2, uf / 100)
+    pct = sweep["percentiles"]
+
+    col = anlyz.color_palette()
+    col = [col[n] for n in [1, 5, 4]]
+    fcol = [anlyz.fill_color(c, 0.6) for c in col if c[0] == "#"]
+    fcol2 = [anlyz.fill_color(c, 0.25) for c in col if c[0] == "#"]
+
+    hover = "%{y:.0f}<extra></extra>"
+
+    traces = [
+        {
+            "x": x,
+            "y": pct["5"],
+            "fill": "none",
+            "showlegend": False,
+            "line": {"color": fcol2[0], "width": 0},
+            "hoverinfo": "none",
+        },
+        {
+            "x": x,
+            "y": pct["95"],
+            "fill": "tonexty",
+            "fillcolor": fcol2[0],
+            "name": "<i>Very likely</i> range (> 90% probability)",
+            "mode": "none",
+            "hoverinfo": "none",
+        },
+        {
+            "x": x,
+            "y": pct["17"],
+            "fill": "none",
+            "showlegend": False,
+            "line": {"color": fcol[0], "width": 0},
+            "hovertemplate": hover,
+        },
+        {
+            "x": x,
+            "y": pct["83"],
+            "fill": "tonexty",
+            "fillcolor": fcol[0],
+            "name": "<i>Likely</i> range (> 66% probability)",
+            "mode": "none",
+            "hovertemplate": hover,
+        },
+        {
+            "x": x,
+            "y": pct["50"],
+            "name": "50th percentile",
+            "line": {"color": "#0072B2", "width": 3},
+            "hovertemplate": hover,
+        },
+    ]
+
+    shapes = []
+    if threshold is not None:
+        shapes.append(
+            dict(
+                type="line",
+                layer="below",
+                line=dict(color="#333", width=1.5, dash="dash"),
+                x0=threshold,
+                x1=threshold,
+                xref="x",
+                y0=0,
+                y1=1,
+                yref="y domain",
+            )
+        )
+
+    fig_layout = figs.layout(
+        margin=dict(l=60, r=10, b=50, t=30, pad=0),
+        font=dict(size=14),
+        xaxis=dict(
+            layer="below traces",
+            range=[x[0], x[-1]],
+            title=dict(text=f"Flooding threshold ({units} above MHHW)"),
+            hoverformat=".2f",
+        ),
+        yaxis=dict(
+            layer="below traces",
+            range=[-5, 370],
+            title=dict(text=f"Flooding days in {sweep['year']}"),
+        ),
+        hovermode="x",
+        legend=dict(
+            x=0.98,
+            y=1,
+            xanchor="right",
+            traceorder="reversed",
+            itemclick=False,
+            itemdoubleclick=False,
+        ),
+        shapes=shapes,
+        modebar=figs.MODEBAR,
+    )
+
+    return figs.figure(traces, fig_layout)
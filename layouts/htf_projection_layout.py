@@ -13,6 +13,16 @@ def generate_htf_projection_page(init):
                 className="app-page-section container",
                 children=generate_annual_projection_section(init),
             ),
+            html.Div(
+                id="threshold-sweep-section",
+                className="app-page-section container",
+                children=generate_threshold_sweep_section(init),
+            ),
+            html.Div(
+                id="scenario-comparison-section",
+                className="app-page-section container",
+                children=generate_scenario_comparison_section(init),
+            ),
             html.Div(
                 id="pentadal-projection-section",
                 className="app-page-section container",
@@ -139,6 +149,162 @@ def generate_annual_projection_section(init):
     )
 
 
+def generate_threshold_sweep_section(init):
+
+    return html.Div(
+        id="sweep-outer",
+        children=[
+            html.H3(children="Flooding Days by Threshold", className="graph-title"),
+            html.P(
+                children=[
+                    html.Div(
+                        className="graph-subtitle-float",
+                        children=html.H6(
+                            children=[
+                                "SLR scenario: ",
+                                html.Span(
+                                    id="sweep-graph-title-scenario",
+                                    className="graph-subtitle-option",
+                                ),
+                            ],
+                        ),
+                    ),
+                    html.Div(
+                        className="graph-subtitle-float",
+                        children=html.H6(
+                            children=[
+                                "In the year: ",
+                                html.Span(
+                                    init["year"],
+                                    id="sweep-graph-title-year",
+                                    className="graph-subtitle-option",
+                                ),
+                            ],
+                        ),
+                    ),
+                    html.Div(style=dict(clear="both")),
+                ],
+                className="graph-subtitle",
+            ),
+            dcc.Loading(
+                id="sweep-loading",
+                children=dcc.Graph(
+                    id="sweep-graph",
+                    figure=init["graph"],
+                    config=dict(displaylogo=False, displayModeBar=True),
+                ),
+            ),
+            html.Div(
+                "Click on a year in the Projected Flooding Days graph to change the "
+                + "year. The dashed line marks the selected flooding threshold.",
+                className="common-text",
+                style={"font-size": 12},
+            ),
+        ],
+    )
+
+
+def generate_scenario_comparison_section(init):
+
+    columns = {
+        "scenario": "Scenario",
+        "yoi": "YOI",
+        "routine_onset": "Routine (20+ days/yr)",
+        "chronic_onset": "Chronic (50+ days/yr)",
+    }
+
+    return dbc.Row(
+        class_name="gx-5 gy-4",
+        justify="between",
+        children=[
+            dbc.Col(
+                md=12,
+                lg=8,
+                children=html.Div(
+                    id="comparison-outer",
+                    children=[
+                        html.H3(
+                            children="Compare SLR Scenarios", className="graph-title"
+                        ),
+                        html.P(
+                            children=[
+                                html.Div(
+                                    className="graph-subtitle-float",
+                                    children=html.H6(
+                                        children=[
+                                            "Flooding threshold: ",
+                                            html.Span(
+                                                id="comparison-graph-title-threshold",
+                                                className="graph-subtitle-option",
+                                            ),
+                                        ],
+                                    ),
+                                ),
+                                html.Div(style=dict(clear="both")),
+                            ],
+                            className="graph-subtitle",
+                        ),
+                        dcc.Loading(
+                            id="comparison-loading",
+                            children=dcc.Graph(
+                                id="comparison-graph",
+                                figure=init["graph"],
+                                config=dict(displaylogo=False, displayModeBar=True),
+                            ),
+                        ),
+                    ],
+                ),
+            ),
+            dbc.Col(
+                md=12,
+                lg=4,
+                children=html.Div(
+                    className="common-text",
+                    children=[
+                        dcc.Markdown(
+                            "Median (lines) and *likely* range (shading) of flooding days per year under each scenario. The table gives the year of inflection and the first year that routine and chronic flooding become *likely* on an annual basis.",
+                        ),
+                        dash_table.DataTable(
+                            id="comparison-table",
+                            columns=[{"name": columns[c], "id": c} for c in columns],
+                            data=None,
+                            cell_selectable=False,
+                            style_as_list_view=True,
+                            style_cell={"whiteSpace": "normal", "height": "auto"},
+                            style_cell_conditional=[
+                                {
+                                    "if": {"column_id": "scenario"},
+                                    "textAlign": "left",
+                                    "paddingLeft": "10px",
+                                },
+                                *[
+                                    {"if": {"column_id": c}, "textAlign": "right"}
+                                    for c in list(columns)[1:]
+                                ],
+                            ],
+                            style_header_conditional=[
+                                {
+                                    "if": {"header_index": 0},
+                                    "textAlign": "left",
+                                    "fontWeight": "bold",
+                                },
+                                *[
+                                    {
+                                        "if": {"column_id": c},
+                                        "textAlign": "right",
+                                        "fontWeight": "bold",
+                                    }
+                                    for c in list(columns)[1:]
+                                ],
+                            ],
+                        ),
+                    ],
+                ),
+            ),
+        ],
+    )
+
+
 def generate_pentadal_projection_section(init):
 
     return (
@@ -1,5 +1,4 @@
 from dash import html, dcc, dash_table
-import dash_daq as daq
 import dash_bootstrap_components as dbc
 
 
@@ -161,7 +160,7 @@ def generate_stations_map(init):
         is_open=False,
         children=dcc.Graph(
             id="stations-map-graph",
-            figure=init["graph"],
+            figure=init["map"],
             config=dict(displaylogo=False, displayModeBar=True),
         ),
     )
@@ -474,6 +473,7 @@ def generate_threshold_selector(options):
                             html.Div(style={"clear": "both"}),
                         ],
                     ),
+                    generate_threshold_finder(),
                 ],
             ),
             # html.Div(
@@ -499,8 +499,78 @@ def generate_threshold_selector(options):
     )
 
 
+def generate_threshold_finder():
+
+    input_style = {"width": "60px", "margin": "0px 4px"}
+
+    return html.Div(
+        id="threshold-finder",
+        className="app-options-info",
+        children=[
+            html.Div("Find a threshold", className="app-options-title"),
+            html.Div(
+                className="app-options-detail",
+                children=[
+                    "Highest threshold with at least ",
+                    dcc.Input(
+                        id="threshold-finder-days",
+                        type="number",
+                        min=1,
+                        max=365,
+                        step=1,
+                        value=10,
+                        debounce=True,
+                        style=input_style,
+                    ),
+                    " days in ",
+                    dcc.Input(
+                        id="threshold-finder-year",
+                        type="number",
+                        min=2020,
+                        max=2100,
+                        step=1,
+                        value=2050,
+                        debounce=True,
+                        style=input_style,
+                    ),
+                    " at the ",
+                    dcc.Dropdown(
+                        id="threshold-finder-percentile",
+                        className="app-options-dropdown",
+                        options=[
+                            dict(label=f"{p}th percentile", value=p)
+                            for p in [5, 10, 17, 50, 83, 90, 95]
+                        ],
+                        value=50,
+                        clearable=False,
+                        searchable=False,
+                    ),
+                ],
+            ),
+            html.Div(
+                className="app-options-detail",
+                style={"padding-bottom": "10px"},
+                children=[
+                    html.Span(id="threshold-finder-result"),
+                    dbc.Button(
+                        "Use",
+                        id="threshold-finder-apply",
+                        size="sm",
+                        color="link",
+                        n_clicks=0,
+                        disabled=True,
+                    ),
+                ],
+            ),
+        ],
+    )
+
+
 def generate_threshold_knob(options):
 
+    # dash_daq is only needed for the knob, which is not in the current layout
+    import dash_daq as daq
+
     return html.Div(
         id="threshold-knob-container",
         className="selection-container",
@@ -0,0 +1,86 @@
+# ---------------------------------------------------------------------------
+# Benchmark figure construction and serialization for a single station.
+#
+# Compares the plain-dict figure builders in graphs/ (serialized with orjson) against
+# passing the same figures through go.Figure validation and plotly.io.to_json, which
+# is what the graph modules did before they stopped using go.Figure.
+#
+# Run from the repository root:
+#   python -m tools.bench_figures [station_id] [repeats]
+# ---------------------------------------------------------------------------
+
+import sys
+import json
+import timeit
+
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+
+import graphs.figures as figs
+from graphs.observed_flooding import station_levels, observed_flooding
+from graphs.htf_projection import load_projection_data, htf_projection
+from graphs.clim_projection import clim_projection
+from graphs.pentad_projection import pentad_projection
+from graphs.slr_projection import slr_projection, slr_budget, slr_budget_arrays
+
+# ---------------------------------------------------------------------------
+
+station_id = sys.argv[1] if len(sys.argv) > 1 else "1612340"
+repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+with open("./data/stations.json", "r") as f:
+    stations = pd.DataFrame(json.load(f)).T
+station = stations.loc[station_id]
+
+levels, _, _ = station_levels(station_id, True)
+
+meta, data, _ = load_projection_data(station, "int", "052")
+meta["steps_xd"] = (
+    [data.annual.at(s, 50) for s in meta["steps"]]
+    if meta["steps"] is not None
+    else None
+)
+
+with open(f"./data/slr_scenarios/{station_id}.json", "r") as f:
+    slr = json.load(f)
+budget = slr_budget_arrays(slr)
+
+builders = {
+    "observed": lambda: observed_flooding(station_id, "052", levels, "ft")[0],
+    "htf": lambda: htf_projection(meta, data.annual, True)[0],
+    "pentad": lambda: pentad_projection(meta, data, [1950, 2100]),
+    "clim": lambda: clim_projection(data.clim, 2050),
+    "slr": lambda: slr_projection(slr, scn_focus="int", units="ft"),
+    "budget": lambda: slr_budget(budget, year_focus=2050, scn_focus="int", units="ft"),
+}
+
+# ---------------------------------------------------------------------------
+
+
+def per_call_ms(func):
+    return 1000 * min(timeit.repeat(func, number=1, repeat=repeats))
+
+
+print(f"Station {station_id}, best of {repeats} (ms per figure)\n")
+print(
+    f"{'figure':<10}{'dict':>9}{'orjson':>9}{'total':>9}"
+    f"{'go.Figure':>12}{'to_json':>9}{'total':>9}{'speedup':>9}"
+)
+
+for name, build in builders.items():
+
+    fig = build()
+    gofig = go.Figure(fig)
+
+    t_dict = per_call_ms(build)
+    t_orjson = per_call_ms(lambda: figs.to_json(fig))
+    t_go = t_dict + per_call_ms(lambda: go.Figure(fig))
+    t_pio = per_call_ms(lambda: pio.to_json(gofig, validate=False))
+
+    new = t_dict + t_orjson
+    old = t_go + t_pio
+    print(
+        f"{name:<10}{t_dict:>9.2f}{t_orjson:>9.2f}{new:>9.2f}"
+        f"{t_go:>12.2f}{t_pio:>9.2f}{old:>9.2f}{old / new:>8.1f}x"
+    )
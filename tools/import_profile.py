@@ -0,0 +1,100 @@
+# ---------------------------------------------------------------------------
+# Profile the startup of the app: the time to import flooding_days_app (which also
+# builds the layouts), the import cost of each package and of each of the app's own
+# modules, and a check against a startup budget.
+#
+# The import costs come from python -X importtime in a fresh interpreter. The startup
+# time is the best of several fresh imports, less the time to start the interpreter.
+# Exits with status 1 if startup is over the budget or if any of the modules in LAZY
+# is imported at startup, so it can gate a deployment.
+#
+# Run from the repository root:
+#   python -m tools.import_profile [budget_ms] [runs]
+# ---------------------------------------------------------------------------
+
+import sys
+import time
+import subprocess
+from collections import defaultdict
+
+# startup budget (ms) for importing the app, beyond starting the interpreter
+STARTUP_BUDGET_MS = 1500
+
+# modules used only by batch scripts or by parts of the layout that are not shown;
+# these must not be imported when the app starts
+LAZY = ["xarray", "netCDF4", "dash_daq", "plotly.subplots", "requests"]
+
+APP_MODULES = ("flooding_days_app", "graphs", "layouts")
+
+# ---------------------------------------------------------------------------
+
+
+def run(code, importtime=False):
+
+    cmd = [sys.executable] + (["-X", "importtime"] if importtime else [])
+    t0 = time.perf_counter()
+    out = subprocess.run(cmd + ["-c", code], capture_output=True, text=True)
+    ms = 1000 * (time.perf_counter() - t0)
+
+    if out.returncode != 0:
+        sys.exit(out.stderr)
+
+    return ms, out.stderr
+
+
+def parse_importtime(log):
+    """(module, self us, cumulative us) for every import in a -X importtime log."""
+
+    imports = []
+    for line in log.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cum_us, name = line[len("import time:") :].split("|")
+        imports.append((name.strip(), int(self_us), int(cum_us)))
+
+    return imports
+
+
+# ---------------------------------------------------------------------------
+
+budget_ms = float(sys.argv[1]) if len(sys.argv) > 1 else STARTUP_BUDGET_MS
+runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+interpreter_ms = min(run("pass")[0] for _ in range(runs))
+startup_ms = min(run("import flooding_days_app")[0] for _ in range(runs))
+startup_ms -= interpreter_ms
+
+_, log = run("import flooding_days_app", importtime=True)
+imports = parse_importtime(log)
+
+by_package = defaultdict(int)
+for name, self_us, _ in imports:
+    by_package[name.split(".")[0]] += self_us
+total_us = sum(by_package.values())
+
+print(f"Import time by package (of {total_us / 1e3:.0f} ms under -X importtime)\n")
+for pkg, us in sorted(by_package.items(), key=lambda p: -p[1])[:20]:
+    print(f"  {pkg:<32}{us / 1e3:>8.1f} ms{100 * us / total_us:>6.1f}%")
+
+print(f"\nApp modules{'self':>30}{'cumulative':>12}\n")
+for name, self_us, cum_us in sorted(imports, key=lambda i: -i[2]):
+    if name.split(".")[0] in APP_MODULES:
+        print(f"  {name:<32}{self_us / 1e3:>8.1f} ms{cum_us / 1e3:>9.1f} ms")
+
+failed = []
+
+loaded = {name for name, _, _ in imports}
+eager = [m for m in LAZY if m in loaded]
+if len(eager) > 0:
+    failed.append("imported at startup: " + ", ".join(eager))
+
+print(
+    f"\nStartup {startup_ms:.0f} ms (best of {runs}, after {interpreter_ms:.0f} ms "
+    + f"interpreter start), budget {budget_ms:.0f} ms"
+)
+if startup_ms > budget_ms:
+    failed.append(f"startup {startup_ms:.0f} ms is over the {budget_ms:.0f} ms budget")
+
+if len(failed) > 0:
+    print("Failed: " + "; ".join(failed))
+    sys.exit(1)
@@ -0,0 +1,312 @@
+# ---------------------------------------------------------------------------
+# Printable per-station reports: for every station and NOAA flooding threshold, the
+# observed flooding, SLR scenarios and projected flooding graphs with the analysis
+# text shown alongside them in the app. Each report is a directory
+# ./reports/<station>/<scenario>_<units>/<threshold>/ holding one image per graph and
+# report.md, the text and images as one Markdown document (print it as is, or convert
+# it to a single PDF with e.g. pandoc).
+#
+# Images are rendered by plotly with kaleido (pip install kaleido), which only this
+# script needs. Reports are rendered in parallel, one per process at a time; decoded
+# station data is shared between the processes through graphs/shared_cache.py, so
+# each station's data is decoded once however many processes render its reports.
+#
+# A report is complete once its report.json, with its options and the time taken by
+# each stage, is written last. Reports complete with the same options are skipped
+# when run again, so an interrupted run picks up where it stopped; --force renders
+# everything again. Rendering a report in another format removes the images of the
+# old one.
+#
+# Run from the repository root:
+#   python -m tools.station_reports [--format png|pdf] [--scenario int]
+#       [--units ft|m] [--workers N] [--force] [station_id ...]
+# ---------------------------------------------------------------------------
+
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+from collections import Counter
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+import plotly.io as pio
+from dash import dcc, html
+
+from graphs.observed_flooding import (
+    station_levels,
+    observed_flooding,
+    observed_flooding_text,
+)
+from graphs.slr_projection import (
+    load_slr_scenarios,
+    load_slr_budget,
+    slr_projection,
+    slr_budget,
+)
+from graphs.htf_projection import htf_figures
+from graphs.clim_projection import clim_projection
+
+REPORTS_DIR = "./reports"
+FORMATS = ["png", "pdf"]
+
+NOAA_LEVELS = ["minor", "moderate", "major"]
+MAX_THRESHOLD = 305
+
+# year of the monthly climatology and SLR budget graphs
+REPORT_YEAR = 2050
+
+# image size in pixels (scaled up by 2 for PNG)
+IMAGE_SIZE = {
+    "obs": (1000, 600),
+    "slr": (1000, 500),
+    "budget": (1000, 400),
+    "htf": (1000, 500),
+    "pent": (1000, 400),
+    "clim": (1000, 400),
+}
+
+# ---------------------------------------------------------------------------
+
+
+def markdown(component):
+    """Markdown of the text of a Dash component tree."""
+
+    if component is None:
+        return ""
+    if isinstance(component, str):
+        return component
+    if isinstance(component, (list, tuple)):
+        return "".join(markdown(c) for c in component)
+
+    children = markdown(getattr(component, "children", None))
+    if isinstance(component, dcc.Markdown):
+        text = getattr(component, "children", "")
+        text = "\n".join(text) if isinstance(text, (list, tuple)) else text
+        return text.strip("\n") + "\n\n"
+    # links within the app (dcc.Link) are left as plain text
+    if isinstance(component, html.A):
+        return f"[{children}]({component.href})"
+    if isinstance(component, (html.Div, html.P)):
+        return children.strip() + "\n\n"
+
+    return children
+
+
+def report_name(label):
+    return label.lower().replace(" ", "_")
+
+
+def report_dir(sid, scenario, units, label):
+    return f"{REPORTS_DIR}/{sid}/{scenario}_{units}/{report_name(label)}"
+
+
+def report_complete(out, options):
+    """Whether the report in out is complete and was rendered with options."""
+
+    if not os.path.exists(f"{out}/report.json"):
+        return False
+    with open(f"{out}/report.json", "r") as f:
+        meta = json.load(f)
+    return all(meta.get(k) == v for k, v in options.items())
+
+
+def noaa_levels(sid, units_toggle):
+    levels, _, _ = station_levels(sid, units_toggle)
+    return [
+        h
+        for h in levels
+        if h["value"] in NOAA_LEVELS and int(h["height_key"]) <= MAX_THRESHOLD
+    ]
+
+
+# ---------------------------------------------------------------------------
+
+
+def render_report(task):
+    """Render one station and threshold; returns the stage timings, or None if the
+    report was complete already."""
+
+    sid, name, level, opts = task
+    units = opts["units"]
+    units_toggle = units == "ft"
+    key = level["height_key"]
+
+    # the scenario falls back to int for stations without it
+    slr = load_slr_scenarios(sid)
+    scn = opts["scenario"] if opts["scenario"] in slr["names"] else "int"
+
+    out = report_dir(sid, scn, units, level["label"])
+    options = dict(format=opts["format"], scenario=scn, units=units)
+    if not opts["force"] and report_complete(out, options):
+        return None
+
+    timings = Counter()
+
+    @contextmanager
+    def stage(stage_name):
+        t0 = time.perf_counter()
+        yield
+        timings[stage_name] += time.perf_counter() - t0
+
+    with stage("load"):
+        levels, _, _ = station_levels(sid, units_toggle)
+
+    with stage("figures"):
+        graphs = dict()
+        graphs["obs"], obs_analysis = observed_flooding(sid, key, levels, units)
+        # the SLR graphs modify what they are given
+        slr_copy = json.loads(json.dumps({s: slr[s] for s in slr}))
+        graphs["slr"] = slr_projection(slr_copy, scn_focus=scn, units=units)
+        graphs["budget"] = slr_budget(
+            load_slr_budget(sid),
+            year_focus=REPORT_YEAR,
+            scn_focus=scn,
+            units=units,
+            single_scn=True,
+        )
+        station = stations.loc[sid]
+        (
+            graphs["htf"],
+            clim,
+            graphs["pent"],
+            htf_text,
+            xtrm_text,
+            display_yoi,
+        ) = htf_figures(station, scn, key, False)
+        graphs["clim"] = clim_projection(clim, REPORT_YEAR)
+
+    with stage("text"):
+        threshold = f"{level['label']} ({level['height']} {units} above MHHW)"
+        sections = [
+            f"# {name}: {threshold}\n\n",
+            "## Observed flooding\n\n",
+            "![Observed flooding days](obs.{fmt})\n\n",
+            markdown(observed_flooding_text(name, level["label"], obs_analysis)),
+            "## Sea-level rise scenarios\n\n",
+            "![Sea-level rise scenarios](slr.{fmt})\n\n",
+            f"![Contributions to sea-level rise in {REPORT_YEAR}](budget.{{fmt}})\n\n",
+            f"## Projected flooding: {slr['names'][scn]} scenario\n\n",
+            "![Projected flooding days per year](htf.{fmt})\n\n",
+            markdown(htf_text["chronic"]),
+            markdown(htf_text["yoi"]) if display_yoi["display"] == "block" else "",
+            "![Flooding days by pentad](pent.{fmt})\n\n",
+            f"![Flooding days per month in {REPORT_YEAR}](clim.{{fmt}})\n\n",
+            markdown(xtrm_text),
+        ]
+        report = "".join(s.replace("{fmt}", opts["format"]) for s in sections)
+
+    with stage("images"):
+        os.makedirs(out, exist_ok=True)
+        # incomplete until report.json is written again; images of another format
+        # would be left over from an earlier report
+        if os.path.exists(f"{out}/report.json"):
+            os.remove(f"{out}/report.json")
+        for g in graphs:
+            for fmt in FORMATS:
+                if fmt != opts["format"] and os.path.exists(f"{out}/{g}.{fmt}"):
+                    os.remove(f"{out}/{g}.{fmt}")
+        for g, fig in graphs.items():
+            width, height = IMAGE_SIZE[g]
+            fname = f"{out}/{g}.{opts['format']}"
+            pio.write_image(
+                fig,
+                fname + ".tmp",
+                format=opts["format"],
+                width=width,
+                height=height,
+                scale=2 if opts["format"] == "png" else 1,
+                validate=False,
+            )
+            os.replace(fname + ".tmp", fname)
+
+    with stage("write"):
+        with open(f"{out}/report.md", "w") as f:
+            f.write(report)
+
+    # written last: marks the report complete
+    meta = {**opts, **options, "station": sid, "threshold": threshold}
+    with open(f"{out}/report.json.tmp", "w") as f:
+        json.dump({**meta, "timings": timings}, f, indent=2)
+    os.replace(f"{out}/report.json.tmp", f"{out}/report.json")
+
+    return timings
+
+
+# ---------------------------------------------------------------------------
+
+with open("./data/stations.json", "r") as f:
+    stations = pd.DataFrame(json.load(f)).T
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Render per-station reports.")
+    parser.add_argument("station_ids", nargs="*")
+    parser.add_argument("--format", choices=FORMATS, default="png")
+    parser.add_argument("--scenario", default="int")
+    parser.add_argument("--units", choices=["ft", "m"], default="ft")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--force", action="store_true")
+    args = parser.parse_args()
+
+    try:
+        import kaleido  # noqa: F401
+    except ImportError:
+        sys.exit("Rendering images needs kaleido: pip install kaleido")
+
+    station_ids = args.station_ids
+    if len(station_ids) == 0:
+        station_ids = sorted(
+            os.path.basename(f)[:-5] for f in glob.glob("./data/levels/*.json")
+        )
+
+    opts = dict(
+        format=args.format, scenario=args.scenario, units=args.units, force=args.force
+    )
+    tasks = [
+        (sid, stations.loc[sid, "name"], level, opts)
+        for sid in station_ids
+        for level in noaa_levels(sid, args.units == "ft")
+    ]
+
+    t0 = time.perf_counter()
+    totals = Counter()
+    done = Counter()
+    failed = []
+    with ProcessPoolExecutor(args.workers) as pool:
+        futures = {pool.submit(render_report, task): task for task in tasks}
+        for future in as_completed(futures):
+            sid, _, level, _ = futures[future]
+            try:
+                timings = future.result()
+            except Exception as e:
+                failed.append(f"{sid}/{level['value']}")
+                print(f"{sid} {level['value']:<9} FAILED: {e!r}")
+                continue
+            if timings is None:
+                done["skipped"] += 1
+                continue
+            done["rendered"] += 1
+            totals.update(timings)
+            print(
+                f"{sid} {level['value']:<9}"
+                + "".join(f" {s} {t:5.2f} s" for s, t in timings.items())
+            )
+
+    print(
+        f"\n{done['rendered']} reports rendered, {done['skipped']} already complete, "
+        + f"{len(failed)} failed in {time.perf_counter() - t0:.1f} s"
+    )
+    if done["rendered"] > 0:
+        print(
+            "Time per report:"
+            + "".join(
+                f" {s} {t / done['rendered']:.2f} s" for s, t in totals.items()
+            )
+        )
+    if len(failed) > 0:
+        print("Failed: " + ", ".join(failed))
+        sys.exit(1)